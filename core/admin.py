@@ -1,7 +1,88 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
 from .models import Study, Subject, Visit, AdverseEvent, CRF, CRFField, Entry
 
 
+# --- Large-table changelists (Subject, Visit, AdverseEvent, Entry) ---
+# With millions of rows, the default changelist is slow three ways: a
+# sidebar link per related object (a SELECT of the whole related table),
+# __str__ columns that each fetch their related rows (N+1), and COUNT(*)
+# over the table twice per page load. These admins use autocomplete
+# filters, list_select_related, no full-result count and, on Postgres,
+# the planner's row estimate for the unfiltered count. Default orderings
+# are on indexed columns, so a page is an index scan plus LIMIT.
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Foreign key filter with a search box (the related admin's
+    search_fields, via the admin autocomplete view) instead of a link per
+    related object. Only the selected object is ever loaded.
+    """
+    template = "admin/core/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.model_admin = model_admin
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        return field.get_choices(
+            include_blank=False, limit_choices_to={f"{field.target_field.name}__in": self.lookup_val}
+        )
+
+    def has_output(self):
+        return True
+
+    def widget(self):
+        related = self.field.remote_field.model
+        choice = forms.ModelChoiceField(
+            related._default_manager.all(), required=False,
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site),
+        )
+        value = self.lookup_val[-1] if self.lookup_val else None
+        return choice.widget.render(self.lookup_kwarg, value, attrs={"data-filter": self.lookup_kwarg})
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On Postgres, an unfiltered changelist is counted from pg_class.reltuples
+    (kept current by autovacuum/ANALYZE) instead of COUNT(*). Small tables,
+    filtered lists and other databases get the exact count.
+    """
+    EXACT_BELOW = 100_000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == "postgresql" and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [query.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.EXACT_BELOW:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    @property
+    def media(self):
+        # Select2 and the autocomplete script for the filters
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
 # --- Inline so you can add/edit Visits directly on a Subject page ---
 class VisitInline(admin.TabularInline):
     model = Visit
@@ -22,11 +103,12 @@ class StudyAdmin(admin.ModelAdmin):
 
 # --- Subject admin: patient within a study ---
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
+class SubjectAdmin(LargeTableAdmin):
     list_display = ("subject_id", "study", "enrolled_at")
-    list_filter = ("study",)                        # left sidebar filter
+    list_filter = (("study", AutocompleteFilter),)   # left sidebar filter
+    list_select_related = ("study",)
     search_fields = ("subject_id", "study__code")   # search by subject or study code
-    ordering = ("study__code", "subject_id")
+    ordering = ("study", "subject_id")              # the (study, subject_id) unique index
     inlines = [VisitInline]                         # add/edit visits on the same page
 
     # Make it a bit nicer to pick the study when lots exist
@@ -35,20 +117,23 @@ class SubjectAdmin(admin.ModelAdmin):
 
 # --- Visit admin: timepoint for a subject ---
 @admin.register(Visit)
-class VisitAdmin(admin.ModelAdmin):
+class VisitAdmin(LargeTableAdmin):
     list_display = ("subject", "name", "visit_date")
-    list_filter = ("subject__study", "visit_date")  # filter by study and date
+    list_filter = (("subject__study", AutocompleteFilter), ("subject", AutocompleteFilter), "visit_date")
+    list_select_related = ("subject__study",)
     search_fields = ("subject__subject_id", "subject__study__code", "name")
-    ordering = ("visit_date", "id")
+    ordering = ("-id",)                             # newest first, on the primary key
     autocomplete_fields = ("subject",)              # helpful if many subjects exist
 
 
 @admin.register(AdverseEvent)
-class AdverseEventAdmin(admin.ModelAdmin):
+class AdverseEventAdmin(LargeTableAdmin):
     list_display = ("subject", "onset", "severity", "related_to_study", "created_at", "created_by")
-    list_filter = ("severity", "related_to_study", "subject__study", "onset")
+    list_filter = ("severity", "related_to_study", ("subject__study", AutocompleteFilter),
+                   ("subject", AutocompleteFilter), "onset")
+    list_select_related = ("subject__study", "created_by")
     search_fields = ("subject__subject_id", "subject__study__code", "description")
-    ordering = ("-onset",)
+    ordering = ("-id",)
     autocomplete_fields = ("subject",)
 
 class CRFFieldInline(admin.TabularInline):
@@ -76,9 +161,22 @@ class CRFFieldAdmin(admin.ModelAdmin):
 
 
 @admin.register(Entry)
-class EntryAdmin(admin.ModelAdmin):
+class EntryAdmin(LargeTableAdmin):
     list_display = ("visit", "field", "value_text", "updated_at")
-    list_filter = ("field__crf__study", "field__crf", "visit__subject", "updated_at")
+    list_filter = (("field__crf__study", AutocompleteFilter), ("field__crf", AutocompleteFilter),
+                   ("visit__subject", AutocompleteFilter), "updated_at")
+    # Entry.__str__ columns: visit -> subject -> study, field -> crf -> study
+    list_select_related = ("visit__subject__study", "field__crf__study")
     search_fields = ("field__code", "visit__subject__subject_id", "value_text")
-    ordering = ("-updated_at",)
-    autocomplete_fields = ("visit", "field")
\ No newline at end of file
+    ordering = ("-updated_at", "-id")               # entry_updated_idx
+    autocomplete_fields = ("visit", "field")
+
+    # Audited as the admin user (core.audit)
+    def save_model(self, request, obj, form, change):
+        obj.save(user=request.user)
+
+    def delete_model(self, request, obj):
+        obj.delete(user=request.user)
+
+    def delete_queryset(self, request, queryset):
+        queryset.delete(user=request.user)
\ No newline at end of file
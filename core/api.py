@@ -0,0 +1,150 @@
+"""
+Read-only JSON API over the core models: GET /api/<resource>/.
+
+    /api/subjects/?study=INCEPT-ICU-01&fields=id,subject_id,enrolled_at&limit=500
+    /api/subjects/?study=INCEPT-ICU-01&include=visits,adverse_events&after=<cursor>
+
+Every resource is keyset-paginated (core.pagination) on the columns of one
+of its indexes, so a deep page costs the same as the first. `next_cursor`
+is null on the last page.
+
+fields= picks columns out of the resource's fieldset (all of them by
+default). Without include= the rows come straight from .values(): no model
+instances are built. include= needs instances for prefetch_related, so the
+page is loaded with .only() those columns and each included relation costs
+one more query, itself restricted with .only().
+"""
+from dataclasses import dataclass, field
+
+from django.db.models import Prefetch
+
+from .models import CRF, AdverseEvent, CRFField, Entry, Study, Subject, Visit
+from .pagination import keyset_paginate
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class ApiError(ValueError):
+    """A bad query parameter (answered with 400)."""
+
+
+@dataclass(frozen=True)
+class Include:
+    model: type
+    fields: tuple
+    own_key: str        # column of the resource the relation joins on
+    related_key: str    # column of the related model it joins to
+
+
+@dataclass(frozen=True)
+class Resource:
+    model: type
+    ordering: tuple      # keyset ordering: the columns of an index, ending unique
+    fields: tuple        # the fieldset (and the default fields=)
+    filters: dict = field(default_factory=dict)     # query parameter -> lookup
+    includes: dict = field(default_factory=dict)    # include= name -> Include
+
+
+VISIT_FIELDS = ("id", "subject_id", "name", "visit_date", "updated_at")
+AE_FIELDS = ("id", "subject_id", "onset", "severity", "description", "related_to_study", "created_at", "updated_at")
+ENTRY_FIELDS = ("id", "visit_id", "field_id", "value_text", *Entry.TYPED_COLUMNS.values(), "created_at", "updated_at")
+
+RESOURCES = {
+    "studies": Resource(
+        Study, ("code",),
+        ("id", "code", "name", "created_at", "updated_at", "subject_count", "visit_count", "ae_count",
+         "entry_count", "last_activity_at"),
+        includes={"crfs": Include(CRF, ("id", "study_id", "name", "is_active", "updated_at"), "id", "study_id")},
+    ),
+    "subjects": Resource(
+        Subject, ("study_id", "subject_id"),   # unique (study, subject_id)
+        ("id", "study_id", "subject_id", "enrolled_at", "updated_at", "visit_count", "ae_count", "entry_count",
+         "last_activity_at"),
+        filters={"study": "study__code"},
+        includes={
+            "visits": Include(Visit, VISIT_FIELDS, "id", "subject_id"),
+            "adverse_events": Include(AdverseEvent, AE_FIELDS, "id", "subject_id"),
+        },
+    ),
+    "visits": Resource(
+        Visit, ("subject_id", "visit_date", "id"),   # visit_subject_date_idx
+        VISIT_FIELDS,
+        filters={"study": "subject__study__code", "subject": "subject_id"},
+        includes={"entries": Include(Entry, ENTRY_FIELDS, "id", "visit_id")},
+    ),
+    "adverse_events": Resource(
+        AdverseEvent, ("subject_id", "-onset", "-id"),   # ae_subject_onset_idx
+        AE_FIELDS,
+        filters={"study": "subject__study__code", "subject": "subject_id"},
+    ),
+    "entries": Resource(
+        Entry, ("visit_id", "field_id"),   # unique (visit, field)
+        ENTRY_FIELDS,
+        filters={"study": "visit__subject__study__code", "subject": "visit__subject_id", "visit": "visit_id",
+                 "crf": "field__crf_id"},
+        includes={"field": Include(CRFField, ("id", "crf_id", "code", "name", "field_type", "required"),
+                                   "field_id", "id")},
+    ),
+}
+
+
+def _names(value, allowed, what):
+    names = [n.strip() for n in value.split(",") if n.strip()]
+    unknown = [n for n in names if n not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown {what}: {', '.join(unknown)}. Available: {', '.join(allowed)}.")
+    return list(dict.fromkeys(names))
+
+
+def _limit(value):
+    try:
+        limit = int(value) if value else DEFAULT_LIMIT
+    except ValueError:
+        raise ApiError("limit must be a number.") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _serialize(obj, names):
+    return {name: getattr(obj, name) for name in names}
+
+
+def page(resource_name, params):
+    """
+    One page of a resource for query parameters `params` (a dict):
+    {"data": [...], "next_cursor": ...}. Raises ApiError (or InvalidCursor)
+    for bad parameters and LookupError for an unknown resource.
+    """
+    resource = RESOURCES[resource_name]
+    names = _names(params["fields"], resource.fields, "fields") if params.get("fields") else list(resource.fields)
+    includes = _names(params.get("include", ""), list(resource.includes), "include")
+    rows = resource.model.objects.filter(**{
+        lookup: params[param] for param, lookup in resource.filters.items() if params.get(param)
+    })
+    # The cursor needs the ordering columns; they are dropped from the output unless asked for
+    keys = [name.lstrip("-") for name in resource.ordering]
+    columns = list(dict.fromkeys([*names, *keys]))
+
+    if not includes:
+        result = keyset_paginate(rows.values(*columns), list(resource.ordering), params.get("after"),
+                                 _limit(params.get("limit")))
+        data = [{name: row[name] for name in names} for row in result.items]
+        return {"data": data, "next_cursor": result.next_cursor}
+
+    specs = {name: resource.includes[name] for name in includes}
+    rows = rows.only(*columns, *(spec.own_key for spec in specs.values())).prefetch_related(*(
+        Prefetch(name, queryset=spec.model.objects.only(*spec.fields, spec.related_key))
+        for name, spec in specs.items()
+    ))
+    result = keyset_paginate(rows, list(resource.ordering), params.get("after"), _limit(params.get("limit")))
+    data = []
+    for obj in result.items:
+        item = _serialize(obj, names)
+        for name, spec in specs.items():
+            related = getattr(obj, name)
+            if hasattr(related, "all"):   # reverse FK: a list
+                item[name] = [_serialize(r, spec.fields) for r in related.all()]
+            else:
+                item[name] = None if related is None else _serialize(related, spec.fields)
+        data.append(item)
+    return {"data": data, "next_cursor": result.next_cursor}
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core import checks
+
+        from . import signals  # noqa: F401  (connect receivers)
+        from .checks import change_feed_backend
+
+        checks.register(change_feed_backend)
+
+        if settings.PROFILING_ENABLED:
+            from mini_edc import profiling
+            profiling.install()
@@ -0,0 +1,156 @@
+"""
+Coroutine versions of the read pages, served under ASGI.
+
+ASYNC_VIEWS=1 (opt-in, see mini_edc/asgi.py) switches ROOT_URLCONF to
+mini_edc/asgi_urls.py: these views replace dashboard, study_detail,
+subject_detail and visit_entry there, at the same URLs and names. Under WSGI
+(runserver, gunicorn) the sync views in core/views.py serve them as before.
+
+Lookups use the async ORM (aget, async for). Django runs those on one thread
+per request, one after another, so queries that don't depend on each other
+(the subject page's visits and AEs) go through _concurrently() instead: each
+on its own thread and pool checkout with DB_POOL_ENABLED, or in one
+sync_to_async call on the request's connection without a pool.
+
+Templates are rendered through sync_to_async: fragment caches may still run
+a lazy query when a fragment expires between the check and the render.
+POSTs to visit_entry go to the sync view.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.shortcuts import aget_object_or_404, render
+from django.utils.functional import SimpleLazyObject
+
+from mini_edc.db_routing import replica_reads
+
+from . import fragment_cache, views
+from .conditional import (
+    conditional_page, dashboard_state, study_state, subject_state, visit_entry_state
+)
+from .forms import AdverseEventForm, make_crf_entry_form
+from .models import Entry, Study, Subject, Visit
+from .pagination import InvalidCursor, akeyset_paginate
+
+
+async def _render(request, template, context, status=200):
+    return await sync_to_async(render)(request, template, context, status=status)
+
+
+def _pooled():
+    return bool(connection.settings_dict.get("OPTIONS", {}).get("pool"))
+
+
+async def _concurrently(*calls):
+    """
+    Run blocking ORM callables at the same time, each on its own thread and
+    connection, when connections come from the pool (DB_POOL_ENABLED).
+    Without one, each thread would open and close a connection of its own:
+    the calls run one after another on the request's thread instead.
+    """
+    if not _pooled():
+        return await sync_to_async(lambda: [call() for call in calls])()
+
+    def isolated(call):
+        def run():
+            try:
+                return call()
+            finally:
+                connection.close()   # the executor thread outlives the request
+        return sync_to_async(run, thread_sensitive=False)()
+    return await asyncio.gather(*(isolated(call) for call in calls))
+
+
+@replica_reads
+@conditional_page(dashboard_state)
+async def dashboard(request):
+    studies = [study async for study in Study.objects.order_by("code")]
+    return await _render(request, "core/dashboard.html", {"studies": studies})
+
+
+@replica_reads
+@conditional_page(study_state)
+async def study_detail(request, study_code: str):
+    study = await aget_object_or_404(Study, code=study_code)
+    prefix = request.GET.get("q", "").strip()
+
+    subjects = study.subjects.all()
+    if prefix:
+        subjects = subjects.filter(subject_id__gte=prefix, subject_id__startswith=prefix)
+    try:
+        page = await akeyset_paginate(subjects, ["subject_id"], request.GET.get("after"), views.SUBJECT_PAGE_SIZE)
+    except InvalidCursor:
+        page = await akeyset_paginate(subjects, ["subject_id"], None, views.SUBJECT_PAGE_SIZE)
+
+    context = {"study": study, "subjects": page, "prefix": prefix}
+    if request.headers.get("HX-Request") == "true":
+        return await _render(request, "core/partials/subject_rows.html", context)
+    return await _render(request, "core/study_detail.html", context)
+
+
+@replica_reads
+@conditional_page(subject_state)
+async def subject_detail(request, study_code: str, subject_id: str):
+    subject = await aget_object_or_404(
+        Subject.objects.select_related("study"), study__code=study_code, subject_id=subject_id
+    )
+    visits = subject.visits.all().order_by("visit_date", "id")
+    context = {
+        "study": subject.study,
+        "subject": subject,
+        "visits": visits,
+        "aevents": SimpleLazyObject(lambda: views._ae_page(subject)),
+        "ae_form": AdverseEventForm(),
+    }
+    # Fetch, both at once, whatever the cached fragments don't already cover
+    pending = {}
+    vary_on = (subject.study.code, subject.subject_id)   # as in the templates
+    if not fragment_cache.is_cached("subject_visits", "subject", subject.pk, vary_on):
+        pending["visits"] = lambda: list(visits)
+    if not fragment_cache.is_cached("ae_rows", "subject", subject.pk, vary_on):
+        pending["aevents"] = lambda: views._ae_page(subject)
+    context.update(zip(pending, await _concurrently(*pending.values())))
+    return await _render(request, "core/subject_detail.html", context)
+
+
+@replica_reads
+@conditional_page(visit_entry_state)
+async def visit_entry(request, study_code: str, subject_id: str, visit_id: int):
+    if request.method != "GET":
+        return await sync_to_async(views.visit_entry)(request, study_code, subject_id, visit_id)
+
+    visit = await aget_object_or_404(
+        Visit.objects.select_related("subject__study"),
+        id=visit_id, subject__subject_id=subject_id, subject__study__code=study_code,
+    )
+    subject = visit.subject
+    study = subject.study
+    crfs = [crf async for crf in study.crfs.filter(is_active=True).prefetch_related("fields").order_by("name", "id")]
+    if not crfs:
+        return await _render(request, "core/visit_entry.html", {
+            "study": study, "subject": subject, "visit": visit,
+            "crfs": [], "selected_crf": None, "form": None, "entries": [],
+        })
+
+    try:
+        crf_id = int(request.GET.get("crf")) if request.GET.get("crf") else None
+    except (TypeError, ValueError):
+        crf_id = None
+    selected_crf = next((c for c in crfs if c.id == crf_id), None) if crf_id else crfs[0]
+
+    # One query serves both the prefill and the "current values" table
+    entries = [
+        e async for e in Entry.objects.filter(visit=visit, field__crf=selected_crf)
+        .select_related("field").order_by("field__order", "field__id")
+    ]
+    form = make_crf_entry_form(selected_crf, initial_data={e.field.code: e.value_text for e in entries})
+
+    if request.headers.get("HX-Request"):
+        return await sync_to_async(views._render_visit_entry_partial)(
+            request, study, subject, visit, selected_crf, form, entries
+        )
+    return await _render(request, "core/visit_entry.html", {
+        "study": study, "subject": subject, "visit": visit,
+        "crfs": crfs, "selected_crf": selected_crf, "form": form, "entries": entries,
+    })
@@ -0,0 +1,127 @@
+"""
+Audit trail of Entry values: every change, with the old and new value_text,
+the user and the time (core.EntryAudit).
+
+Writers don't insert an audit row per value. They collect the changes they
+already diffed (save_crf_entries, the batch API and the importer all know
+the old values) in an AuditTrail and flush it once, in their transaction:
+a CRF save costs one extra INSERT however many values changed, and its
+audit rows commit or roll back with the values.
+
+    trail = AuditTrail(request.user)
+    trail.record(visit.pk, field.pk, old, new)
+    ...
+    trail.flush()
+
+Single saves (Entry.save, e.g. from the admin) audit themselves against the
+value loaded with the instance. Deletes are audited before the rows go, by
+record_deleted(): EntryQuerySet.delete() for direct deletes, and the
+pre_delete receivers of the cascade roots (core.signals) for the entries a
+Study, Subject, Visit, CRF or CRFField takes down. Either way it is one
+INSERT ... SELECT, so a cascade still loads no entries.
+
+The table is append-only (a trigger rejects UPDATE and DELETE on Postgres)
+and partitioned by month there, so old months can be detached or archived
+whole. values_as_of() answers "what did this visit show at time T?".
+"""
+from django.db import connection, connections
+from django.utils import timezone
+
+from .models import EntryAudit
+
+# Creates the partitions from this month to %(months)s months ahead; a month
+# whose rows already went to the DEFAULT partition is left there (Postgres
+# won't create a partition overlapping the default's rows).
+_PARTITIONS_SQL = """
+DO $$
+DECLARE m date;
+BEGIN
+    FOR m IN SELECT generate_series(date_trunc('month', now()),
+                                    date_trunc('month', now()) + interval '%(months)s months',
+                                    interval '1 month')::date LOOP
+        IF NOT EXISTS (SELECT 1 FROM core_entryaudit_default
+                       WHERE changed_at >= m AND changed_at < m + interval '1 month') THEN
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %%I PARTITION OF core_entryaudit FOR VALUES FROM (%%L) TO (%%L)',
+                           'core_entryaudit_' || to_char(m, '"y"YYYY"m"MM'), m, m + interval '1 month');
+        END IF;
+    END LOOP;
+END
+$$
+"""
+
+
+class AuditTrail:
+    """Buffer of value changes by one user, written with one bulk INSERT by flush()."""
+
+    def __init__(self, user=None):
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record(self, visit_id, field_id, old_value, new_value):
+        if old_value != new_value:
+            self.rows.append((visit_id, field_id, old_value, new_value))
+
+    def flush(self):
+        """Insert the buffered rows (all stamped with the same time); returns how many."""
+        if not self.rows:
+            return 0
+        now = timezone.now()
+        EntryAudit.objects.bulk_create([
+            EntryAudit(visit_id=visit_id, field_id=field_id, old_value=old, new_value=new,
+                       user_id=self.user_id, changed_at=now)
+            for visit_id, field_id, old, new in self.rows
+        ])
+        written, self.rows = len(self.rows), []
+        return written
+
+
+# A cleared value (NULL) has nothing to lose: deleting it is not a change
+_DELETED_SQL = """
+INSERT INTO core_entryaudit (visit_id, field_id, old_value, new_value, user_id, changed_at)
+SELECT visit_id, field_id, value_text, NULL, %s, %s FROM core_entry WHERE id IN ({ids})
+"""
+
+
+def record_deleted(entries, user=None):
+    """
+    Audit the deletion of `entries` (an Entry queryset, still in the
+    database): value -> None for each one with a value. Run it in the
+    deleting transaction, before the delete.
+    """
+    ids, params = entries.filter(value_text__isnull=False).order_by().values("pk").query.sql_with_params()
+    connection = connections[entries.db]
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    with connection.cursor() as cursor:
+        cursor.execute(_DELETED_SQL.format(ids=ids),
+                       [user_id, connection.ops.adapt_datetimefield_value(timezone.now()), *params])
+
+
+def values_as_of(visit, at):
+    """
+    {field_id: value_text} of `visit` at datetime `at`: the last audited
+    value of each field set by then (None for a cleared value). Fields
+    never set by `at` are absent. One range scan of entryaudit_asof_idx.
+    """
+    values = {}
+    rows = (EntryAudit.objects.filter(visit=visit, changed_at__lte=at)
+            .order_by("field_id", "changed_at", "id").values_list("field_id", "new_value"))
+    for field_id, value in rows:   # in (field, time) order: the last one per field wins
+        values[field_id] = value
+    return values
+
+
+def ensure_partitions(months_ahead=2):
+    """
+    Postgres: create the monthly partitions up to `months_ahead` months from
+    now (run monthly: manage.py audit_partitions). Elsewhere a no-op.
+    Returns whether anything was run.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(_PARTITIONS_SQL % {"months": int(months_ahead)})
+    return True
+
@@ -0,0 +1,169 @@
+"""
+Batch save of CRF values for many visits of a study (the JSON batch API).
+
+Each record names a visit and a CRF and carries some of its values:
+
+    {"subject_id": "001", "visit": "Baseline", "crf": "Baseline CRF",
+     "values": {"bp_sys": 120, "on_vent": false}}
+
+The visit is identified by (subject_id, visit name), as in the importer.
+Only the fields present in `values` are validated and written; a blank or
+null value clears a field unless it is required. Values are cleaned by the
+CRF's cached entry form class (core.forms.get_crf_entry_form_class), so the
+rules are exactly visit_entry's. A record with any error is rejected whole;
+the others are saved.
+
+The whole batch is one transaction with a fixed number of queries however
+many records and fields it has: the CRFs and their fields, the visits, the
+existing values, one bulk upsert, one audit INSERT (core.audit) and two
+counter UPDATEs.
+"""
+from collections import Counter
+from dataclasses import dataclass, field as dc_field
+
+from django import forms
+from django.db import transaction
+
+from mini_edc.metrics import ENTRIES_SAVED
+
+from . import counters, datasets
+from .audit import AuditTrail
+from .entries import SaveResult, normalize_value
+from .forms import get_crf_entry_form_class
+from .fragment_cache import bump_visit
+from .models import Entry, Visit
+
+MAX_RECORDS = 1000
+
+
+class BatchError(ValueError):
+    """The batch as a whole is unusable (not a list of records, too long)."""
+
+
+@dataclass
+class RecordResult:
+    index: int
+    errors: dict = dc_field(default_factory=dict)   # {field code or "__all__": [messages]}
+    saved: SaveResult | None = None
+
+    def as_json(self):
+        if self.errors:
+            return {"index": self.index, "ok": False, "errors": self.errors}
+        return {"index": self.index, "ok": True, "created": self.saved.created,
+                "changed": self.saved.changed, "unchanged": self.saved.unchanged}
+
+
+def _text(record, key):
+    value = record.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _clean(record, crfs):
+    """(crf, {field: normalized value}) for a valid record; raises ValidationError with a dict."""
+    crf = crfs.get(_text(record, "crf"))
+    if crf is None:
+        raise forms.ValidationError({"__all__": f"Unknown or inactive CRF {_text(record, 'crf')!r}."})
+    values = record.get("values")
+    if not isinstance(values, dict) or not values:
+        raise forms.ValidationError({"__all__": "values must be a non-empty object of {field code: value}."})
+
+    form_fields = get_crf_entry_form_class(crf).base_fields
+    by_code = {f.code: f for f in crf.fields.all()}
+    cleaned, errors = {}, {}
+    for code, raw in values.items():
+        if code not in by_code:
+            errors[code] = [f"Not a field of {crf.name!r}."]
+            continue
+        try:
+            value = form_fields[code].clean("" if raw is None else raw)
+        except forms.ValidationError as exc:
+            errors[code] = exc.messages
+            continue
+        cleaned[by_code[code]] = normalize_value(by_code[code], value)
+    if errors:
+        raise forms.ValidationError(errors)
+    return crf, cleaned
+
+
+def save_batch(study, records, user=None):
+    """
+    Validate and save `records`, audited as changed by `user`; returns a
+    RecordResult per record, in order.
+    """
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise BatchError("records must be a list of objects.")
+    if len(records) > MAX_RECORDS:
+        raise BatchError(f"At most {MAX_RECORDS} records per batch.")
+
+    results = [RecordResult(index=i) for i in range(len(records))]
+    with transaction.atomic():
+        crfs = {crf.name: crf for crf in study.crfs.filter(is_active=True).prefetch_related("fields")}
+        keys = {(_text(r, "subject_id"), _text(r, "visit")) for r in records}
+        visits = {
+            (sid, name): (vid, subject_pk)
+            for sid, name, vid, subject_pk in Visit.objects.filter(
+                subject__study=study,
+                subject__subject_id__in={sid for sid, _ in keys},
+                name__in={name for _, name in keys},
+            ).values_list("subject__subject_id", "name", "id", "subject_id")
+        }
+
+        valid = []
+        for record, result in zip(records, results):
+            key = (_text(record, "subject_id"), _text(record, "visit"))
+            try:
+                if key not in visits:
+                    raise forms.ValidationError({"__all__": f"Unknown visit {key[1]!r} for subject {key[0]!r}."})
+                crf, cleaned = _clean(record, crfs)
+            except forms.ValidationError as exc:
+                result.errors = exc.message_dict
+                continue
+            valid.append((result, visits[key], crf, cleaned))
+
+        current = {}
+        if valid:
+            current = {
+                (vid, fid): text for vid, fid, text in Entry.objects.filter(
+                    visit_id__in={vid for _, (vid, _), _, _ in valid},
+                    field_id__in={f.id for _, _, _, cleaned in valid for f in cleaned},
+                ).values_list("visit_id", "field_id", "value_text")
+            }
+
+        # Records are applied in order: a later record for the same visit sees the earlier one's values
+        to_write, created, touched, subjects = {}, Counter(), {}, {}
+        trail = AuditTrail(user)
+        for result, (visit_id, subject_pk), crf, cleaned in valid:
+            result.saved = SaveResult()
+            for f, norm in cleaned.items():
+                key = (visit_id, f.id)
+                if key not in current:
+                    result.saved.created += 1
+                    created[subject_pk] += 1
+                elif current[key] != norm:
+                    result.saved.changed += 1
+                else:
+                    result.saved.unchanged += 1
+                    continue
+                trail.record(visit_id, f.id, current.get(key), norm)
+                current[key] = norm
+                to_write[key] = Entry(visit_id=visit_id, field_id=f.id, value_text=norm,
+                                      **Entry.typed_values(f.field_type, norm))
+                touched.setdefault(crf.id, set()).add(visit_id)
+                subjects[subject_pk] = created[subject_pk]
+
+        if to_write:
+            Entry.objects.bulk_create(
+                to_write.values(),
+                update_conflicts=True,
+                unique_fields=["visit", "field"],
+                update_fields=["value_text", *Entry.TYPED_COLUMNS.values(), "updated_at"],
+            )
+            trail.flush()
+            ENTRIES_SAVED.inc(len(to_write), source="api")
+            counters.record_entries(study.pk, subjects)
+            counters.restamp_on_commit(study.pk, subject_ids=list(subjects))
+            for crf_id, visit_ids in touched.items():
+                datasets.refresh(crf_id, visit_ids)
+            for visit_id in {vid for vid, _ in to_write}:
+                bump_visit(visit_id)
+    return results
@@ -0,0 +1,55 @@
+"""
+Micro-benchmarks for hot paths, run with `python manage.py benchmark <name>`.
+
+Each module listed in BENCHMARKS exposes:
+  add_arguments(parser)  -> register its own CLI options
+  run(**options) -> dict  -> execute and return JSON-serialisable results;
+                             a non-empty "regressions" list fails the command
+
+Benchmarks build their data inside a transaction that is rolled back, so
+they can be pointed at a dev database without leaving anything behind.
+"""
+import time
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+BENCHMARKS = {
+    "api": "core.benchmarks.api",
+    "asgi": "core.benchmarks.asgi",
+    "crf_save": "core.benchmarks.crf_save",
+    "export": "core.benchmarks.export",
+    "load": "core.benchmarks.load",
+    "views": "core.benchmarks.views",
+}
+
+
+def get_benchmark(name):
+    return import_module(BENCHMARKS[name])
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(fn, repeats=1):
+    """
+    Call fn() `repeats` times; return (median seconds, queries per call).
+    Query count comes from the last call (they are expected to be equal).
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeats):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        queries = len(ctx.captured_queries)
+    timings.sort()
+    return timings[len(timings) // 2], queries
@@ -0,0 +1,122 @@
+"""
+Pulling a study's records through the JSON API (core.api) against scraping
+the HTML pages that show the same records.
+
+    python manage.py benchmark api --subjects 1000
+
+Scenarios, each a full pull of one synthetic study:
+  subjects         /api/subjects/ pages vs. the study page's keyset pages
+  subject_records  /api/subjects/?include=visits,adverse_events vs. one
+                   subject_detail page per subject
+
+Each side reports the median wall time of `repeats` pulls, the requests and
+queries of one pull, and peak Python memory (one tracemalloc pass). A pull
+is a loop of requests, so the peak is that of its largest request: it is
+compared per subject delivered by a request (50 per study page, one per
+subject page, up to 1000 per API page). The API side is expected to be
+faster and smaller by that measure; a scenario where it is not is reported
+as a regression.
+"""
+import re
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Study
+from ..views import SUBJECT_PAGE_SIZE
+from ..synthetic import generate
+from . import rolled_back
+
+API_LIMIT = 1000
+NEXT_PAGE = re.compile(r'href="\?after=([\w-]+)')
+
+
+def add_arguments(parser):
+    parser.add_argument("--subjects", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+
+
+def _api_pull(client, params):
+    """Returns (requests, subjects per request), like the other pulls."""
+    url, after, requests = reverse("core:api_list", args=["subjects"]), None, 0
+    while True:
+        body = client.get(url, {**params, "limit": API_LIMIT, **({"after": after} if after else {})}).json()
+        requests += 1
+        after = body["next_cursor"]
+        if after is None:
+            return requests, API_LIMIT if requests > 1 else max(1, len(body["data"]))
+
+
+def _scenarios(study):
+    def api_subjects(client):
+        return _api_pull(client, {"study": study.code})
+
+    def html_subjects(client):
+        url, after, requests = reverse("core:study_detail", args=[study.code]), None, 0
+        while True:
+            response = client.get(url, {"after": after} if after else {}, HTTP_HX_REQUEST="true")
+            requests += 1
+            # What a scraper does: follow the "load more" link
+            match = NEXT_PAGE.search(response.content.decode())
+            if match is None:
+                return requests, SUBJECT_PAGE_SIZE
+            after = match.group(1)
+
+    def api_records(client):
+        return _api_pull(client, {"study": study.code, "include": "visits,adverse_events"})
+
+    def html_records(client):
+        subject_ids = list(study.subjects.values_list("subject_id", flat=True))
+        for subject_id in subject_ids:
+            client.get(reverse("core:subject_detail", args=[study.code, subject_id]))
+        return len(subject_ids), 1
+
+    return [("subjects", api_subjects, html_subjects), ("subject_records", api_records, html_records)]
+
+
+def _measure(client, pull, repeats):
+    pull(client)   # warm-up
+
+    tracemalloc.start()
+    pull(client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeats):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            requests, per_request = pull(client)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "ms": round(timings[len(timings) // 2], 1),
+        "requests": requests,
+        "queries": len(ctx.captured_queries),
+        "peak_mem_kb": round(peak / 1024),
+        "peak_bytes_per_subject": round(peak / per_request),
+    }
+
+
+def run(subjects=500, repeats=3, **_):
+    results, regressions = {}, []
+    with rolled_back(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        generate(prefix="APIBENCH", seed=1, subjects=subjects, visits=5, crfs=1, fields=5, ae_rate=1, fill=0.5)
+        study = Study.objects.get(code="APIBENCH-001")
+        client = Client()
+        for name, api_pull, html_pull in _scenarios(study):
+            api, html = _measure(client, api_pull, repeats), _measure(client, html_pull, repeats)
+            results[name] = {
+                "api": api,
+                "html": html,
+                "speedup": round(html["ms"] / api["ms"], 1),
+                "memory_ratio": round(api["peak_bytes_per_subject"] / html["peak_bytes_per_subject"], 2),
+            }
+            if api["ms"] > html["ms"] or api["peak_bytes_per_subject"] > html["peak_bytes_per_subject"]:
+                regressions.append(f"{name}: the API pull is not faster and smaller than the HTML pages")
+    return {"benchmark": "api", "subjects": subjects, "results": results, "regressions": regressions}
@@ -0,0 +1,164 @@
+"""
+Concurrent throughput of the read pages, WSGI (sync views, one thread per
+request) against ASGI (core/async_views.py on one event loop).
+
+    python manage.py benchmark asgi --concurrency 32 --requests 50
+
+Both paths are driven through Django's own handlers the way a server
+would: WSGIHandler called from a pool of `concurrency` threads, ASGIHandler
+from `concurrency` tasks with a hand-built scope, each closing its database
+connections at the end of the request. Each client cycles through the
+dashboard, study, subject and visit-entry pages of a committed synthetic
+study, which is deleted afterwards (as in the load benchmark); the two runs
+use different subjects, so both start with cold fragment caches.
+
+Non-200 responses are regressions; the throughput ratio is reported, not
+gated, since it depends on the server's cores and the database.
+"""
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import override_settings
+from django.urls import reverse
+
+from ..models import Study, Visit
+from ..synthetic import generate
+from .views import _percentile
+
+PREFIX = "ASGIBENCH"
+HOST = "testserver"
+
+
+def add_arguments(parser):
+    parser.add_argument("--concurrency", type=int, default=16, help="threads (WSGI) / tasks (ASGI)")
+    parser.add_argument("--requests", type=int, default=25, help="GETs per client")
+    parser.add_argument("--subjects", type=int, default=50)
+
+
+def _paths(study):
+    """Two path lists with the same mix, on different subjects: neither run finds the other's cached fragments."""
+    shared = [reverse("core:dashboard"), reverse("core:study_detail", args=[study.code])]
+    halves = ([], [])
+    visits = Visit.objects.filter(subject__study=study).select_related("subject").order_by("subject__subject_id", "id")
+    for visit in visits:
+        sid = visit.subject.subject_id
+        halves[int(sid) % 2].extend([
+            reverse("core:subject_detail", args=[study.code, sid]),
+            reverse("core:visit_entry", args=[study.code, sid, visit.id]),
+        ])
+    return [shared + half for half in halves]
+
+
+def _wsgi_get(handler, path):
+    environ = {"PATH_INFO": path, "HTTP_HOST": HOST, "wsgi.input": io.BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    result = handler(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        b"".join(result)
+    finally:
+        result.close()   # fires request_finished: connections are closed as under a server
+    return status[0]
+
+
+async def _asgi_get(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"host", HOST.encode())], "server": (HOST, 80), "client": ("127.0.0.1", 50000),
+    }
+    request = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = []
+
+    async def receive():
+        if request:
+            return request.pop()
+        await asyncio.Future()   # no disconnect; Django cancels this when the response is done
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def _summary(timings, statuses, elapsed):
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "throughput_rps": round(len(timings) / elapsed, 1),
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "failed": sum(1 for s in statuses if s != 200),
+    }
+
+
+def run_wsgi(paths, concurrency, requests):
+    handler = WSGIHandler()
+
+    def client(n):
+        timings, statuses = [], []
+        for i in range(requests):
+            began = time.perf_counter()
+            statuses.append(_wsgi_get(handler, paths[(n + i * concurrency) % len(paths)]))
+            timings.append((time.perf_counter() - began) * 1000)
+        return timings, statuses
+
+    with override_settings(ROOT_URLCONF="mini_edc.urls"):
+        began = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            outcomes = list(executor.map(client, range(concurrency)))
+        elapsed = time.perf_counter() - began
+    return _summary([t for ts, _ in outcomes for t in ts], [s for _, ss in outcomes for s in ss], elapsed)
+
+
+def run_asgi(paths, concurrency, requests):
+    app = ASGIHandler()
+
+    async def client(n):
+        timings, statuses = [], []
+        for i in range(requests):
+            began = time.perf_counter()
+            statuses.append(await _asgi_get(app, paths[(n + i * concurrency) % len(paths)]))
+            timings.append((time.perf_counter() - began) * 1000)
+        return timings, statuses
+
+    async def clients():
+        return await asyncio.gather(*(client(n) for n in range(concurrency)))
+
+    with override_settings(ROOT_URLCONF="mini_edc.asgi_urls"):
+        began = time.perf_counter()
+        outcomes = asyncio.run(clients())
+        elapsed = time.perf_counter() - began
+    return _summary([t for ts, _ in outcomes for t in ts], [s for _, ss in outcomes for s in ss], elapsed)
+
+
+def run(concurrency=16, requests=25, subjects=50, **_):
+    Study.objects.filter(code__startswith=PREFIX).delete()
+    generate(prefix=PREFIX, seed=1, subjects=subjects, visits=3, crfs=2, fields=20, ae_rate=0.5, fill=0.8)
+    study = Study.objects.get(code=f"{PREFIX}-001")
+    wsgi_paths, asgi_paths = _paths(study)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+            run_wsgi(wsgi_paths[:2], 1, 2)   # warm-up: templates, URL resolvers
+            results = {
+                "wsgi": run_wsgi(wsgi_paths, concurrency, requests),
+                "asgi": run_asgi(asgi_paths, concurrency, requests),
+            }
+    finally:
+        study.delete()
+    regressions = [f"{mode}: {r['failed']} requests did not return 200" for mode, r in results.items() if r["failed"]]
+    return {
+        "benchmark": "asgi",
+        "concurrency": concurrency,
+        "results": results,
+        "asgi_vs_wsgi_throughput": round(results["asgi"]["throughput_rps"] / results["wsgi"]["throughput_rps"], 2),
+        "regressions": regressions,
+    }
@@ -0,0 +1,82 @@
+"""
+CRF save benchmark: per-field update_or_create vs. the bulk, diff-aware
+save path in core.entries.
+
+    python manage.py benchmark crf_save --fields 120 --repeats 5
+"""
+from datetime import date
+
+from ..entries import normalize_value, save_crf_entries
+from ..models import CRF, CRFField, Entry, Study, Subject, Visit
+from . import measure, rolled_back
+
+
+def add_arguments(parser):
+    parser.add_argument("--fields", type=int, nargs="+", default=[20, 120, 500],
+                        help="CRF sizes (number of fields) to benchmark")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--changed", type=float, default=0.1,
+                        help="fraction of values edited on the 'edit' save")
+
+
+def _legacy_save(visit, fields, data):
+    # The original visit_entry loop: SELECT + UPDATE/INSERT per field
+    for field in fields:
+        Entry.objects.update_or_create(
+            visit=visit, field=field, defaults={"value_text": normalize_value(field, data.get(field.code))}
+        )
+
+
+def _build_crf(n_fields):
+    study = Study.objects.create(code=f"BENCH-{n_fields}", name="CRF save benchmark")
+    subject = Subject.objects.create(study=study, subject_id="B-001", enrolled_at=date.today())
+    crf = CRF.objects.create(study=study, name="Bench CRF")
+    fields = CRFField.objects.bulk_create([
+        CRFField(crf=crf, order=i, code=f"f{i}", name=f"Field {i}", field_type=CRFField.INT)
+        for i in range(n_fields)
+    ])
+    return subject, fields
+
+
+def _bench_size(n_fields, repeats, changed):
+    subject, fields = _build_crf(n_fields)
+    n_edit = max(1, int(n_fields * changed))
+    baseline = {f.code: i for i, f in enumerate(fields)}
+
+    def new_visit():
+        return Visit.objects.create(subject=subject, name="Bench", visit_date=date.today())
+
+    results = {}
+    for label, save in (("legacy", _legacy_save), ("bulk", save_crf_entries)):
+        visit = new_visit()
+        current = dict(baseline)
+        save(visit, fields, current)
+
+        # First save on an empty visit: every value is new
+        fresh = [new_visit() for _ in range(repeats)]
+
+        def first():
+            save(fresh.pop(), fields, baseline)
+
+        # Re-save with a fraction of the values edited
+        def edit():
+            for f in fields[:n_edit]:
+                current[f.code] += 1
+            save(visit, fields, current)
+
+        # Re-save with nothing changed
+        def noop():
+            save(visit, fields, current)
+
+        for scenario, fn in (("first", first), ("edit", edit), ("noop", noop)):
+            seconds, queries = measure(fn, repeats)
+            results[f"{label}.{scenario}"] = {"ms": round(seconds * 1000, 2), "queries": queries}
+    return results
+
+
+def run(fields=(20, 120, 500), repeats=5, changed=0.1, **_):
+    results = {}
+    with rolled_back():
+        for n in fields:
+            results[str(n)] = _bench_size(n, repeats, changed)
+    return {"benchmark": "crf_save", "repeats": repeats, "changed": changed, "results": results}
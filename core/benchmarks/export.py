@@ -0,0 +1,68 @@
+"""
+Study export benchmark: rows/second and peak Python memory for the long and
+wide CSV layouts.
+
+    python manage.py benchmark export --visits 2000 --fields 50
+"""
+import time
+import tracemalloc
+from datetime import date
+
+from ..exports import iter_csv
+from ..models import CRF, CRFField, Entry, Study, Subject, Visit
+from . import rolled_back
+
+
+def add_arguments(parser):
+    parser.add_argument("--visits", type=int, default=2000, help="visits in the study (10 per subject)")
+    parser.add_argument("--fields", type=int, default=50, help="fields on the single CRF")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+
+
+def _seed(n_visits, n_fields):
+    study = Study.objects.create(code="BENCH-EXPORT", name="Export benchmark")
+    subjects = Subject.objects.bulk_create([
+        Subject(study=study, subject_id=f"S-{i:06d}", enrolled_at=date.today())
+        for i in range(max(1, n_visits // 10))
+    ])
+    visits = Visit.objects.bulk_create([
+        Visit(subject=subjects[i % len(subjects)], name=f"Day {i // len(subjects)}", visit_date=date.today())
+        for i in range(n_visits)
+    ], batch_size=5000)
+    crf = CRF.objects.create(study=study, name="Bench CRF")
+    fields = CRFField.objects.bulk_create([
+        CRFField(crf=crf, order=i, code=f"f{i}", name=f"Field {i}", field_type=CRFField.INT)
+        for i in range(n_fields)
+    ])
+    Entry.objects.bulk_create(
+        (Entry(visit=v, field=f, value_text=str(j), value_int=j) for v in visits for j, f in enumerate(fields)),
+        batch_size=5000,
+    )
+    return study
+
+
+def _run_layout(study, layout, chunk_size, entries):
+    tracemalloc.start()
+    start = time.perf_counter()
+    lines = 0
+    for _ in iter_csv(study, layout, chunk_size):
+        lines += 1
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = lines - 1  # header
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+        "entries_per_sec": round(entries / seconds) if seconds else None,
+        "peak_mem_kb": round(peak / 1024),
+    }
+
+
+def run(visits=2000, fields=50, chunk_size=2000, **_):
+    with rolled_back():
+        study = _seed(visits, fields)
+        results = {layout: _run_layout(study, layout, chunk_size, visits * fields) for layout in ("long", "wide")}
+    return {"benchmark": "export", "visits": visits, "fields": fields, "entries": visits * fields,
+            "chunk_size": chunk_size, "results": results}
@@ -0,0 +1,120 @@
+"""
+Concurrent load on the CRF save path: N threads POSTing visit_entry forms,
+each thread one "worker" with its own database connection, like gunicorn
+threads.
+
+    python manage.py benchmark load --threads 32 --requests 50
+    DB_POOL_ENABLED=1 DB_POOL_MAX_SIZE=8 python manage.py benchmark load --threads 32
+
+Unlike the other benchmarks the data has to be committed (other threads
+can't see a transaction that is rolled back), so a small study is seeded
+first and deleted afterwards. After every request the thread releases its
+connection the way the request_finished handler does for a server: a pooled
+connection goes back to the pool, a persistent one (CONN_MAX_AGE) stays
+with the thread.
+
+Any failed request is reported as a regression. With a pool, the pool's own
+statistics (checkout waits, timeouts) are included. SQLite allows one writer
+at a time, so on the dev database "database is locked" failures appear once
+saves overlap for longer than its busy timeout; point DATABASE_URL at
+Postgres for meaningful numbers.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from ..models import Study, Visit
+from ..synthetic import generate
+from .views import _form_value, _percentile
+
+PREFIX = "LOADBENCH"
+
+
+def add_arguments(parser):
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=25, help="POSTs per thread")
+    parser.add_argument("--fields", type=int, default=20, help="fields on the CRF being saved")
+
+
+def _targets(study):
+    """One visit_entry URL and form per subject: threads spread over subjects, like real users."""
+    crf = study.crfs.order_by("name", "id").first()
+    fields = list(crf.fields.all())
+    targets = []
+    for visit in Visit.objects.filter(subject__study=study).select_related("subject").order_by("id"):
+        url = reverse("core:visit_entry", args=[study.code, visit.subject.subject_id, visit.id]) + f"?crf={crf.id}"
+        targets.append((url, fields))
+    return targets
+
+
+def _worker(n, requests, targets, start):
+    client = Client()
+    timings, errors = [], Counter()
+    start.wait()
+    try:
+        for i in range(requests):
+            url, fields = targets[(n + i * 7) % len(targets)]
+            data = {f.code: _form_value(f, (n + i) % 2) for f in fields}
+            began = time.perf_counter()
+            try:
+                response = client.post(url, data, HTTP_HX_REQUEST="true")
+                if response.status_code >= 400:
+                    errors[f"HTTP {response.status_code}"] += 1
+            except Exception as exc:   # pool timeout, "database is locked", ...
+                errors[type(exc).__name__] += 1
+            timings.append((time.perf_counter() - began) * 1000)
+            close_old_connections()
+    finally:
+        connection.close()
+    return timings, errors
+
+
+def _pool_stats():
+    pool = getattr(connection, "pool", None)
+    return pool.get_stats() if pool is not None else None
+
+
+def run(threads=16, requests=25, fields=20, **_):
+    Study.objects.filter(code__startswith=PREFIX).delete()
+    generate(prefix=PREFIX, seed=1, subjects=threads, visits=2, crfs=1, fields=fields, ae_rate=0, fill=0)
+    study = Study.objects.get(code=f"{PREFIX}-001")
+    targets = _targets(study)
+    start = threading.Barrier(threads)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            began = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                outcomes = list(executor.map(lambda n: _worker(n, requests, targets, start), range(threads)))
+            elapsed = time.perf_counter() - began
+        pool = _pool_stats()
+    finally:
+        study.delete()
+
+    timings = sorted(t for worker_timings, _ in outcomes for t in worker_timings)
+    errors = sum((worker_errors for _, worker_errors in outcomes), Counter())
+    total = len(timings)
+    results = {
+        "requests": total,
+        "errors": dict(errors),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "p99_ms": round(_percentile(timings, 99), 2),
+        "max_ms": round(timings[-1], 2),
+    }
+    regressions = [f"{n} requests failed with {kind}" for kind, n in errors.items()]
+    return {
+        "benchmark": "load",
+        "threads": threads,
+        "database": connections["default"].vendor,
+        "pooled": pool is not None,
+        "results": results,
+        "pool": pool,
+        "regressions": regressions,
+    }
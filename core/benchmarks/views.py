@@ -0,0 +1,179 @@
+"""
+End-to-end benchmark of the core views through the Django test client.
+
+For each dataset size a synthetic study is seeded (core.synthetic), then
+every scenario is requested `repeats` times, recording latency percentiles,
+SQL queries per request and peak Python memory (one tracemalloc pass, kept
+separate so it doesn't skew the timings).
+
+Results can be compared with a stored baseline: a scenario regresses when it
+issues more queries than the baseline, or when its p50 latency exceeds the
+baseline by more than --latency-tolerance.
+
+    python manage.py benchmark views --sizes small medium
+    python manage.py benchmark views --save-baseline
+    pytest -m benchmark
+"""
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import CRFField, Study, Visit
+from ..synthetic import generate
+from . import rolled_back
+
+BASELINE_PATH = Path(__file__).with_name("baseline_views.json")
+
+DATASETS = {
+    "small": dict(subjects=20, visits=3, crfs=2, fields=15, ae_rate=2),
+    "medium": dict(subjects=500, visits=10, crfs=3, fields=40, ae_rate=3),
+    "large": dict(subjects=5000, visits=10, crfs=5, fields=60, ae_rate=5),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument("--sizes", nargs="+", choices=list(DATASETS), default=["small"])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5,
+                        help="allowed p50 slowdown vs. baseline (0.5 = +50%%); negative disables the check")
+
+
+def _form_value(field, flip):
+    if field.field_type == CRFField.INT:
+        return str(100 + flip)
+    if field.field_type == CRFField.FLOAT:
+        return f"{36.5 + flip:.1f}"
+    if field.field_type == CRFField.BOOL:
+        return "on" if flip else ""
+    if field.field_type == CRFField.CHOICE:
+        return field.choices[flip % len(field.choices)]
+    return f"note {flip}"
+
+
+def _scenarios(study):
+    """[(name, callable(client, i) -> response)] against one seeded study."""
+    subjects = list(study.subjects.order_by("subject_id").values_list("subject_id", flat=True))
+    subject_id = subjects[len(subjects) // 2]
+    visit = Visit.objects.filter(subject__study=study, subject__subject_id=subject_id).order_by("visit_date", "id").first()
+    crf = study.crfs.order_by("name", "id").first()
+    fields = list(crf.fields.all())
+    visit_url = reverse("core:visit_entry", args=[study.code, subject_id, visit.id]) + f"?crf={crf.id}"
+
+    def post_crf(client, i):
+        data = {f.code: _form_value(f, i % 2) for f in fields}
+        return client.post(visit_url, data, HTTP_HX_REQUEST="true")
+
+    def post_ae(client, i):
+        return client.post(
+            reverse("core:ae_create", args=[study.code, subject_id]),
+            {"onset": "2024-03-01T08:00", "severity": "mild", "description": f"Benchmark AE {i}"},
+            HTTP_HX_REQUEST="true", HTTP_HX_TARGET="ae-form",
+        )
+
+    def revalidate(url):
+        # A browser re-requesting an unchanged page: If-None-Match -> 304
+        etag = {}
+
+        def request(client, i):
+            if not etag:
+                client.get(url)  # sets the CSRF cookie, which is part of the ETag
+                etag["value"] = client.get(url)["ETag"]
+            return client.get(url, HTTP_IF_NONE_MATCH=etag["value"])
+        return request
+
+    subject_url = reverse("core:subject_detail", args=[study.code, subject_id])
+    return [
+        ("dashboard", lambda c, i: c.get(reverse("core:dashboard"))),
+        ("study_detail", lambda c, i: c.get(reverse("core:study_detail", args=[study.code]))),
+        ("subject_detail", lambda c, i: c.get(subject_url)),
+        ("subject_detail_304", revalidate(subject_url)),
+        ("visit_entry_get", lambda c, i: c.get(visit_url)),
+        ("visit_entry_get_304", revalidate(visit_url)),
+        ("visit_entry_post", post_crf),
+        ("adverse_event_create", post_ae),
+        ("crf_builder", lambda c, i: c.get(reverse("core:crf_builder", args=[study.code]))),
+        ("study_completeness", lambda c, i: c.get(reverse("core:study_completeness", args=[study.code]))),
+    ]
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _run_scenario(client, request, repeats):
+    request(client, 0)  # warm-up (template loading, form class cache, ...)
+
+    tracemalloc.start()
+    request(client, 1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings, queries = [], 0
+    for i in range(repeats):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = request(client, i)
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code} from {response.request['PATH_INFO']}")
+        queries = max(queries, len(ctx.captured_queries))
+    timings.sort()
+    return {
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p90_ms": round(_percentile(timings, 90), 2),
+        "p99_ms": round(_percentile(timings, 99), 2),
+        "max_ms": round(timings[-1], 2),
+        "queries": queries,
+        "peak_mem_kb": round(peak / 1024),
+    }
+
+
+def run_size(size, repeats):
+    # The test client talks to "testserver", which runserver settings don't allow
+    with rolled_back(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        generate(prefix=f"BENCH{size.upper()}", seed=1, **DATASETS[size])
+        study = Study.objects.get(code=f"BENCH{size.upper()}-001")
+        client = Client()
+        return {name: _run_scenario(client, request, repeats) for name, request in _scenarios(study)}
+
+
+def compare(results, baseline, latency_tolerance=0.5):
+    """Return a list of human-readable regressions of `results` vs `baseline`."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, current in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            if current["queries"] > base["queries"]:
+                regressions.append(f"{size}/{name}: {current['queries']} queries (baseline {base['queries']})")
+            if latency_tolerance >= 0 and current["p50_ms"] > base["p50_ms"] * (1 + latency_tolerance):
+                regressions.append(f"{size}/{name}: p50 {current['p50_ms']}ms (baseline {base['p50_ms']}ms)")
+    return regressions
+
+
+def load_baseline(path):
+    path = Path(path)
+    return json.loads(path.read_text())["results"] if path.exists() else {}
+
+
+def run(sizes=("small",), repeats=20, baseline=str(BASELINE_PATH), save_baseline=False,
+        latency_tolerance=0.5, **_):
+    results = {size: run_size(size, repeats) for size in sizes}
+    report = {"benchmark": "views", "repeats": repeats, "results": results}
+    if save_baseline:
+        Path(baseline).write_text(json.dumps(report, indent=2) + "\n")
+        report["regressions"] = []
+    else:
+        report["regressions"] = compare(results, load_baseline(baseline), latency_tolerance)
+    return report
@@ -0,0 +1,20 @@
+"""
+System checks for core (registered in CoreConfig.ready).
+"""
+from django.core.checks import Warning
+from django.db import connections
+
+from .changes import FEED_VENDORS
+
+
+def change_feed_backend(app_configs, **kwargs):
+    """Warn for databases that migration 0012 left without change-feed triggers."""
+    return [
+        Warning(
+            f"Database '{alias}' ({connections[alias].vendor}) has no change-feed triggers: "
+            f"/api/changes/ and manage.py change_feed will return nothing.",
+            hint=f"The change feed (core/changes.py) supports {' and '.join(FEED_VENDORS)} only.",
+            id="core.W001",
+        )
+        for alias in connections if connections[alias].vendor not in FEED_VENDORS
+    ]
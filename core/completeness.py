@@ -0,0 +1,307 @@
+"""
+Study completeness: subjects × visits × active CRFs, filled vs. required fields.
+
+    matrix = completeness.for_study(study)   # cached per process, refreshed on each call
+    matrix.cell(subject_row, visit_column, crf_index) -> Cell or None (no such visit)
+
+A build reads the study's subjects, visits, active CRFs and their fields,
+then counts non-null entries in one grouped query: GROUP BY visit with a
+filtered COUNT per CRF (field_id IN <its fields>). That avoids joining
+every entry to its field, which more than triples the cost. The counts are
+pivoted into flat array("I") buffers indexed
+[(subject_row * n_columns + visit_column) * n_crfs + crf_index], so a
+5,000 subjects × 10 visits × 5 CRFs study takes about 2 MB.
+
+Visit columns are visit names, in the order they first appear; a subject
+with two visits of the same name gets "<name> (2)" for the second one.
+
+refresh() runs one signature query (counts and MAX(updated_at) of subjects,
+visits, CRFs and fields). If the structure is unchanged, it re-aggregates
+entries only for subjects whose last_activity_at (core.counters) is at or
+past the newest stamp seen so far, less REFRESH_OVERLAP. The watermark
+comes from the data rather than the clock, so a read replica that lags
+behind the primary doesn't make a refresh skip writes. Otherwise it
+rebuilds. A writer whose transaction stays open longer than REFRESH_OVERLAP
+commits a stamp already behind the watermark, so the bulk writers (batch
+API, importer, synthetic loads) restamp their subjects after commit
+(counters.restamp_on_commit) and the next refresh counts them. A single
+CRF save left open that long is missed until the next rebuild.
+
+Builds and refreshes of one matrix run one at a time under refresh_lock,
+from the signature query to the watermark update, so a concurrent build
+can't move the watermark past writes a refresh hasn't counted. Readers
+only take lock, held while the buffers are swapped or patched.
+"""
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.db.models import Count, OuterRef, Q
+
+from .conditional import _related
+from .models import CRF, CRFField, Entry, Study, Subject, Visit
+
+# Writes stamped before the newest stamp seen may commit after it
+REFRESH_OVERLAP = timedelta(seconds=5)
+REFRESH_MAX_SUBJECTS = 500
+_MATRIX_CACHE_SIZE = 8
+
+Cell = namedtuple("Cell", "filled_required required filled fields")
+CRFColumn = namedtuple("CRFColumn", "id name required fields")
+
+
+def _signature(study_id):
+    row = (
+        Study.objects.filter(pk=study_id)
+        .annotate(
+            **{f"subjects_{k}": e for k, e in _related(Subject, study=OuterRef("pk")).items()},
+            **{f"visits_{k}": e for k, e in _related(Visit, subject__study=OuterRef("pk")).items()},
+            **{f"crfs_{k}": e for k, e in _related(CRF, study=OuterRef("pk")).items()},
+            **{f"fields_{k}": e for k, e in _related(CRFField, crf__study=OuterRef("pk")).items()},
+        )
+        .values("subjects_n", "subjects_last", "visits_n", "visits_last",
+                "crfs_n", "crfs_last", "fields_n", "fields_last")
+        .first()
+    )
+    return tuple(row.values()) if row else None
+
+
+class CompletenessMatrix:
+    def __init__(self, study_id):
+        self.study_id = study_id
+        self.lock = threading.Lock()          # readers vs. swapping or patching the buffers
+        self.refresh_lock = threading.Lock()  # one build or refresh at a time
+        self.watermark = None        # newest last_activity_at counted
+        self.counted = {}            # {subject pk: last_activity_at} counted within the overlap
+        self.build()
+
+    # --- building -----------------------------------------------------------
+
+    def build(self):
+        with self.refresh_lock:
+            self._build()
+
+    def _build(self):
+        signature = _signature(self.study_id)
+
+        crfs = list(
+            CRF.objects.filter(study_id=self.study_id, is_active=True).order_by("name", "id").values_list("id", "name")
+        )
+        fields = list(
+            CRFField.objects.filter(crf__study_id=self.study_id, crf__is_active=True).values_list("id", "crf_id", "required")
+        )
+        subjects = list(
+            Subject.objects.filter(study_id=self.study_id).order_by("subject_id")
+            .values_list("id", "subject_id", "last_activity_at")
+        )
+        stamps = {pk: stamp for pk, _, stamp in subjects if stamp is not None}
+        subjects = [(pk, subject_id) for pk, subject_id, _ in subjects]
+        visits = (
+            Visit.objects.filter(subject__study_id=self.study_id)
+            .order_by("subject__subject_id", "visit_date", "id")
+            .values_list("id", "subject_id", "name")
+        )
+
+        subject_rows = {pk: row for row, (pk, _) in enumerate(subjects)}
+        columns = {}         # column label -> index
+        placed = []          # (visit_id, subject row, column label)
+        seen = {}            # (subject_id, name) -> occurrences so far
+        for visit_id, subject_pk, name in visits.iterator(chunk_size=5000):
+            n = seen[subject_pk, name] = seen.get((subject_pk, name), 0) + 1
+            label = name if n == 1 else f"{name} ({n})"
+            columns.setdefault(label, len(columns))
+            placed.append((visit_id, subject_rows[subject_pk], label))
+
+        crf_fields = {crf_id: ([], []) for crf_id, _ in crfs}   # crf -> (field ids, required field ids)
+        for field_id, crf_id, required in fields:
+            crf_fields[crf_id][0].append(field_id)
+            if required:
+                crf_fields[crf_id][1].append(field_id)
+        crfs = [CRFColumn(crf_id, name, len(crf_fields[crf_id][1]), len(crf_fields[crf_id][0])) for crf_id, name in crfs]
+        n_cols, n_crfs = len(columns), len(crfs)
+        size = len(subjects) * n_cols
+        visit_ids = array("Q", bytes(8 * size))      # 0 = no visit in this cell
+        visit_cell = {}
+        for visit_id, row, label in placed:
+            cell = row * n_cols + columns[label]
+            visit_ids[cell] = visit_id
+            visit_cell[visit_id] = cell
+        counts = self._entry_counts(crf_fields)
+
+        # Readers see either the old matrix or the new one, never a mix
+        with self.lock:
+            self.crfs = crfs
+            self.crf_fields = crf_fields
+            self.crf_index = {crf.id: i for i, crf in enumerate(crfs)}
+            self.subjects = subjects
+            self.subject_rows = subject_rows
+            self.columns = list(columns)
+            self.visit_ids = visit_ids
+            self.visit_cell = visit_cell
+            self.filled = array("I", bytes(4 * size * n_crfs))
+            self.filled_required = array("I", bytes(4 * size * n_crfs))
+            self._apply(counts)
+            self.signature = signature
+            self._advance(stamps)
+
+    def _entry_counts(self, crf_fields, subject_pks=None):
+        """
+        [(visit_id, filled CRF 1, filled required CRF 1, filled CRF 2, ...)]
+        in CRF order, from one query grouped by visit.
+        """
+        visits = Visit.objects.filter(subject__study_id=self.study_id)
+        if subject_pks is not None:
+            visits = visits.filter(subject_id__in=subject_pks)
+        counts = {}
+        for i, (field_ids, required_ids) in enumerate(crf_fields.values()):
+            counts[f"f{i}"] = Count("pk", filter=Q(field_id__in=field_ids))
+            counts[f"r{i}"] = Count("pk", filter=Q(field_id__in=required_ids))
+        if not counts:
+            return []
+        rows = (
+            Entry.objects.filter(visit__in=visits, value_text__isnull=False)
+            .order_by().values("visit_id").annotate(**counts)
+            .values_list("visit_id", *counts)
+        )
+        return list(rows.iterator(chunk_size=5000))
+
+    def _apply(self, counts):
+        n_crfs = len(self.crfs)
+        for visit_id, *per_crf in counts:
+            cell = self.visit_cell.get(visit_id)
+            if cell is None:
+                continue  # created after the structure was read; the next refresh rebuilds
+            base = cell * n_crfs
+            self.filled[base:base + n_crfs] = array("I", per_crf[0::2])
+            self.filled_required[base:base + n_crfs] = array("I", per_crf[1::2])
+
+    def refresh(self):
+        """Bring the matrix up to date: rebuild on structural change, else re-count touched subjects."""
+        with self.refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        if _signature(self.study_id) != self.signature:
+            self._build()
+            return
+        subjects = Subject.objects.filter(study_id=self.study_id, last_activity_at__isnull=False)
+        if self.watermark is not None:
+            subjects = subjects.filter(last_activity_at__gte=self.watermark - REFRESH_OVERLAP)
+        stamps = dict(subjects.values_list("pk", "last_activity_at"))
+        # Subjects inside the overlap window come back every time: skip those already counted
+        touched = [pk for pk, stamp in stamps.items() if self.counted.get(pk) != stamp]
+        if len(touched) > REFRESH_MAX_SUBJECTS:
+            self._build()  # a bulk load touched most of the study: cheaper to start over
+            return
+        counts = self._entry_counts(self.crf_fields, touched) if touched else []
+        with self.lock:
+            n_cells = len(self.columns) * len(self.crfs)
+            for pk in touched:
+                row = self.subject_rows.get(pk)
+                if row is not None:
+                    zeros = array("I", bytes(4 * n_cells))
+                    self.filled[row * n_cells:(row + 1) * n_cells] = zeros
+                    self.filled_required[row * n_cells:(row + 1) * n_cells] = zeros
+            self._apply(counts)
+            self._advance(stamps)
+
+    def _advance(self, stamps):
+        """Move the watermark to the newest of `stamps` ({subject pk: last_activity_at} just counted)."""
+        if stamps:
+            newest = max(stamps.values())
+            if self.watermark is None or newest > self.watermark:
+                self.watermark = newest
+        floor = self.watermark - REFRESH_OVERLAP if self.watermark is not None else None
+        self.counted = {pk: stamp for pk, stamp in stamps.items() if floor is None or stamp >= floor}
+
+    # --- reading --------------------------------------------------------------
+
+    def cell(self, row, column, crf):
+        """Counts for one subject/visit/CRF, or None if the subject has no such visit."""
+        with self.lock:
+            cell = row * len(self.columns) + column
+            if not self.visit_ids[cell]:
+                return None
+            i = cell * len(self.crfs) + crf
+            info = self.crfs[crf]
+            return Cell(self.filled_required[i], info.required, self.filled[i], info.fields)
+
+    def rows(self, crfs=None):
+        """
+        [(subject_id, [Cell or None per visit column])], counts summed over
+        `crfs` (CRF indexes; default all active CRFs).
+        """
+        with self.lock:
+            crfs = range(len(self.crfs)) if crfs is None else crfs
+            required = sum(self.crfs[c].required for c in crfs)
+            fields = sum(self.crfs[c].fields for c in crfs)
+            n_cols, n_crfs = len(self.columns), len(self.crfs)
+            filled, filled_required, visit_ids = self.filled, self.filled_required, self.visit_ids
+            rows = []
+            for row, (_, subject_id) in enumerate(self.subjects):
+                cells = []
+                for cell in range(row * n_cols, (row + 1) * n_cols):
+                    if not visit_ids[cell]:
+                        cells.append(None)
+                        continue
+                    base = cell * n_crfs
+                    cells.append(Cell(
+                        sum(filled_required[base + c] for c in crfs), required,
+                        sum(filled[base + c] for c in crfs), fields,
+                    ))
+                rows.append((subject_id, cells))
+            return rows
+
+    def as_json(self):
+        """Per-CRF counts: cells[column] is None or [[filled_required, filled] per CRF]."""
+        with self.lock:
+            n_cols, n_crfs = len(self.columns), len(self.crfs)
+            subjects = []
+            for row, (_, subject_id) in enumerate(self.subjects):
+                cells = []
+                for cell in range(row * n_cols, (row + 1) * n_cols):
+                    if not self.visit_ids[cell]:
+                        cells.append(None)
+                        continue
+                    base = cell * n_crfs
+                    cells.append([list(pair) for pair in zip(
+                        self.filled_required[base:base + n_crfs], self.filled[base:base + n_crfs]
+                    )])
+                subjects.append({"subject_id": subject_id, "cells": cells})
+            return {
+                "columns": list(self.columns),
+                "crfs": [crf._asdict() for crf in self.crfs],
+                "subjects": subjects,
+            }
+
+
+_matrices = OrderedDict()
+_matrices_lock = threading.Lock()
+
+
+def for_study(study):
+    """The study's matrix, built on first use and refreshed on every later call."""
+    with _matrices_lock:
+        matrix = _matrices.get(study.pk)
+        if matrix is not None:
+            _matrices.move_to_end(study.pk)
+    if matrix is not None:
+        matrix.refresh()
+        return matrix
+
+    matrix = CompletenessMatrix(study.pk)
+    with _matrices_lock:
+        _matrices[study.pk] = matrix
+        while len(_matrices) > _MATRIX_CACHE_SIZE:
+            _matrices.popitem(last=False)
+    return matrix
+
+
+def invalidate(study_id=None):
+    """Drop the cached matrix of one study (or all)."""
+    with _matrices_lock:
+        if study_id is None:
+            _matrices.clear()
+        else:
+            _matrices.pop(study_id, None)
@@ -0,0 +1,171 @@
+"""
+Conditional GET for the read pages.
+
+Each page has a *state* function that fetches, in one aggregate query, what
+its content depends on: row counts and MAX(updated_at) of the tables it
+shows. Counts catch deletes, the maxima catch inserts and edits. The ETag
+is a digest of that state plus what else varies the response (full path,
+htmx partial vs. full page, CSRF cookie), so a repeat request whose
+If-None-Match still matches gets a 304 without the view or templates
+running. Last-Modified (the newest timestamp) is sent too, but only the
+ETag notices deletes; clients that send both are matched on the ETag.
+
+A request with django.contrib.messages waiting (the flash after a
+POST/redirect) always gets the page rendered, even if nothing changed:
+the cached copy doesn't show them. Its ETag is marked too, so that page
+isn't reused once the messages are gone.
+
+    @conditional_page(subject_state)
+    def subject_detail(request, study_code, subject_id): ...
+
+Coroutine views (core/async_views.py) are wrapped the same way; their state
+query runs through sync_to_async.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import CRF, AdverseEvent, CRFField, Entry, Study, Subject, Visit
+
+
+def _related(model, **filters):
+    """COUNT(*) and MAX(updated_at) of `model` rows matching filters, as two correlated subqueries."""
+    rows = model.objects.filter(**filters).order_by()
+    return {
+        "n": Subquery(rows.values(*filters).annotate(n=Count("pk")).values("n")),
+        "last": Subquery(rows.values(*filters).annotate(last=Max("updated_at")).values("last")),
+    }
+
+
+def _flat(prefix, exprs):
+    return {f"{prefix}_{key}": expr for key, expr in exprs.items()}
+
+
+def dashboard_state(request):
+    # last_activity_at moves with the activity counters shown on each row
+    return Study.objects.aggregate(n=Count("pk"), last=Max("updated_at"), activity=Max("last_activity_at"))
+
+
+def study_state(request, study_code):
+    return (
+        Study.objects.filter(code=study_code)
+        .annotate(**_flat("subjects", _related(Subject, study=OuterRef("pk"))))
+        .values("updated_at", "last_activity_at", "subjects_n", "subjects_last")
+        .first()
+    )
+
+
+def subject_state(request, study_code, subject_id):
+    return (
+        Subject.objects.filter(study__code=study_code, subject_id=subject_id)
+        .annotate(
+            study_updated_at=F("study__updated_at"),
+            **_flat("visits", _related(Visit, subject=OuterRef("pk"))),
+            **_flat("aes", _related(AdverseEvent, subject=OuterRef("pk"))),
+        )
+        .values("updated_at", "study_updated_at", "visits_n", "visits_last", "aes_n", "aes_last")
+        .first()
+    )
+
+
+def visit_entry_state(request, study_code, subject_id, visit_id):
+    # CRFs and fields of the whole study: the CRF tabs and the selected form depend on them
+    return (
+        Visit.objects.filter(id=visit_id, subject__subject_id=subject_id, subject__study__code=study_code)
+        .annotate(
+            subject_updated_at=F("subject__updated_at"),
+            study_updated_at=F("subject__study__updated_at"),
+            **_flat("crfs", _related(CRF, study=OuterRef("subject__study"))),
+            **_flat("fields", _related(CRFField, crf__study=OuterRef("subject__study"))),
+            **_flat("entries", _related(Entry, visit=OuterRef("pk"))),
+        )
+        .values("updated_at", "subject_updated_at", "study_updated_at", "crfs_n", "crfs_last",
+                "fields_n", "fields_last", "entries_n", "entries_last")
+        .first()
+    )
+
+
+def _has_messages(request):
+    # len() loads the stored messages without marking them shown
+    return hasattr(request, "_messages") and len(get_messages(request)) > 0
+
+
+def _etag(request, state):
+    parts = [
+        request.get_full_path(),
+        request.headers.get("HX-Request", ""),
+        # Pages embed a CSRF token derived from this cookie
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        "messages" if _has_messages(request) else "",
+        *(f"{key}={state[key]!r}" for key in sorted(state)),
+    ]
+    return quote_etag(hashlib.md5("\n".join(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def _last_modified(state):
+    stamps = [value for value in state.values() if isinstance(value, datetime)]
+    return int(max(stamps).timestamp()) if stamps else None
+
+
+def conditional_page(state_func):
+    """
+    Answer GET/HEAD with 304 when the client's validators still match
+    state_func(request, *args, **kwargs). A state of None (object not found)
+    lets the view run and produce its own 404.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                state = await sync_to_async(state_func)(request, *args, **kwargs)
+                if state is None:
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = _etag(request, state), _last_modified(state)
+                response = _not_modified(request, etag, last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _add_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = _etag(request, state), _last_modified(state)
+            response = _not_modified(request, etag, last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def _not_modified(request, etag, last_modified):
+    """The 304 (or 412) answer if the client's validators match, else None."""
+    if _has_messages(request):
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if last_modified is not None:
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+    # Browsers (and htmx's XHRs) revalidate on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("HX-Request", "Cookie"))
+    return response
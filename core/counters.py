@@ -0,0 +1,160 @@
+"""
+Denormalized activity counters on Study and Subject.
+
+    Study:   subject_count, visit_count, ae_count, entry_count, last_activity_at
+    Subject: visit_count, ae_count, entry_count, last_activity_at
+
+Listing pages read them straight off the rows they show, instead of
+COUNT joins over Visit, AdverseEvent and Entry.
+
+Writers keep them current with F() updates inside their own transaction:
+single-row saves and deletes through signals (core.signals; a delete is
+counted down once for its cascade root, not per cascaded row), the bulk CRF
+save and the batch API explicitly (bulk_create sends no signals). Importer
+and synthetic loads call recount() for their study when done, and
+`manage.py recount` repairs any drift.
+
+A stamp is taken when the row is written, not when it commits. Readers
+that follow last_activity_at with a bounded overlap (core.completeness)
+would lose a transaction that stays open longer than that, so the bulk
+writers restamp what they touched once they commit (restamp_on_commit).
+
+Every write in a study updates that study's row, so concurrent writers in
+one study queue on its row lock until they commit. Keep those transactions
+short.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Value, When
+from django.utils import timezone
+
+from .models import AdverseEvent, Entry, Study, Subject, Visit
+
+COUNT_FIELDS = ("visit_count", "ae_count", "entry_count")
+
+
+def record(*, visit_id=None, subject_id=None, study_id=None, subjects=0, visits=0, aes=0, entries=0):
+    """
+    Add the given deltas (negative for deletes) to the owning subject and
+    study and stamp their last activity. Pass the most specific id known:
+    the subject and study are found in the UPDATE itself, with no extra SELECT.
+    """
+    now = timezone.now()
+    deltas = {"visit_count": visits, "ae_count": aes, "entry_count": entries}
+    changes = {column: F(column) + n for column, n in deltas.items() if n}
+    if visit_id is not None:
+        subject_rows = Subject.objects.filter(visits=visit_id)
+        study_rows = Study.objects.filter(subjects__visits=visit_id)
+    elif subject_id is not None:
+        subject_rows = Subject.objects.filter(pk=subject_id)
+        study_rows = Study.objects.filter(subjects=subject_id)
+    else:
+        subject_rows = None
+        study_rows = Study.objects.filter(pk=study_id)
+
+    if subject_rows is not None:
+        subject_rows.update(**changes, last_activity_at=now)
+    if subjects:
+        changes["subject_count"] = F("subject_count") + subjects
+    study_rows.update(**changes, last_activity_at=now)
+
+
+def record_entries(study_id, by_subject):
+    """
+    record() for a batch spanning many subjects (core.batch): add
+    {subject pk: new entries} to each subject and the total to the study,
+    stamping all of them, in two UPDATEs.
+    """
+    now = timezone.now()
+    delta = Case(*(When(pk=pk, then=Value(n)) for pk, n in by_subject.items()), default=Value(0))
+    Subject.objects.filter(pk__in=list(by_subject)).update(entry_count=F("entry_count") + delta, last_activity_at=now)
+    Study.objects.filter(pk=study_id).update(
+        entry_count=F("entry_count") + sum(by_subject.values()), last_activity_at=now
+    )
+
+
+def restamp_on_commit(study_id, *, subject_ids=None, since=None):
+    """
+    Once the current transaction commits (straight away outside one), stamp
+    the study and its subjects `subject_ids`, or those active at or after
+    datetime `since`, with the time of the commit.
+    """
+    def restamp():
+        now = timezone.now()
+        subjects = Subject.objects.filter(study_id=study_id)
+        if subject_ids is not None:
+            subjects = subjects.filter(pk__in=list(subject_ids))
+        if since is not None:
+            subjects = subjects.filter(last_activity_at__gte=since)
+        subjects.update(last_activity_at=now)
+        Study.objects.filter(pk=study_id).update(last_activity_at=now)
+
+    transaction.on_commit(restamp)
+
+
+def _by_subject(queryset, subject_path):
+    """{subject_id: (count, max updated_at)} in one grouped query."""
+    rows = queryset.order_by().values(subject_path).annotate(n=Count("pk"), last=Max("updated_at"))
+    return {row[subject_path]: (row["n"], row["last"]) for row in rows}
+
+
+def _latest(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+
+def recount(study_ids=None, dry_run=False):
+    """
+    Recompute the counters from the data, study by study (three grouped
+    queries each), and write back only rows that drifted. last_activity_at
+    only ever moves forward: deletes stamp it too, which the data can't show.
+
+    Returns {"studies": n, "subjects": n} rows that were (or, with dry_run,
+    would be) repaired.
+    """
+    studies = Study.objects.order_by("pk")
+    if study_ids is not None:
+        studies = studies.filter(pk__in=study_ids)
+
+    fixed = {"studies": 0, "subjects": 0}
+    now = timezone.now()
+    for study in studies.iterator():
+        visits = _by_subject(Visit.objects.filter(subject__study=study), "subject_id")
+        aes = _by_subject(AdverseEvent.objects.filter(subject__study=study), "subject_id")
+        entries = _by_subject(Entry.objects.filter(visit__subject__study=study), "visit__subject_id")
+
+        totals = dict.fromkeys(["subject_count", *COUNT_FIELDS], 0)
+        study_last = None
+        drifted = []
+        subjects = study.subjects.only("pk", "updated_at", "last_activity_at", *COUNT_FIELDS)
+        for subject in subjects.iterator():
+            (n_visits, v_last), (n_aes, a_last), (n_entries, e_last) = (
+                source.get(subject.pk, (0, None)) for source in (visits, aes, entries)
+            )
+            expected = {"visit_count": n_visits, "ae_count": n_aes, "entry_count": n_entries}
+            last = _latest(subject.last_activity_at, v_last, a_last, e_last)
+            totals["subject_count"] += 1
+            for column, n in expected.items():
+                totals[column] += n
+            study_last = _latest(study_last, last)
+
+            if any(getattr(subject, c) != n for c, n in expected.items()) or last != subject.last_activity_at:
+                for column, n in expected.items():
+                    setattr(subject, column, n)
+                subject.last_activity_at = last
+                subject.updated_at = now
+                drifted.append(subject)
+
+        last = _latest(study.last_activity_at, study_last)
+        study_drifted = (
+            drifted
+            or any(getattr(study, c) != n for c, n in totals.items())
+            or last != study.last_activity_at
+        )
+        fixed["subjects"] += len(drifted)
+        fixed["studies"] += bool(study_drifted)
+        if dry_run or not study_drifted:
+            continue
+        Subject.objects.bulk_update(drifted, [*COUNT_FIELDS, "last_activity_at", "updated_at"], batch_size=1000)
+        # updated_at changes the conditional-GET validators of the pages showing these counts
+        Study.objects.filter(pk=study.pk).update(**totals, last_activity_at=last, updated_at=now)
+    return fixed
@@ -0,0 +1,253 @@
+"""
+Materialized wide "dataset" tables, one per CRF.
+
+Analytics reads that pivot the EAV Entry table per request are slow and load
+the table every CRF save writes to. A dataset table holds the same data one
+row per visit:
+
+    visit_id | subject_id | subject_code | visit_name | visit_date | updated_at | f_bp_sys | f_temp_c | ...
+
+with one typed column per CRFField (bigint, double, boolean, varchar or
+text, from the typed Entry.value_* columns). Every non-text column is
+indexed, so plain filters (f_bp_sys > 140 AND f_status = 'Critical') run
+on an index:
+
+    Row = datasets.model_for(crf.dataset)       # unmanaged model over the table
+    Row.objects.filter(f_bp_sys__gt=140)
+
+Opt-in with DATASETS_ENABLED=1, then:
+
+  - `manage.py build_datasets` (re)creates the tables with one
+    INSERT ... SELECT pivot each;
+  - CRF saves, imports and single Entry edits refresh the touched visits'
+    rows in the same transaction (refresh());
+  - adding, editing or removing a CRFField marks the dataset stale: refresh()
+    skips it until build_datasets rebuilds it.
+"""
+import re
+import threading
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection, models, transaction
+from django.db.models import Case, Max, Value, When
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+from .models import CRFField, Dataset, Entry
+
+TABLE_PREFIX = "dataset_crf_"
+META_COLUMNS = ["visit_id", "subject_id", "subject_code", "visit_name", "visit_date", "updated_at"]
+
+_FIELD_TYPES = {
+    CRFField.INT: lambda: models.BigIntegerField(null=True, db_index=True),
+    CRFField.FLOAT: lambda: models.FloatField(null=True, db_index=True),
+    CRFField.BOOL: lambda: models.BooleanField(null=True, db_index=True),
+    CRFField.CHOICE: lambda: models.CharField(max_length=255, null=True, db_index=True),
+    CRFField.TEXT: lambda: models.TextField(null=True),
+}
+
+
+def enabled():
+    return getattr(settings, "DATASETS_ENABLED", False)
+
+
+def column_names(fields):
+    """[(field, column)]: f_<code>, made SQL-safe and unique."""
+    used = set(META_COLUMNS)
+    columns = []
+    for f in fields:
+        column = "f_" + re.sub(r"[^a-z0-9_]", "_", f.code.lower())[:50]
+        if column in used:
+            column = f"{column}_{f.id}"
+        used.add(column)
+        columns.append((f, column))
+    return columns
+
+
+# --- the unmanaged model over a dataset table ---------------------------------
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def model_for(dataset):
+    """An unmanaged model class for the dataset's table, cached per build."""
+    key = (dataset.pk, dataset.built_at)
+    with _models_lock:
+        model = _models.get(key)
+    if model is not None:
+        return model
+
+    attrs = {
+        "__module__": __name__,
+        # A private registry per build: rebuilt tables never clash with old classes
+        "Meta": type("Meta", (), {"db_table": dataset.table_name, "apps": Apps(), "app_label": "datasets",
+                                  "managed": False}),
+        "visit_id": models.BigIntegerField(primary_key=True),
+        "subject_id": models.BigIntegerField(db_index=True),
+        "subject_code": models.CharField(max_length=64),
+        "visit_name": models.CharField(max_length=100),
+        "visit_date": models.DateField(db_index=True),
+        "updated_at": models.DateTimeField(),
+    }
+    for _, column, field_type in dataset.columns:
+        attrs[column] = _FIELD_TYPES[field_type]()
+    model = type(f"Dataset{dataset.crf_id}", (models.Model,), attrs)
+    with _models_lock:
+        for stale_key in [k for k in _models if k[0] == dataset.pk]:
+            del _models[stale_key]
+        _models[key] = model
+    return model
+
+
+# --- pivot ---------------------------------------------------------------------
+
+def _pivot(dataset, entries):
+    """
+    `entries` grouped by visit into one row per visit, one aggregate column
+    per field: MAX(CASE WHEN field_id = <id> THEN <typed value> END).
+    """
+    typed = {CRFField.TEXT: "value_text", **Entry.TYPED_COLUMNS}
+    columns = {}
+    for field_id, column, field_type in dataset.columns:
+        if field_type == CRFField.BOOL:
+            # No MAX(boolean) on Postgres: aggregate 0/1, compare back to a boolean
+            as_int = Case(When(value_bool=True, then=Value(1)), When(value_bool=False, then=Value(0)))
+            columns[column] = Exact(Max(Case(When(field_id=field_id, then=as_int))), 1)
+        else:
+            columns[column] = Max(Case(When(field_id=field_id, then=typed[field_type])))
+    return (
+        entries.filter(field_id__in=[field_id for field_id, _, _ in dataset.columns])
+        .order_by()
+        .values("visit_id")
+        .annotate(
+            row_subject_id=Max("visit__subject_id"),
+            subject_code=Max("visit__subject__subject_id"),
+            visit_name=Max("visit__name"),
+            visit_date=Max("visit__visit_date"),
+            row_updated_at=Max("updated_at"),
+            **columns,
+        )
+        .values_list("visit_id", "row_subject_id", "subject_code", "visit_name", "visit_date", "row_updated_at",
+                     *columns)
+    )
+
+
+# --- build -----------------------------------------------------------------------
+
+def _ddl(operation, model):
+    """
+    Run a schema editor operation in the current transaction. The SQLite
+    editor refuses to open inside one (it toggles foreign key checks), so the
+    statements are collected and executed here; dataset tables have no
+    foreign keys to check.
+    """
+    editor = connection.schema_editor(collect_sql=True)
+    editor.deferred_sql = []   # normally set up by __enter__
+    getattr(editor, operation)(model)
+    with connection.cursor() as cursor:
+        for sql in [*editor.collected_sql, *map(str, editor.deferred_sql)]:
+            cursor.execute(sql)
+
+
+@transaction.atomic
+def build(crf):
+    """(Re)create the CRF's dataset table from its current fields and entries."""
+    fields = list(crf.fields.all())
+    table = f"{TABLE_PREFIX}{crf.pk}"
+    old = Dataset.objects.filter(crf=crf).first()
+    dataset = old or Dataset(crf=crf, table_name=table)
+    dataset.columns = [[f.id, column, f.field_type] for f, column in column_names(fields)]
+    dataset.stale = False
+    dataset.built_at = timezone.now()
+
+    if old is not None:
+        _ddl("delete_model", model_for(old))
+    dataset.save()
+    _ddl("create_model", model_for(dataset))
+
+    if dataset.columns:
+        sql, params = _pivot(dataset, Entry.objects.all()).query.sql_with_params()
+        quote = connection.ops.quote_name
+        target = ", ".join(quote(c) for c in [*META_COLUMNS, *(column for _, column, _ in dataset.columns)])
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {quote(table)} ({target}) {sql}", params)
+    return dataset
+
+
+def drop(dataset):
+    _ddl("delete_model", model_for(dataset))
+
+
+# --- incremental refresh -------------------------------------------------------
+
+def refresh(crf_id, visit_ids):
+    """
+    Re-pivot the given visits into the CRF's dataset (no-op when datasets are
+    disabled, not built, or stale). Call inside the transaction that wrote the
+    entries, so the dataset never shows values that were rolled back.
+    """
+    if not enabled() or not visit_ids:
+        return
+    dataset = Dataset.objects.filter(crf_id=crf_id, stale=False).first()
+    if dataset is None:
+        return
+    model = model_for(dataset)
+    visit_ids = list(visit_ids)
+    rows = list(_pivot(dataset, Entry.objects.filter(visit_id__in=visit_ids)))
+    names = ["visit_id", "subject_id", "subject_code", "visit_name", "visit_date", "updated_at",
+             *(column for _, column, _ in dataset.columns)]
+    if rows:
+        model.objects.bulk_create(
+            [model(**dict(zip(names, row))) for row in rows],
+            update_conflicts=True, unique_fields=["visit_id"], update_fields=names[1:],
+        )
+    # Visits left without entries for this CRF drop out of the dataset
+    gone = set(visit_ids) - {row[0] for row in rows}
+    if gone:
+        model.objects.filter(visit_id__in=gone).delete()
+
+
+def remove_visits(study_id, visit_ids):
+    """Drop deleted visits' rows from the study's datasets (stale ones too)."""
+    if not enabled() or not visit_ids:
+        return
+    for dataset in Dataset.objects.filter(crf__study_id=study_id):
+        model_for(dataset).objects.filter(visit_id__in=list(visit_ids)).delete()
+
+
+def mark_stale(crf_id):
+    Dataset.objects.filter(crf_id=crf_id, stale=False).update(stale=True)
+
+
+
+# --- querying -------------------------------------------------------------------
+
+FILTER_LOOKUPS = ("exact", "gt", "gte", "lt", "lte", "isnull")
+
+
+def filter_rows(dataset, params):
+    """
+    The dataset's rows filtered by query-string style params
+    ({"f_bp_sys__gt": "140", "f_status": "Critical"}), values already typed.
+    Raises ValueError for an unknown column or lookup, or a bad value.
+    """
+    model = model_for(dataset)
+    filters = {}
+    for key, raw in params.items():
+        column, _, lookup = key.partition("__")
+        lookup = lookup or "exact"
+        try:
+            field = model._meta.get_field(column)
+        except FieldDoesNotExist:
+            raise ValueError(f"unknown column {column!r}") from None
+        if lookup not in FILTER_LOOKUPS:
+            raise ValueError(f"unsupported lookup {lookup!r}")
+        try:
+            value = raw.lower() == "true" if lookup == "isnull" else field.to_python(raw)
+        except ValidationError as exc:
+            raise ValueError(f"bad value for {key}: {raw!r}") from exc
+        filters[f"{column}__{lookup}"] = value
+    return model.objects.filter(**filters)
@@ -0,0 +1,86 @@
+"""
+Streaming CSV export of a study's captured data.
+
+Two layouts:
+  long -> one row per Entry: subject, visit, CRF, field code, value
+  wide -> one row per visit, one column per CRFField.code
+
+Rows are pulled with .iterator(chunk_size=...) (a server-side cursor on
+Postgres) and written one at a time, so memory stays flat however many
+entries the study has.
+"""
+import csv
+from itertools import groupby
+
+from .models import CRFField, Entry
+
+CHUNK_SIZE = 2000
+LAYOUTS = ("long", "wide")
+
+LONG_HEADER = ["subject_id", "visit_id", "visit_name", "visit_date", "crf", "field_code", "value"]
+VISIT_HEADER = ["subject_id", "visit_id", "visit_name", "visit_date"]
+
+
+class Echo:
+    """File-like object whose write() just returns the line (for csv.writer)."""
+    def write(self, value):
+        return value
+
+
+def _study_entries(study):
+    return (
+        Entry.objects.filter(visit__subject__study=study)
+        .order_by("visit__subject__subject_id", "visit__visit_date", "visit_id", "field__order", "field_id")
+    )
+
+
+def iter_long_rows(study, chunk_size=CHUNK_SIZE):
+    yield LONG_HEADER
+    rows = _study_entries(study).values_list(
+        "visit__subject__subject_id", "visit_id", "visit__name", "visit__visit_date",
+        "field__crf__name", "field__code", "value_text",
+    )
+    yield from rows.iterator(chunk_size=chunk_size)
+
+
+def wide_columns(study):
+    """
+    [(field_id, column name)] in CRF/field order. Codes are unique per CRF
+    only, so a code used by several CRFs is qualified as "<crf>.<code>".
+    """
+    fields = list(
+        CRFField.objects.filter(crf__study=study)
+        .order_by("crf__name", "crf_id", "order", "id")
+        .values_list("id", "code", "crf__name")
+    )
+    seen = {}
+    for _, code, _ in fields:
+        seen[code] = seen.get(code, 0) + 1
+    return [(fid, code if seen[code] == 1 else f"{crf}.{code}") for fid, code, crf in fields]
+
+
+def iter_wide_rows(study, chunk_size=CHUNK_SIZE):
+    columns = wide_columns(study)
+    position = {fid: i for i, (fid, _) in enumerate(columns)}
+    yield VISIT_HEADER + [name for _, name in columns]
+
+    rows = _study_entries(study).values_list(
+        "visit__subject__subject_id", "visit_id", "visit__name", "visit__visit_date",
+        "field_id", "value_text",
+    ).iterator(chunk_size=chunk_size)
+    # Entries arrive grouped by visit, so only one visit is held at a time
+    for visit_key, entries in groupby(rows, key=lambda r: r[:4]):
+        values = [None] * len(columns)
+        for *_, field_id, value in entries:
+            i = position.get(field_id)  # None if the field was added mid-export
+            if i is not None:
+                values[i] = value
+        yield list(visit_key) + values
+
+
+def iter_csv(study, layout="long", chunk_size=CHUNK_SIZE):
+    """Yield CSV-encoded lines for the chosen layout."""
+    rows = iter_wide_rows(study, chunk_size) if layout == "wide" else iter_long_rows(study, chunk_size)
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
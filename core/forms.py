@@ -1,4 +1,7 @@
 import json
+import threading
+from collections import OrderedDict
+
 from django import forms
 from .models import CRF, AdverseEvent, CRFField, Entry
 
@@ -79,23 +82,62 @@ def _form_field_for_crf_field(f: CRFField):
     # Fallback
     return forms.CharField(label=f.name, required=f.required)
 
-def make_crf_entry_form(crf: CRF, initial_data=None, post_data=None):
+# Compiled form classes, keyed by (crf_id, fingerprint of its fields).
+# Form instances deep-copy base_fields, so a class can be shared safely.
+_FORM_CLASS_CACHE_SIZE = 256
+_form_class_cache = OrderedDict()
+_form_class_lock = threading.Lock()
+
+
+def _crf_fields_fingerprint(fields):
+    """Everything about the fields that affects the built form."""
+    return tuple(
+        (f.id, f.code, f.name, f.field_type, json.dumps(f.choices), f.required, f.order)
+        for f in fields
+    )
+
+
+def get_crf_entry_form_class(crf: CRF):
     """
-    Build a dynamic form class with one field per CRFField (ordered).
-    initial_data: dict of {field_code: value} to prefill from existing entries.
-    post_data: request.POST if submitting.
+    Return the (cached) form class for a CRF.
+    Uses crf.fields.all(), so a prefetched CRF costs no queries at all.
     """
-    fields = crf.fields.all().order_by("order", "id")
+    fields = list(crf.fields.all())  # Meta.ordering = order, id
+    key = (crf.pk, _crf_fields_fingerprint(fields))
+
+    with _form_class_lock:
+        form_class = _form_class_cache.get(key)
+        if form_class is not None:
+            _form_class_cache.move_to_end(key)
+            return form_class
 
-    # Build form subclass on the fly
     class _CRFEntryForm(forms.Form):
         pass
 
     for f in fields:
-        form_field = _form_field_for_crf_field(f)
-        # Pre-fill initial values (strings) if provided
-        if initial_data and f.code in initial_data:
-            form_field.initial = initial_data[f.code]
-        _CRFEntryForm.base_fields[f.code] = form_field
+        _CRFEntryForm.base_fields[f.code] = _form_field_for_crf_field(f)
 
-    return _CRFEntryForm(post_data) if post_data is not None else _CRFEntryForm()
\ No newline at end of file
+    with _form_class_lock:
+        _form_class_cache[key] = _CRFEntryForm
+        while len(_form_class_cache) > _FORM_CLASS_CACHE_SIZE:
+            _form_class_cache.popitem(last=False)
+    return _CRFEntryForm
+
+
+def invalidate_crf_form_cache(crf_id):
+    """Drop cached form classes for a CRF (called when its fields change)."""
+    with _form_class_lock:
+        for key in [k for k in _form_class_cache if k[0] == crf_id]:
+            del _form_class_cache[key]
+
+
+def make_crf_entry_form(crf: CRF, initial_data=None, post_data=None):
+    """
+    Instantiate the dynamic entry form for a CRF (one field per CRFField, ordered).
+    initial_data: dict of {field_code: value} to prefill from existing entries.
+    post_data: request.POST if submitting.
+    """
+    form_class = get_crf_entry_form_class(crf)
+    if post_data is not None:
+        return form_class(post_data)
+    return form_class(initial=initial_data or {})
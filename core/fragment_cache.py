@@ -0,0 +1,99 @@
+"""
+Versioned template-fragment cache.
+
+Each subject and visit has a version counter stored in the "fragments" cache.
+Cached fragments include the version in their key, so bumping the counter
+(on any save/delete of a Visit, AdverseEvent or Entry; see core.signals)
+makes every fragment of that object stale at once without deleting keys.
+Stale entries age out through the backend's size-bounded eviction.
+
+Templates use {% versioned_cache "name" obj [vary_on ...] %}
+(core/templatetags/fragment_cache.py). Whatever else a fragment shows that
+other rows own (study and subject codes in its links, a CRF's field labels)
+goes in vary_on, so editing those rows needs no bump of every version.
+Requests reading from a read replica (mini_edc.db_routing) use cached
+fragments but never store them.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from mini_edc.db_routing import reading_replica
+from mini_edc.metrics import FRAGMENT_CACHE
+
+CACHE_ALIAS = "fragments"
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(kind, pk):
+    return f"ver:{kind}:{pk}"
+
+
+def get_version(kind, pk):
+    """
+    Current version for (kind, pk). A missing counter (never set, or evicted)
+    starts at a fresh timestamp, so it can never reuse an old version number.
+    """
+    cache = _cache()
+    key = _version_key(kind, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _incr(kind, pk):
+    cache = _cache()
+    key = _version_key(kind, pk)
+    try:
+        cache.incr(key)
+    except ValueError:  # not set yet
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump(kind, pk):
+    """
+    Invalidate every fragment of (kind, pk) once the current transaction
+    commits, so no request can cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: _incr(kind, pk))
+
+
+def bump_subject(subject_id):
+    bump("subject", subject_id)
+
+
+def bump_visit(visit_id):
+    bump("visit", visit_id)
+
+
+def fragment_key(name, kind, pk, vary_on=()):
+    parts = [str(v) for v in vary_on]
+    return ":".join(["frag", name, kind, str(pk), str(get_version(kind, pk)), *parts])
+
+
+def is_cached(name, kind, pk, vary_on=()):
+    """True if the fragment is cached now (async views use it to skip queries up front)."""
+    return _cache().has_key(fragment_key(name, kind, pk, vary_on))
+
+
+def get_or_render(name, kind, pk, render, vary_on=()):
+    """Return the cached fragment, or render() it, store it and return it."""
+    cache = _cache()
+    key = fragment_key(name, kind, pk, vary_on)
+    html = cache.get(key)
+    if html is not None:
+        FRAGMENT_CACHE.inc(fragment=name, result="hit")
+        return html
+    FRAGMENT_CACHE.inc(fragment=name, result="miss")
+    html = render()
+    # A lagging replica could store pre-write content under the post-write version
+    if not reading_replica():
+        cache.set(key, html, getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 3600))
+    return html
@@ -0,0 +1,326 @@
+"""
+Bulk import of legacy study data (subjects, visits, CRF entries).
+
+Input files are CSV (header row) or JSON lines (.jsonl/.ndjson), with columns:
+  subjects: subject_id, enrolled_at
+  visits:   subject_id, visit, visit_date
+  entries:  subject_id, visit, crf, field_code, value
+
+A visit is identified by (subject_id, visit name) within the study. The CRF
+column may be left blank when the field code is unique across the study.
+
+Rows are validated in batches with the same form fields visit_entry uses
+(core.forms._form_field_for_crf_field) and written with one bulk statement
+per batch: bulk_create(update_conflicts=True), or COPY into a temp table
+followed by INSERT ... ON CONFLICT on Postgres. Entry values that change
+are audited (core.audit): one SELECT of the batch's current values and one
+audit INSERT per batch. Each batch commits on its own and is recorded in
+an optional checkpoint file, so an interrupted import resumes where it
+stopped. Rejected rows go to an error report.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django import forms
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from mini_edc.metrics import ENTRIES_SAVED
+
+from . import counters, datasets
+from .audit import AuditTrail
+from .entries import normalize_value
+from .fragment_cache import bump_subject, bump_visit
+from .forms import _form_field_for_crf_field
+from .models import CRFField, Entry, Subject, Visit
+
+DEFAULT_BATCH_SIZE = 5000
+KINDS = ("subjects", "visits", "entries")
+
+ENTRY_COLUMNS = ("visit_id", "field_id", "value_text", *Entry.TYPED_COLUMNS.values())
+
+
+class ImportFileError(Exception):
+    """Raised for problems with a whole file (not a single row)."""
+
+
+def read_records(path):
+    """Yield (line_number, dict) from a CSV or JSON-lines file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as fh:
+        if ext in (".jsonl", ".ndjson", ".json"):
+            for line_no, line in enumerate(fh, start=1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield line_no, row if isinstance(row, dict) else {"__error__": "invalid JSON object"}
+        else:
+            for line_no, row in enumerate(csv.DictReader(fh), start=2):
+                yield line_no, row
+
+
+def _batches(records, size):
+    it = iter(records)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _text(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _parse_date(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"invalid date {value!r} (expected YYYY-MM-DD)")
+    return parsed
+
+
+class Checkpoint:
+    """JSON file of {path: {"rows": n, "size": bytes}} for committed rows."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                self.state = json.load(fh)
+
+    def rows_done(self, source):
+        entry = self.state.get(os.path.abspath(source))
+        if not entry:
+            return 0
+        if entry["size"] != os.path.getsize(source):
+            raise ImportFileError(f"{source} changed since the checkpoint was written; use a new checkpoint.")
+        return entry["rows"]
+
+    def advance(self, source, rows):
+        if not self.path:
+            return
+        self.state[os.path.abspath(source)] = {"rows": rows, "size": os.path.getsize(source)}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.state, fh)
+        os.replace(tmp, self.path)  # atomic: never a half-written checkpoint
+
+
+class ErrorReport:
+    """Row-level rejects, written as CSV (file, line, error, row).
+    Appends to an existing report so a resumed import keeps earlier rejects."""
+
+    def __init__(self, path=None):
+        self.count = 0
+        self._fh = self._writer = None
+        if path:
+            exists = os.path.exists(path)
+            self._fh = open(path, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+            if not exists:
+                self._writer.writerow(["file", "line", "error", "row"])
+
+    def add(self, source, line_no, message, row):
+        self.count += 1
+        if self._writer:
+            self._writer.writerow([source, line_no, message, json.dumps(row, default=str)])
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+
+
+class StudyImporter:
+    def __init__(self, study, batch_size=DEFAULT_BATCH_SIZE, checkpoint=None, errors=None, use_copy=None):
+        self.study = study
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint)
+        self.errors = ErrorReport(errors)
+        self.use_copy = connection.vendor == "postgresql" if use_copy is None else use_copy
+        self.stats = {kind: {"imported": 0, "rejected": 0, "resumed": 0} for kind in KINDS}
+
+        # Lookups loaded once; kept up to date as batches are written
+        self.subjects = dict(study.subjects.values_list("subject_id", "id"))
+        self.visits = {
+            (sid, name): vid
+            for sid, name, vid in Visit.objects.filter(subject__study=study)
+            .values_list("subject__subject_id", "name", "id")
+        }
+        self.fields = {}
+        codes = {}
+        for f in CRFField.objects.filter(crf__study=study).select_related("crf"):
+            # Form field built once per CRFField: same rules as visit_entry
+            spec = (f, _form_field_for_crf_field(f))
+            self.fields[(f.crf.name, f.code)] = spec
+            codes.setdefault(f.code, []).append(spec)
+        self.fields.update({("", code): specs[0] for code, specs in codes.items() if len(specs) == 1})
+
+    # --- driver -------------------------------------------------------------
+
+    def run(self, sources):
+        """sources: {"subjects": path, "visits": path, "entries": path} (any subset)."""
+        started = timezone.now()
+        try:
+            for kind in KINDS:
+                if sources.get(kind):
+                    self._import_file(kind, sources[kind])
+        finally:
+            self.errors.close()
+        # Batches bypass the counter signals: rebuild this study's counters once
+        counters.recount([self.study.pk])
+        # Batches committed after their rows were stamped: stamp what they touched again
+        counters.restamp_on_commit(self.study.pk, since=started)
+        return self.stats
+
+    def _import_file(self, kind, source):
+        done = self.checkpoint.rows_done(source)
+        records = islice(read_records(source), done, None)
+        self.stats[kind]["resumed"] = done
+        handler = getattr(self, f"_import_{kind}")
+        rows = done
+        for batch in _batches(records, self.batch_size):
+            good = []
+            for line_no, row in batch:
+                if "__error__" in row:
+                    self._reject(kind, source, line_no, row["__error__"], row)
+                else:
+                    good.append((line_no, row))
+            with transaction.atomic():
+                handler(source, good)
+            rows += len(batch)
+            self.checkpoint.advance(source, rows)
+
+    def _reject(self, kind, source, line_no, message, row):
+        self.stats[kind]["rejected"] += 1
+        self.errors.add(source, line_no, message, row)
+
+    # --- per-kind batch handlers ---------------------------------------------
+
+    def _import_subjects(self, source, batch):
+        new = {}
+        for line_no, row in batch:
+            subject_id = _text(row, "subject_id")
+            try:
+                if not subject_id:
+                    raise ValueError("subject_id is required")
+                enrolled = _parse_date(_text(row, "enrolled_at"))
+            except ValueError as exc:
+                self._reject("subjects", source, line_no, str(exc), row)
+                continue
+            new[subject_id] = Subject(study=self.study, subject_id=subject_id, enrolled_at=enrolled)
+
+        Subject.objects.bulk_create(
+            new.values(), update_conflicts=True,
+            unique_fields=["study", "subject_id"], update_fields=["enrolled_at", "updated_at"],
+        )
+        # Conflicting rows don't reliably return ids, so read them back
+        self.subjects.update(
+            self.study.subjects.filter(subject_id__in=list(new)).values_list("subject_id", "id")
+        )
+        self.stats["subjects"]["imported"] += len(new)
+
+    def _import_visits(self, source, batch):
+        new = {}
+        for line_no, row in batch:
+            subject_id, name = _text(row, "subject_id"), _text(row, "visit")
+            try:
+                if subject_id not in self.subjects:
+                    raise ValueError(f"unknown subject {subject_id!r}")
+                if not name:
+                    raise ValueError("visit is required")
+                visit_date = _parse_date(_text(row, "visit_date"))
+            except ValueError as exc:
+                self._reject("visits", source, line_no, str(exc), row)
+                continue
+            if (subject_id, name) in self.visits:
+                continue  # already present: entries will attach to it
+            new[(subject_id, name)] = Visit(subject_id=self.subjects[subject_id], name=name, visit_date=visit_date)
+
+        created = Visit.objects.bulk_create(new.values())
+        self.visits.update({key: visit.id for key, visit in zip(new, created)})
+        for subject_pk in {visit.subject_id for visit in created}:
+            bump_subject(subject_pk)
+        self.stats["visits"]["imported"] += len(new)
+
+    def _import_entries(self, source, batch):
+        values = {}
+        touched = {}   # crf id -> visit ids, for the materialized datasets
+        for line_no, row in batch:
+            visit_key = (_text(row, "subject_id"), _text(row, "visit"))
+            spec = self.fields.get((_text(row, "crf"), _text(row, "field_code")))
+            try:
+                if visit_key not in self.visits:
+                    raise ValueError(f"unknown visit {visit_key[1]!r} for subject {visit_key[0]!r}")
+                if spec is None:
+                    raise ValueError(f"unknown field {_text(row, 'field_code')!r} on CRF {_text(row, 'crf')!r}")
+                field, form_field = spec
+                raw = row.get("value")
+                cleaned = form_field.clean("" if raw is None else raw)
+            except forms.ValidationError as exc:
+                self._reject("entries", source, line_no, "; ".join(exc.messages), row)
+                continue
+            except ValueError as exc:
+                self._reject("entries", source, line_no, str(exc), row)
+                continue
+            norm = normalize_value(field, cleaned)
+            # Last value wins if the same (visit, field) repeats in a batch
+            values[(self.visits[visit_key], field.id)] = (norm, field.field_type)
+            touched.setdefault(field.crf_id, set()).add(self.visits[visit_key])
+
+        if values:
+            trail = AuditTrail()
+            current = {
+                (vid, fid): text for vid, fid, text in Entry.objects.filter(
+                    visit_id__in={vid for vid, _ in values}, field_id__in={fid for _, fid in values},
+                ).values_list("visit_id", "field_id", "value_text")
+            }
+            for key, (norm, _) in values.items():
+                trail.record(*key, current.get(key), norm)
+            if self.use_copy:
+                self._copy_entries(values)
+            else:
+                Entry.objects.bulk_create(
+                    [
+                        Entry(visit_id=vid, field_id=fid, value_text=norm, **Entry.typed_values(ftype, norm))
+                        for (vid, fid), (norm, ftype) in values.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["visit", "field"],
+                    update_fields=["value_text", *Entry.TYPED_COLUMNS.values(), "updated_at"],
+                )
+            trail.flush()
+        for crf_id, visit_ids in touched.items():
+            datasets.refresh(crf_id, visit_ids)
+        for visit_id in {vid for vid, _ in values}:
+            bump_visit(visit_id)
+        self.stats["entries"]["imported"] += len(values)
+        ENTRIES_SAVED.inc(len(values), source="import")
+
+    def _copy_entries(self, values):
+        """Postgres: COPY the batch into a temp table, then one upsert."""
+        table = Entry._meta.db_table
+        cols = ", ".join(ENTRY_COLUMNS)
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in ENTRY_COLUMNS[2:])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS _import_entry ("
+                "visit_id bigint, field_id bigint, value_text text, value_int bigint, "
+                "value_float double precision, value_bool boolean, value_choice varchar(255)"
+                ") ON COMMIT DELETE ROWS"
+            )
+            with cursor.copy(f"COPY _import_entry ({cols}) FROM STDIN") as copy:
+                for (vid, fid), (norm, ftype) in values.items():
+                    typed = Entry.typed_values(ftype, norm)
+                    copy.write_row((vid, fid, norm, *(typed[c] for c in ENTRY_COLUMNS[3:])))
+            cursor.execute(
+                f"INSERT INTO {table} ({cols}, created_at, updated_at) "
+                f"SELECT {cols}, now(), now() FROM _import_entry "
+                f"ON CONFLICT (visit_id, field_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at"
+            )
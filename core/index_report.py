@@ -0,0 +1,144 @@
+"""
+EXPLAIN the project's hot ORM queries and flag full table scans and sorts.
+
+Run `manage.py index_report` against a seeded database (seed_synthetic):
+plans on near-empty tables say nothing, since a planner rightly scans a
+table of ten rows. Each CATALOGUE entry builds the same queryset shape as
+the code it names, with parameters taken from the data:
+
+    catalogue entry -> queryset.explain() -> scans and sorts found in the plan
+
+A scan of a table the query is expected to read whole (the dashboard's
+study list) is declared in `scans_ok` and not flagged. Both SQLite
+(EXPLAIN QUERY PLAN: SCAN / SEARCH / USE TEMP B-TREE) and Postgres (Seq
+Scan / Sort nodes) plans are understood.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import AdverseEvent, CRF, CRFField, Entry, EntryAudit, Study, Subject, Visit
+
+# SQLite's bare "SCAN <table>" ("SCAN <table> USING INDEX" walks an index in
+# ORDER BY order and stops at the LIMIT) and Postgres's "Seq Scan on <table>"
+_SCAN = re.compile(r"\bSCAN (\w+)$|Seq Scan on (\w+)")
+_SORT = re.compile(r"USE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT)|\bSort\b(?! Key)|Incremental Sort")
+
+
+@dataclass
+class Shape:
+    name: str
+    source: str                      # where the project runs this query
+    build: object                    # build(sample) -> QuerySet
+    scans_ok: tuple = ()             # tables this query reads whole by design
+    sort_ok: bool = False
+
+
+@dataclass
+class Finding:
+    shape: Shape
+    plan: str
+    scans: list = field(default_factory=list)
+    sorts: list = field(default_factory=list)
+
+    @property
+    def flagged(self):
+        return bool(self.scans or self.sorts)
+
+
+CATALOGUE = [
+    Shape("dashboard studies", "views.dashboard",
+          lambda s: Study.objects.order_by("code"), scans_ok=("core_study",)),
+    Shape("study subjects page", "views.study_detail",
+          lambda s: s["study"].subjects.order_by("subject_id")[:50]),
+    Shape("subject visits", "views.subject_detail",
+          lambda s: s["subject"].visits.order_by("visit_date", "id")),
+    Shape("subject AE page", "views.subject_detail (keyset_paginate)",
+          lambda s: s["subject"].adverse_events.order_by("-onset", "-id")[:26]),
+    Shape("visit CRF tabs", "views.visit_entry",
+          lambda s: s["study"].crfs.filter(is_active=True).order_by("name", "id")),
+    Shape("visit entries for a CRF", "views.visit_entry",
+          lambda s: Entry.objects.filter(visit=s["visit"], field__crf=s["crf"]).select_related("field")
+          .order_by("field__order", "field__id"), sort_ok=True),
+    Shape("existing values for a CRF save", "entries.save_crf_entries",
+          lambda s: Entry.objects.filter(visit=s["visit"], field__in=list(s["crf"].fields.all()))
+          .values_list("field_id", "value_text")),
+    Shape("visit values as of T", "audit.values_as_of",
+          lambda s: EntryAudit.objects.filter(visit=s["visit"], changed_at__lte=timezone.now())
+          .order_by("field_id", "changed_at", "id").values_list("field_id", "new_value")),
+    Shape("recently edited entries", "admin EntryAdmin changelist",
+          lambda s: Entry.objects.order_by("-updated_at", "-id")[:100]),
+    Shape("typed value filter", "Entry.objects.where_value",
+          lambda s: Entry.objects.where_value(s["int_field"], "gt", 0).order_by() if s["int_field"] else None),
+    Shape("study export", "exports.iter_csv",
+          lambda s: Entry.objects.filter(visit__subject__study=s["study"])
+          .order_by("visit__subject__subject_id", "visit__visit_date", "visit_id", "field__order", "field_id"),
+          scans_ok=("core_crffield",), sort_ok=True),
+    Shape("completeness counts", "completeness.CompletenessMatrix._entry_counts",
+          lambda s: Entry.objects.filter(visit__subject__study=s["study"], value_text__isnull=False)
+          .order_by().values("visit_id").annotate(n=Count("pk")), sort_ok=True),
+    Shape("subject counters", "counters.recount",
+          lambda s: Visit.objects.filter(subject__study=s["study"]).order_by().values("subject_id")
+          .annotate(n=Count("pk")), sort_ok=True),
+]
+
+
+def sample():
+    """Parameters for the catalogue: the busiest study and its most active subject and visit."""
+    study = Study.objects.order_by("-entry_count", "pk").first()
+    if study is None:
+        return None
+    subject = study.subjects.order_by("-entry_count", "pk").first()
+    visit = subject.visits.order_by("pk").first() if subject else None
+    crf = study.crfs.filter(is_active=True).order_by("pk").first()
+    return {
+        "study": study,
+        "subject": subject,
+        "visit": visit,
+        "crf": crf,
+        "int_field": CRFField.objects.filter(crf__study=study, field_type=CRFField.INT).first(),
+    }
+
+
+def analyse(shape, plan):
+    scans = []
+    for line in plan.splitlines():
+        for match in _SCAN.finditer(line.rstrip()):
+            table = match.group(1) or match.group(2)
+            if table not in shape.scans_ok:
+                scans.append(table)
+    sorts = [] if shape.sort_ok else [m.group(0) for m in _SORT.finditer(plan)]
+    return Finding(shape, plan, scans, sorts)
+
+
+def run(shapes=CATALOGUE):
+    """
+    [Finding] for every shape whose sample parameters exist. Queries with
+    nothing to run against (no AEs seeded, no INT field) are skipped.
+    """
+    params = sample()
+    if params is None or any(params[k] is None for k in ("subject", "visit", "crf")):
+        raise ValueError("index_report needs data: seed a study with subjects, visits and a CRF first")
+    findings = []
+    for shape in shapes:
+        queryset = shape.build(params)
+        if queryset is None:
+            continue
+        findings.append(analyse(shape, queryset.explain()))
+    return findings
+
+
+def table_sizes():
+    """Row counts of the tables the catalogue reads, for the report header."""
+    models = (Study, Subject, Visit, AdverseEvent, CRF, CRFField, Entry)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)",
+                [[m._meta.db_table for m in models]],
+            )
+            return dict(cursor.fetchall())
+    return {m._meta.db_table: m.objects.count() for m in models}
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.audit import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Create the Entry audit trail's monthly partitions ahead of time (Postgres; run monthly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=2)
+
+    def handle(self, *args, **options):
+        if ensure_partitions(options["months_ahead"]):
+            self.stdout.write(self.style.SUCCESS(
+                f"Audit partitions exist up to {options['months_ahead']} months ahead."
+            ))
+        else:
+            self.stdout.write("Not partitioned on this database; nothing to do.")
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import BENCHMARKS, get_benchmark
+
+
+class Command(BaseCommand):
+    help = "Run a performance benchmark and print (or save) its results as JSON."
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="benchmark", required=True)
+        for name in BENCHMARKS:
+            bench_parser = sub.add_parser(name)
+            bench_parser.add_argument("--output", "-o", help="write results JSON to this path")
+            get_benchmark(name).add_arguments(bench_parser)
+
+    def handle(self, *args, **options):
+        name = options.pop("benchmark")
+        output = options.pop("output")
+        results = get_benchmark(name).run(**options)
+
+        text = json.dumps(results, indent=2)
+        if output:
+            with open(output, "w") as fh:
+                fh.write(text + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+        else:
+            self.stdout.write(text)
+
+        if results.get("regressions"):
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(results["regressions"]))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import datasets
+from core.models import CRF, Study
+
+
+class Command(BaseCommand):
+    help = "Build (or rebuild) the materialized per-CRF dataset tables of active CRFs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_codes", nargs="*", help="studies to build (default: all)")
+        parser.add_argument("--stale", action="store_true", help="only CRFs without a current dataset")
+
+    def handle(self, *args, **options):
+        if not settings.DATASETS_ENABLED:
+            raise CommandError("Datasets are disabled; set DATASETS_ENABLED=1.")
+        crfs = CRF.objects.filter(is_active=True).select_related("study", "dataset").order_by("study__code", "name")
+        if options["study_codes"]:
+            found = set(Study.objects.filter(code__in=options["study_codes"]).values_list("code", flat=True))
+            missing = sorted(set(options["study_codes"]) - found)
+            if missing:
+                raise CommandError(f"Unknown studies: {', '.join(missing)}.")
+            crfs = crfs.filter(study__code__in=found)
+
+        built = 0
+        for crf in crfs:
+            if options["stale"] and hasattr(crf, "dataset") and not crf.dataset.stale:
+                continue
+            dataset = datasets.build(crf)
+            rows = datasets.model_for(dataset).objects.count()
+            self.stdout.write(f"{crf.study.code} / {crf.name}: {dataset.table_name}, {rows} rows")
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built {built} datasets."))
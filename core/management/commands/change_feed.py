@@ -0,0 +1,41 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from core.changes import DEFAULT_LIMIT, FEED_MODELS, feed, prune
+
+
+class Command(BaseCommand):
+    help = ("Write the Entry/AdverseEvent rows changed after a cursor as NDJSON; the last line holds the "
+            "cursor to resume from.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--after", help="cursor from a previous run (default: from the start)")
+        parser.add_argument("--models", help=f"comma-separated, from: {', '.join(FEED_MODELS)} (default: all)")
+        parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="changes to read at most")
+        parser.add_argument("--output", "-o", help="file to write (default: stdout)")
+        parser.add_argument("--prune-days", type=int,
+                            help="instead: delete changes older than this many days and exit")
+
+    def handle(self, *args, **options):
+        if options["prune_days"] is not None:
+            deleted = prune(timezone.now() - timedelta(days=options["prune_days"]))
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} changes."))
+            return
+
+        models = [m.strip() for m in (options["models"] or "").split(",") if m.strip()]
+        try:
+            items = feed(options["after"], models, options["limit"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        lines = (json.dumps(item, cls=DjangoJSONEncoder) + "\n" for item in items)
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w") as fh:
+            fh.writelines(lines)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import CHUNK_SIZE, LAYOUTS, iter_csv
+from core.models import Study
+
+
+class Command(BaseCommand):
+    help = "Export a study's entries as CSV (long or wide layout), streamed row by row."
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_code")
+        parser.add_argument("--layout", choices=LAYOUTS, default="long")
+        parser.add_argument("--output", "-o", help="file to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            study = Study.objects.get(code=options["study_code"])
+        except Study.DoesNotExist:
+            raise CommandError(f"Study '{options['study_code']}' does not exist.")
+
+        lines = iter_csv(study, options["layout"], options["chunk_size"])
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", newline="") as fh:
+            fh.writelines(lines)
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import DEFAULT_BATCH_SIZE, ImportFileError, StudyImporter
+from core.models import Study
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import subjects, visits and CRF entries for a study from CSV or "
+        "JSON-lines files (see core/importer.py for the expected columns). "
+        "Each row written is also one change in the change feed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_code")
+        parser.add_argument("--subjects", help="subjects file: subject_id, enrolled_at")
+        parser.add_argument("--visits", help="visits file: subject_id, visit, visit_date")
+        parser.add_argument("--entries", help="entries file: subject_id, visit, crf, field_code, value")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--checkpoint", help="JSON file to record progress in and resume from")
+        parser.add_argument("--errors", help="CSV file for rejected rows")
+        parser.add_argument("--no-copy", action="store_true", help="use bulk_create even on Postgres")
+
+    def handle(self, *args, **options):
+        try:
+            study = Study.objects.get(code=options["study_code"])
+        except Study.DoesNotExist:
+            raise CommandError(f"Study '{options['study_code']}' does not exist.")
+        sources = {kind: options[kind] for kind in ("subjects", "visits", "entries")}
+        if not any(sources.values()):
+            raise CommandError("Nothing to import: pass --subjects, --visits and/or --entries.")
+
+        importer = StudyImporter(
+            study,
+            batch_size=options["batch_size"],
+            checkpoint=options["checkpoint"],
+            errors=options["errors"],
+            use_copy=False if options["no_copy"] else None,
+        )
+        start = time.perf_counter()
+        try:
+            stats = importer.run(sources)
+        except (ImportFileError, OSError) as exc:
+            raise CommandError(str(exc))
+        seconds = time.perf_counter() - start
+
+        for kind, counts in stats.items():
+            if sources[kind]:
+                self.stdout.write(
+                    f"{kind}: {counts['imported']} imported, {counts['rejected']} rejected"
+                    + (f", {counts['resumed']} already done (checkpoint)" if counts["resumed"] else "")
+                )
+        entries = stats["entries"]["imported"]
+        if entries and seconds:
+            self.stdout.write(f"{entries / seconds:,.0f} entries/s")
+        style = self.style.WARNING if importer.errors.count else self.style.SUCCESS
+        self.stdout.write(style(f"Done in {seconds:.1f}s with {importer.errors.count} rejected row(s)."))
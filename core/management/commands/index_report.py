@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import index_report
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the project's hot queries against this database and flag full table scans and sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plans", action="store_true", help="print every plan, not just flagged ones")
+        parser.add_argument("--fail", action="store_true", help="exit with an error if anything is flagged")
+
+    def handle(self, *args, **options):
+        try:
+            findings = index_report.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        sizes = index_report.table_sizes()
+        self.stdout.write("Rows: " + ", ".join(f"{table}={n:,}" for table, n in sorted(sizes.items())))
+        for finding in findings:
+            shape = finding.shape
+            if finding.flagged:
+                problems = [f"full scan of {t}" for t in finding.scans] + finding.sorts
+                self.stdout.write(self.style.WARNING(f"FLAG  {shape.name} ({shape.source}): {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f"ok    {shape.name} ({shape.source})")
+            if finding.flagged or options["plans"]:
+                for line in finding.plan.splitlines():
+                    self.stdout.write(f"        {line}")
+
+        flagged = sum(f.flagged for f in findings)
+        summary = f"{len(findings)} queries explained, {flagged} flagged."
+        if flagged and options["fail"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not flagged else summary)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.counters import recount
+from core.models import Study
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized activity counters on Study and Subject and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_codes", nargs="*", help="studies to recount (default: all)")
+        parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+
+    def handle(self, *args, **options):
+        study_ids = None
+        if options["study_codes"]:
+            found = dict(Study.objects.filter(code__in=options["study_codes"]).values_list("code", "id"))
+            missing = sorted(set(options["study_codes"]) - set(found))
+            if missing:
+                raise CommandError(f"Unknown studies: {', '.join(missing)}.")
+            study_ids = list(found.values())
+
+        fixed = recount(study_ids, dry_run=options["dry_run"])
+        verb = "Would repair" if options["dry_run"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {fixed['studies']} studies and {fixed['subjects']} subjects."
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Study
+from core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = ("Generate deterministic synthetic studies (subjects, visits, CRFs, AEs, entries) for load testing. "
+            "Every entry and AE is also one change in the change feed (prune with change_feed --prune-days).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--studies", type=int, default=1)
+        parser.add_argument("--subjects", type=int, default=100, help="subjects per study")
+        parser.add_argument("--visits", type=int, default=5, help="visits per subject")
+        parser.add_argument("--crfs", type=int, default=2, help="CRFs per study")
+        parser.add_argument("--fields", type=int, default=20, help="fields per CRF")
+        parser.add_argument("--ae-rate", type=float, default=0.5, help="mean adverse events per subject")
+        parser.add_argument("--fill", type=float, default=0.8, help="fraction of fields filled per visit")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="SYN", help="study code prefix (codes are <prefix>-001, ...)")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["fill"] <= 1:
+            raise CommandError("--fill must be between 0 and 1.")
+        if Study.objects.filter(code__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Studies with prefix '{options['prefix']}' already exist; pick another --prefix.")
+
+        start = time.perf_counter()
+
+        def progress(counts):
+            self.stdout.write(
+                f"  {counts['subjects']:,} subjects, {counts['entries']:,} entries "
+                f"({time.perf_counter() - start:.0f}s)"
+            )
+
+        counts = generate(
+            studies=options["studies"], subjects=options["subjects"], visits=options["visits"],
+            crfs=options["crfs"], fields=options["fields"], ae_rate=options["ae_rate"],
+            fill=options["fill"], seed=options["seed"], prefix=options["prefix"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        seconds = time.perf_counter() - start
+        summary = ", ".join(f"{n:,} {name}" for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {seconds:.1f}s."))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='value_bool',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='value_choice',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='value_float',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='value_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('value_int__isnull', False)), fields=['field', 'value_int'], name='entry_field_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('value_float__isnull', False)), fields=['field', 'value_float'], name='entry_field_float_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('value_bool__isnull', False)), fields=['field', 'value_bool'], name='entry_field_bool_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('value_choice__isnull', False)), fields=['field', 'value_choice'], name='entry_field_choice_idx'),
+        ),
+    ]
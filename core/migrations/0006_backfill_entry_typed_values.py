@@ -0,0 +1,55 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+TYPED_COLUMNS = ("value_int", "value_float", "value_bool", "value_choice")
+
+
+def _typed(field_type, text):
+    # Frozen copy of Entry.typed_values at the time of this migration
+    typed = dict.fromkeys(TYPED_COLUMNS)
+    if text is None:
+        return typed
+    try:
+        if field_type == "int":
+            typed["value_int"] = int(text)
+        elif field_type == "float":
+            typed["value_float"] = float(text)
+        elif field_type == "bool":
+            typed["value_bool"] = text == "true"
+        elif field_type == "choice" and len(text) <= 255:
+            typed["value_choice"] = text
+    except ValueError:
+        pass
+    return typed
+
+
+def backfill(apps, schema_editor):
+    Entry = apps.get_model("core", "Entry")
+    rows = (
+        Entry.objects.exclude(field__field_type="text")
+        .exclude(value_text=None)
+        .select_related("field")
+        .only("id", "value_text", "field__field_type")
+        .order_by("id")
+    )
+    batch = []
+    for entry in rows.iterator(chunk_size=BATCH_SIZE):
+        for column, value in _typed(entry.field.field_type, entry.value_text).items():
+            setattr(entry, column, value)
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            Entry.objects.bulk_update(batch, TYPED_COLUMNS)
+            batch = []
+    if batch:
+        Entry.objects.bulk_update(batch, TYPED_COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_entry_typed_values"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _per_row(queryset, group, aggregate):
+    # Correlated subquery: one aggregate value per outer row
+    return Subquery(queryset.order_by().values(group).annotate(value=aggregate).values("value"))
+
+
+def backfill(apps, schema_editor):
+    Study = apps.get_model("core", "Study")
+    Subject = apps.get_model("core", "Subject")
+    Visit = apps.get_model("core", "Visit")
+    AdverseEvent = apps.get_model("core", "AdverseEvent")
+    Entry = apps.get_model("core", "Entry")
+
+    visits = Visit.objects.filter(subject=OuterRef("pk"))
+    aes = AdverseEvent.objects.filter(subject=OuterRef("pk"))
+    entries = Entry.objects.filter(visit__subject=OuterRef("pk"))
+    # Visit/AE updated_at were all just set by 0007, so activity comes from
+    # entry edits, else AE creation
+    Subject.objects.update(
+        visit_count=Coalesce(_per_row(visits, "subject", Count("pk")), 0),
+        ae_count=Coalesce(_per_row(aes, "subject", Count("pk")), 0),
+        entry_count=Coalesce(_per_row(entries, "visit__subject", Count("pk")), 0),
+        last_activity_at=Coalesce(
+            _per_row(entries, "visit__subject", Max("updated_at")),
+            _per_row(aes, "subject", Max("created_at")),
+        ),
+    )
+
+    subjects = Subject.objects.filter(study=OuterRef("pk"))
+    Study.objects.update(
+        subject_count=Coalesce(_per_row(subjects, "study", Count("pk")), 0),
+        visit_count=Coalesce(_per_row(subjects, "study", Sum("visit_count")), 0),
+        ae_count=Coalesce(_per_row(subjects, "study", Sum("ae_count")), 0),
+        entry_count=Coalesce(_per_row(subjects, "study", Sum("entry_count")), 0),
+        last_activity_at=_per_row(subjects, "study", Max("last_activity_at")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_activity_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
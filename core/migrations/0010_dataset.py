@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_backfill_activity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dataset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=63, unique=True)),
+                ('columns', models.JSONField()),
+                ('stale', models.BooleanField(default=False)),
+                ('built_at', models.DateTimeField()),
+                ('crf', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dataset', to='core.crf')),
+            ],
+        ),
+    ]
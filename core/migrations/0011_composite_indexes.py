@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_dataset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adverseevent',
+            index=models.Index(fields=['subject', '-onset', '-id'], name='ae_subject_onset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['updated_at', 'id'], name='entry_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['subject', 'visit_date', 'id'], name='visit_subject_date_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+# (table, Change.model) pairs whose writes are logged (see core/changes.py)
+TABLES = (("core_entry", "entry"), ("core_adverseevent", "adverse_event"))
+
+POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_change_log() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_change (txid, model, object_id, op, changed_at)
+    VALUES (pg_current_xact_id()::text::bigint, TG_ARGV[0],
+            CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, left(TG_OP, 1), now());
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def create_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRES_FUNCTION)
+        for table, model in TABLES:
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_change AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION core_change_log('{model}')"
+            )
+    elif vendor == "sqlite":
+        for table, model in TABLES:
+            for event, op, row in (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD")):
+                schema_editor.execute(
+                    f"CREATE TRIGGER {table}_change_{op.lower()} AFTER {event} ON {table} BEGIN "
+                    f"INSERT INTO core_change (txid, model, object_id, op, changed_at) "
+                    f"VALUES (0, '{model}', {row}.id, '{op}', strftime('%Y-%m-%d %H:%M:%f', 'now')); END"
+                )
+    # Other backends get the table but no triggers: the feed stays empty
+    # there, and the core.W001 system check (core/checks.py) says so
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ("postgresql", "sqlite"):
+        return
+    for table, _ in TABLES:
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_change ON {table}")
+        else:
+            for op in "iud":
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_change_{op}")
+    if vendor == "postgresql":
+        schema_editor.execute("DROP FUNCTION IF EXISTS core_change_log()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField(default=0)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('I', 'insert'), ('U', 'update'), ('D', 'delete')], max_length=1)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['txid', 'id'], name='change_seq_idx')],
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
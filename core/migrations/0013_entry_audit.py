@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Postgres: range-partitioned by month (the primary key must include the
+# partition column), a DEFAULT partition so an insert never fails for want
+# of a month, and this month plus the next two. core.audit.ensure_partitions
+# (manage.py audit_partitions) adds later months. The default SQLite test
+# run never executes this: run the suite with DATABASE_URL=postgres://...
+# to cover it (test_audit.test_postgres_table_is_partitioned_and_append_only).
+POSTGRES_TABLE = """
+CREATE TABLE core_entryaudit (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    visit_id bigint NOT NULL,
+    field_id bigint NOT NULL,
+    old_value text NULL,
+    new_value text NULL,
+    user_id integer NULL,
+    changed_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, changed_at)
+) PARTITION BY RANGE (changed_at);
+CREATE TABLE core_entryaudit_default PARTITION OF core_entryaudit DEFAULT;
+CREATE INDEX entryaudit_asof_idx ON core_entryaudit (visit_id, field_id, changed_at, id);
+DO $$
+DECLARE m date;
+BEGIN
+    FOR m IN SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '2 months',
+                                    interval '1 month')::date LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF core_entryaudit FOR VALUES FROM (%L) TO (%L)',
+                       'core_entryaudit_' || to_char(m, '"y"YYYY"m"MM'), m, m + interval '1 month');
+    END LOOP;
+END
+$$;
+CREATE FUNCTION core_entryaudit_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'core_entryaudit is append-only';
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER core_entryaudit_append_only BEFORE UPDATE OR DELETE ON core_entryaudit
+    FOR EACH STATEMENT EXECUTE FUNCTION core_entryaudit_append_only();
+"""
+
+# The values already captured become each entry's first audit row
+BACKFILL = """
+INSERT INTO core_entryaudit (visit_id, field_id, old_value, new_value, user_id, changed_at)
+SELECT visit_id, field_id, NULL, value_text, NULL, updated_at FROM core_entry
+"""
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(POSTGRES_TABLE, params=None)   # no placeholders: %I/%L are format()'s
+    else:
+        schema_editor.create_model(apps.get_model("core", "EntryAudit"))
+    schema_editor.execute(BACKFILL, params=None)
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP TABLE core_entryaudit CASCADE")
+        schema_editor.execute("DROP FUNCTION core_entryaudit_append_only()")
+    else:
+        schema_editor.delete_model(apps.get_model("core", "EntryAudit"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_change'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='EntryAudit',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('old_value', models.TextField(blank=True, null=True)),
+                    ('new_value', models.TextField(blank=True, null=True)),
+                    ('changed_at', models.DateTimeField()),
+                    ('field', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.crffield')),
+                    ('user', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ('visit', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.visit')),
+                ],
+                options={
+                    'indexes': [models.Index(fields=['visit', 'field', 'changed_at', 'id'], name='entryaudit_asof_idx')],
+                },
+            ),
+        ]),
+        migrations.RunPython(create_table, drop_table),
+    ]
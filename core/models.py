@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count
 from django.contrib.auth import get_user_model
+from django.dispatch import Signal
 User = get_user_model()
 
+# Sent by EntryQuerySet.delete() with rows=[{"visit_id", "subject_id",
+# "study_id", "crf_id", "n"}, ...] once the entries are gone (core.signals)
+entries_deleted = Signal()
+
 
 class Study(models.Model):
     """
@@ -10,6 +16,14 @@ class Study(models.Model):
     name = models.CharField(max_length=200)            # Human-readable name
     code = models.CharField(max_length=32, unique=True)  # Short unique code (e.g., 'INCEPT-ICU-01')
     created_at = models.DateTimeField(auto_now_add=True) # Timestamp when study was created
+    updated_at = models.DateTimeField(auto_now=True)     # Last edit (conditional GET validators)
+
+    # Denormalized activity counters, maintained by core.counters
+    subject_count = models.PositiveIntegerField(default=0, editable=False)
+    visit_count = models.PositiveIntegerField(default=0, editable=False)
+    ae_count = models.PositiveIntegerField(default=0, editable=False)
+    entry_count = models.PositiveBigIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.code} — {self.name}"
@@ -26,6 +40,13 @@ class Subject(models.Model):
     )
     subject_id = models.CharField(max_length=64)  # Site/Study-specific subject identifier
     enrolled_at = models.DateField()              # Date the subject was enrolled
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Denormalized activity counters, maintained by core.counters
+    visit_count = models.PositiveIntegerField(default=0, editable=False)
+    ae_count = models.PositiveIntegerField(default=0, editable=False)
+    entry_count = models.PositiveIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         # Prevent duplicate subject IDs within the same study
@@ -48,10 +69,15 @@ class Visit(models.Model):
     )
     name = models.CharField(max_length=100)  # e.g., 'Baseline', 'Follow-up', 'Day 7'
     visit_date = models.DateField()          # The date of the visit
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         # Helpful default ordering in UIs and lists
         ordering = ["visit_date", "id"]
+        indexes = [
+            # subject.visits.all() in that order, without a sort
+            models.Index(fields=["subject", "visit_date", "id"], name="visit_subject_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.subject} — {self.name} ({self.visit_date})"
@@ -77,9 +103,14 @@ class AdverseEvent(models.Model):
         User, null=True, blank=True, on_delete=models.SET_NULL
     )
     created_at = models.DateTimeField(auto_now_add=True)   # audit timestamp
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-onset", "-id"]        # newest first
+        indexes = [
+            # A subject's AE list (keyset pages on onset, id) straight off the index
+            models.Index(fields=["subject", "-onset", "-id"], name="ae_subject_onset_idx"),
+        ]
 
     def __str__(self):
         return f"{self.subject} — {self.severity} @ {self.onset:%Y-%m-%d %H:%M}"
@@ -92,6 +123,7 @@ class CRF(models.Model):
     study = models.ForeignKey("core.Study", on_delete=models.CASCADE, related_name="crfs")
     name = models.CharField(max_length=120)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("study", "name")
@@ -125,6 +157,7 @@ class CRFField(models.Model):
     choices = models.JSONField(blank=True, null=True)       # for CHOICE type: ["A","B","C"]
     required = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("crf", "code")
@@ -134,20 +167,218 @@ class CRFField(models.Model):
         return f"{self.crf} :: {self.code}"
 
 
+class EntryQuerySet(models.QuerySet):
+    def where_value(self, field: CRFField, lookup: str = "exact", value=None):
+        """
+        Filter entries of one field on its typed column, e.g.
+        Entry.objects.where_value(bp_sys, "gt", 140) -> value_int > 140,
+        which the (field, value_int) index answers without a table scan.
+        """
+        column = Entry.TYPED_COLUMNS.get(field.field_type, "value_text")
+        return self.filter(field=field, **{f"{column}__{lookup}": value})
+
+    def delete(self, user=None):
+        """
+        Entries have no delete signals, so a cascade from a Visit or CRFField
+        fast-deletes them (no rows loaded) and is accounted once by its root
+        (core.signals). A direct delete is audited (as done by `user`),
+        grouped by visit here, in one query, and announced with
+        entries_deleted.
+        """
+        from .audit import record_deleted
+
+        rows = list(self.order_by().values(
+            "visit_id", subject_id=models.F("visit__subject_id"), study_id=models.F("visit__subject__study_id"),
+            crf_id=models.F("field__crf_id"),
+        ).annotate(n=Count("pk")))
+        with transaction.atomic(using=self.db):
+            record_deleted(self, user)
+            result = super().delete()
+        if rows:
+            entries_deleted.send(sender=Entry, rows=rows)
+        return result
+
+    delete.alters_data = True
+
+
 class Entry(models.Model):
     """
     A captured value for one CRF field at one visit.
     We store normalized text and validate types on input.
+    value_text stays the source of truth; the typed value_* shadow columns
+    are derived from it (per CRFField.field_type) so numeric/choice filters
+    can run in the database on an index.
     """
+    TYPED_COLUMNS = {
+        CRFField.INT: "value_int",
+        CRFField.FLOAT: "value_float",
+        CRFField.BOOL: "value_bool",
+        CRFField.CHOICE: "value_choice",
+    }
+
     visit = models.ForeignKey(Visit, on_delete=models.CASCADE, related_name="entries")
     field = models.ForeignKey(CRFField, on_delete=models.CASCADE, related_name="entries")
     value_text = models.TextField(blank=True, null=True)  # normalized string value
+    value_int = models.BigIntegerField(blank=True, null=True, editable=False)
+    value_float = models.FloatField(blank=True, null=True, editable=False)
+    value_bool = models.BooleanField(blank=True, null=True, editable=False)
+    value_choice = models.CharField(max_length=255, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EntryQuerySet.as_manager()
+
     class Meta:
         unique_together = ("visit", "field")     # one value per field per visit
         ordering = ["visit_id", "field_id"]
+        indexes = [
+            # Partial: only rows of that type carry a value, so each index stays small
+            models.Index(fields=["field", "value_int"], name="entry_field_int_idx",
+                         condition=models.Q(value_int__isnull=False)),
+            models.Index(fields=["field", "value_float"], name="entry_field_float_idx",
+                         condition=models.Q(value_float__isnull=False)),
+            models.Index(fields=["field", "value_bool"], name="entry_field_bool_idx",
+                         condition=models.Q(value_bool__isnull=False)),
+            models.Index(fields=["field", "value_choice"], name="entry_field_choice_idx",
+                         condition=models.Q(value_choice__isnull=False)),
+            # Recently edited values (admin changelist, change feeds)
+            models.Index(fields=["updated_at", "id"], name="entry_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.visit} :: {self.field.code} = {self.value_text}"
+
+    @staticmethod
+    def typed_values(field_type: str, value_text):
+        """
+        Derive the shadow columns from normalized text. Values that don't
+        parse for the field type are left NULL (value_text still has them).
+        """
+        typed = {"value_int": None, "value_float": None, "value_bool": None, "value_choice": None}
+        if value_text is None:
+            return typed
+        try:
+            if field_type == CRFField.INT:
+                typed["value_int"] = int(value_text)
+            elif field_type == CRFField.FLOAT:
+                typed["value_float"] = float(value_text)
+            elif field_type == CRFField.BOOL:
+                typed["value_bool"] = value_text == "true"
+            elif field_type == CRFField.CHOICE and len(value_text) <= 255:
+                typed["value_choice"] = value_text
+        except ValueError:
+            pass
+        return typed
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored value, for the audit row of a later save() (absent if deferred)
+        if "value_text" in instance.__dict__:
+            instance._loaded_value_text = instance.value_text
+        return instance
+
+    def delete(self, using=None, keep_parents=False, user=None):
+        # Through the queryset, for its bookkeeping (see EntryQuerySet.delete)
+        result = type(self).objects.using(using).filter(pk=self.pk).delete(user=user)
+        self.pk = None
+        return result
+
+    def sync_typed_values(self):
+        for column, value in self.typed_values(self.field.field_type, self.value_text).items():
+            setattr(self, column, value)
+
+    def save(self, *args, user=None, **kwargs):
+        """
+        Save, and audit a change of value_text as made by `user` (bulk
+        writers audit themselves: core.audit).
+        """
+        from .audit import AuditTrail
+
+        self.sync_typed_values()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "value_text" not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *self.TYPED_COLUMNS.values()}
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if hasattr(self, "_loaded_value_text"):
+                old = self._loaded_value_text
+            elif self.pk is None:
+                old = None
+            else:
+                old = type(self).objects.using(using).filter(pk=self.pk).values_list("value_text", flat=True).first()
+            super().save(*args, **kwargs)
+            trail = AuditTrail(user)
+            trail.record(self.visit_id, self.field_id, old, self.value_text)
+            trail.flush()
+        self._loaded_value_text = self.value_text
+
+
+class Dataset(models.Model):
+    """
+    A materialized wide table for one CRF: one row per visit, one typed
+    column per CRFField (see core.datasets).
+    """
+    crf = models.OneToOneField(CRF, on_delete=models.CASCADE, related_name="dataset")
+    table_name = models.CharField(max_length=63, unique=True)
+    columns = models.JSONField()                  # [[field_id, column, field_type], ...] as built
+    stale = models.BooleanField(default=False)    # the CRF's fields changed since the build
+    built_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.crf} -> {self.table_name}"
+
+
+class Change(models.Model):
+    """
+    One insert, update or delete of an Entry or AdverseEvent, appended by
+    database triggers (migration 0012); read through core.changes.
+    """
+    INSERT, UPDATE, DELETE = "I", "U", "D"
+
+    txid = models.BigIntegerField(default=0)      # writing transaction on Postgres (0 on SQLite)
+    model = models.CharField(max_length=20)       # "entry" or "adverse_event"
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=1, choices=[(INSERT, "insert"), (UPDATE, "update"), (DELETE, "delete")])
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The feed's sequence: keyset pages on (txid, id)
+            models.Index(fields=["txid", "id"], name="change_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id} {self.op} ({self.txid}.{self.id})"
+
+
+class EntryAudit(models.Model):
+    """
+    One change of an Entry's value: who set it from what to what, and when.
+    Append-only; written in bulk by core.audit, one INSERT per save.
+
+    No database foreign keys, so the history outlives deleted visits, fields
+    and users, and only the one index below to maintain. On Postgres the
+    table is partitioned by month of changed_at (migration 0013).
+    """
+    visit = models.ForeignKey(Visit, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                              related_name="+")
+    field = models.ForeignKey(CRFField, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                              related_name="+")
+    old_value = models.TextField(null=True, blank=True)   # None: the entry did not exist (or was blank)
+    new_value = models.TextField(null=True, blank=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                             db_index=False, related_name="+")
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # "Values as of T" for a visit: one range scan, already in (field, time) order
+            models.Index(fields=["visit", "field", "changed_at", "id"], name="entryaudit_asof_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.visit} :: {self.field.code} = {self.value_text}"
\ No newline at end of file
+        return f"{self.visit_id}/{self.field_id}: {self.old_value!r} -> {self.new_value!r} ({self.changed_at})"
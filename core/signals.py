@@ -0,0 +1,201 @@
+"""
+Model signal handlers for core (connected in CoreConfig.ready).
+"""
+from collections import Counter
+
+from django.db.models import Count, F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, datasets
+from .audit import record_deleted
+from .forms import invalidate_crf_form_cache
+from .fragment_cache import bump_subject, bump_visit
+from .models import CRF, AdverseEvent, CRFField, Dataset, Entry, Study, Subject, Visit, entries_deleted
+
+
+def _cascaded_from(origin, *models):
+    """True if this delete is part of deleting a row of `models` (which then does the bookkeeping)."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+@receiver([post_save, post_delete], sender=CRFField, dispatch_uid="core.crffield_form_cache")
+def crf_field_changed(sender, instance, **kwargs):
+    # The fingerprint already catches edits; this just frees stale classes early
+    invalidate_crf_form_cache(instance.crf_id)
+
+
+@receiver([post_save, post_delete], sender=Visit, dispatch_uid="core.visit_fragments")
+def visit_changed(sender, instance, **kwargs):
+    bump_subject(instance.subject_id)
+    bump_visit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AdverseEvent, dispatch_uid="core.ae_fragments")
+def adverse_event_changed(sender, instance, **kwargs):
+    bump_subject(instance.subject_id)
+
+
+@receiver(post_save, sender=Entry, dispatch_uid="core.entry_fragments")
+def entry_changed(sender, instance, **kwargs):
+    # Bulk writes (core.entries, core.importer) send no signals and bump themselves
+    bump_visit(instance.visit_id)
+
+
+# --- deletes ----------------------------------------------------------------------
+# Entry has no delete receivers, so cascades delete its rows in one statement
+# without loading them. Each cascade root accounts for what it takes down,
+# with one grouped query before the delete and one set of counter UPDATEs:
+#   Study    -> nothing (its counters and datasets go with it)
+#   Subject  -> the study loses the subject's own counts (below)
+#   Visit    -> its subject loses the visit and its entries
+#   CRFField -> its subjects lose its entries
+#   Entry    -> EntryQuerySet.delete() groups them by visit (entries_deleted)
+
+def _entries_gone(rows, refresh_datasets=True):
+    by_study, by_crf = {}, {}
+    for row in rows:
+        by_study.setdefault(row["study_id"], Counter())[row["subject_id"]] -= row["n"]
+        by_crf.setdefault(row["crf_id"], set()).add(row["visit_id"])
+    for study_id, by_subject in by_study.items():
+        counters.record_entries(study_id, by_subject)
+    if refresh_datasets:
+        for crf_id, visit_ids in by_crf.items():
+            datasets.refresh(crf_id, visit_ids)
+    for visit_id in {row["visit_id"] for row in rows}:
+        bump_visit(visit_id)
+
+
+@receiver(entries_deleted, sender=Entry, dispatch_uid="core.entries_deleted")
+def entries_removed(sender, rows, **kwargs):
+    _entries_gone(rows)
+
+
+# The root of a cascade also audits the entries it takes down (core.audit),
+# with one INSERT ... SELECT before they go
+_AUDIT_ROOTS = {
+    Study: ("visit__subject__study", ()),
+    Subject: ("visit__subject", (Study,)),
+    Visit: ("visit", (Subject, Study)),
+    CRF: ("field__crf", (Study,)),
+    CRFField: ("field", (CRF, Study)),
+}
+
+
+@receiver(pre_delete, sender=Study, dispatch_uid="core.study_entries_audit")
+@receiver(pre_delete, sender=Subject, dispatch_uid="core.subject_entries_audit")
+@receiver(pre_delete, sender=Visit, dispatch_uid="core.visit_entries_audit")
+@receiver(pre_delete, sender=CRF, dispatch_uid="core.crf_entries_audit")
+@receiver(pre_delete, sender=CRFField, dispatch_uid="core.crffield_entries_audit")
+def entries_audited(sender, instance, origin=None, **kwargs):
+    lookup, ancestors = _AUDIT_ROOTS[sender]
+    if not _cascaded_from(origin, *ancestors):
+        record_deleted(Entry.objects.using(instance._state.db).filter(**{lookup: instance}))
+
+
+@receiver(pre_delete, sender=Visit, dispatch_uid="core.visit_entries_predelete")
+def visit_entries_counted(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Subject, Study):
+        instance._deleted_entries = dict(
+            instance.entries.order_by().values_list("field__crf_id").annotate(n=Count("pk"))
+        )
+
+
+@receiver(pre_delete, sender=CRFField, dispatch_uid="core.crffield_entries_predelete")
+def crf_field_entries_counted(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Study):
+        instance._deleted_entries = list(
+            instance.entries.order_by().values("visit_id", subject_id=F("visit__subject_id"),
+                                               study_id=F("visit__subject__study_id"), crf_id=F("field__crf_id"))
+            .annotate(n=Count("pk"))
+        )
+
+
+@receiver(post_delete, sender=CRFField, dispatch_uid="core.crffield_counters_delete")
+def crf_field_deleted(sender, instance, **kwargs):
+    # Its dataset is marked stale (below), so there is nothing to refresh
+    _entries_gone(getattr(instance, "_deleted_entries", ()), refresh_datasets=False)
+
+
+@receiver(pre_delete, sender=Subject, dispatch_uid="core.subject_visits_predelete")
+def subject_visits_listed(sender, instance, origin=None, **kwargs):
+    if datasets.enabled() and not _cascaded_from(origin, Study):
+        instance._deleted_visits = list(instance.visits.values_list("pk", flat=True))
+
+
+# --- activity counters (core.counters) ----------------------------------------
+# post_save with created=False still stamps last activity; raw saves
+# (loaddata) carry their own counter values.
+
+@receiver(post_save, sender=Subject, dispatch_uid="core.subject_counters_save")
+def subject_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.record(study_id=instance.study_id, subjects=1)
+
+
+@receiver(post_delete, sender=Subject, dispatch_uid="core.subject_counters_delete")
+def subject_deleted(sender, instance, origin=None, **kwargs):
+    if _cascaded_from(origin, Study):
+        return
+    # Its visits, AEs and entries are not counted down one by one: the study
+    # loses what the subject's own counters hold
+    counters.record(study_id=instance.study_id, subjects=-1, visits=-instance.visit_count,
+                    aes=-instance.ae_count, entries=-instance.entry_count)
+    datasets.remove_visits(instance.study_id, getattr(instance, "_deleted_visits", ()))
+
+
+@receiver(post_save, sender=Visit, dispatch_uid="core.visit_counters_save")
+def visit_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.record(subject_id=instance.subject_id, visits=int(created))
+
+
+@receiver(post_delete, sender=Visit, dispatch_uid="core.visit_counters_delete")
+def visit_deleted(sender, instance, origin=None, **kwargs):
+    if _cascaded_from(origin, Subject, Study):
+        return
+    entries = getattr(instance, "_deleted_entries", {})
+    counters.record(subject_id=instance.subject_id, visits=-1, entries=-sum(entries.values()))
+    for crf_id in entries:
+        datasets.refresh(crf_id, [instance.pk])   # drops the visit's row
+
+
+@receiver(post_save, sender=AdverseEvent, dispatch_uid="core.ae_counters_save")
+def adverse_event_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.record(subject_id=instance.subject_id, aes=int(created))
+
+
+@receiver(post_delete, sender=AdverseEvent, dispatch_uid="core.ae_counters_delete")
+def adverse_event_deleted(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Subject, Study):
+        counters.record(subject_id=instance.subject_id, aes=-1)
+
+
+@receiver(post_save, sender=Entry, dispatch_uid="core.entry_counters_save")
+def entry_saved(sender, instance, created, raw=False, **kwargs):
+    # Bulk CRF saves (core.entries) record their own counts
+    if not raw:
+        counters.record(visit_id=instance.visit_id, entries=int(created))
+
+
+# --- materialized datasets (core.datasets) --------------------------------------
+
+@receiver([post_save, post_delete], sender=CRFField, dispatch_uid="core.crffield_dataset")
+def crf_field_dataset_stale(sender, instance, raw=False, **kwargs):
+    # The columns no longer match: refreshes stop until build_datasets runs
+    if not raw:
+        datasets.mark_stale(instance.crf_id)
+
+
+@receiver(post_save, sender=Entry, dispatch_uid="core.entry_dataset")
+def entry_dataset(sender, instance, raw=False, **kwargs):
+    # Bulk CRF saves and imports refresh their own visits; deletes are above
+    if datasets.enabled() and not raw:
+        datasets.refresh(instance.field.crf_id, [instance.visit_id])
+
+
+@receiver(post_delete, sender=Dataset, dispatch_uid="core.dataset_drop")
+def dataset_deleted(sender, instance, **kwargs):
+    datasets.drop(instance)
@@ -0,0 +1,151 @@
+"""
+Deterministic synthetic studies for load and scale testing.
+
+    generate(studies=1, subjects=1000, visits=10, crfs=3, fields=40, seed=1)
+
+Same parameters + seed -> same data. Everything is written with chunked bulk
+inserts (Entry rows via COPY on Postgres, executemany() elsewhere), a chunk
+of subjects at a time, so memory stays bounded however large the study.
+"""
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters
+from .models import CRF, AdverseEvent, CRFField, Entry, Study, Subject, Visit
+
+SUBJECT_CHUNK = 500
+BATCH_SIZE = 5000
+
+VISIT_NAMES = ["Screening", "Baseline", "Day 1", "Day 3", "Day 7", "Day 14", "Day 28", "Day 90", "Month 6", "Month 12"]
+CHOICES = [["Stable", "Critical", "Improving"], ["Yes", "No", "Unknown"], ["Mild", "Moderate", "Severe"]]
+AE_TERMS = ["Fever", "Headache", "Nausea", "Rash", "Hypotension", "Delirium", "Infection", "Bleeding"]
+FIELD_TYPES = [CRFField.INT, CRFField.INT, CRFField.FLOAT, CRFField.BOOL, CRFField.CHOICE, CRFField.TEXT]
+
+
+def _visit_name(i):
+    return VISIT_NAMES[i] if i < len(VISIT_NAMES) else f"Visit {i + 1}"
+
+
+def _fake_value(rng, field):
+    if field.field_type == CRFField.INT:
+        return str(rng.randint(40, 200))
+    if field.field_type == CRFField.FLOAT:
+        return f"{rng.uniform(35.0, 41.0):.1f}"
+    if field.field_type == CRFField.BOOL:
+        return "true" if rng.random() < 0.3 else "false"
+    if field.field_type == CRFField.CHOICE:
+        return rng.choice(field.choices)
+    return rng.choice(["n/a", "see notes", "unremarkable", "follow up"])
+
+
+def _build_crfs(rng, study, n_crfs, n_fields):
+    crfs = CRF.objects.bulk_create([CRF(study=study, name=f"CRF {c + 1:02d}") for c in range(n_crfs)])
+    fields = []
+    for crf in crfs:
+        for i in range(n_fields):
+            ftype = rng.choice(FIELD_TYPES)
+            fields.append(CRFField(
+                crf=crf, order=i, code=f"q{i + 1:03d}", name=f"Question {i + 1}",
+                field_type=ftype, required=rng.random() < 0.2,
+                choices=rng.choice(CHOICES) if ftype == CRFField.CHOICE else None,
+            ))
+    return CRFField.objects.bulk_create(fields, batch_size=BATCH_SIZE)
+
+
+def _insert_entries(rows):
+    """
+    rows: list of (visit_id, field_id, value_text, field_type). Rows are new,
+    so this skips the ORM: COPY on Postgres, executemany() elsewhere.
+    """
+    typed_cols = list(Entry.TYPED_COLUMNS.values())
+    cols = ["visit_id", "field_id", "value_text", *typed_cols, "created_at", "updated_at"]
+    now = timezone.now()
+    if connection.vendor != "postgresql":
+        now = connection.ops.adapt_datetimefield_value(now)
+
+    def params():
+        for vid, fid, text, ftype in rows:
+            typed = Entry.typed_values(ftype, text)
+            yield (vid, fid, text, *(typed[c] for c in typed_cols), now, now)
+
+    table = Entry._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            with cursor.copy(f"COPY {table} ({', '.join(cols)}) FROM STDIN") as copy:
+                for row in params():
+                    copy.write_row(row)
+        else:
+            placeholders = ", ".join(["%s"] * len(cols))
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})", params())
+
+
+def _subject_chunk(rng, study, start, count, n_visits, fields, ae_rate, fill, counts):
+    base = date(2024, 1, 1)
+    subjects = Subject.objects.bulk_create([
+        Subject(study=study, subject_id=f"{start + i + 1:06d}", enrolled_at=base + timedelta(days=rng.randrange(365)))
+        for i in range(count)
+    ])
+    visits = Visit.objects.bulk_create([
+        Visit(subject=s, name=_visit_name(v), visit_date=s.enrolled_at + timedelta(days=v * 7))
+        for s in subjects for v in range(n_visits)
+    ], batch_size=BATCH_SIZE)
+
+    aes = []
+    for s in subjects:
+        # ae_rate is the mean number of AEs per subject
+        n_ae = int(ae_rate) + (rng.random() < ae_rate - int(ae_rate))
+        for _ in range(n_ae):
+            onset = datetime.combine(s.enrolled_at + timedelta(days=rng.randrange(90)), time(rng.randrange(24)))
+            aes.append(AdverseEvent(
+                subject=s, onset=onset.replace(tzinfo=dt_timezone.utc),
+                severity=rng.choice(["mild", "mild", "moderate", "severe"]),
+                description=rng.choice(AE_TERMS), related_to_study=rng.random() < 0.25,
+            ))
+    AdverseEvent.objects.bulk_create(aes, batch_size=BATCH_SIZE)
+
+    rows = []
+    for visit in visits:
+        for f in fields:
+            if rng.random() < fill:
+                rows.append((visit.id, f.id, _fake_value(rng, f), f.field_type))
+        if len(rows) >= BATCH_SIZE * 4:
+            _insert_entries(rows)
+            counts["entries"] += len(rows)
+            rows = []
+    if rows:
+        _insert_entries(rows)
+        counts["entries"] += len(rows)
+
+    counts["subjects"] += len(subjects)
+    counts["visits"] += len(visits)
+    counts["adverse_events"] += len(aes)
+
+
+def generate(studies=1, subjects=100, visits=5, crfs=2, fields=20, ae_rate=0.5, fill=0.8,
+             seed=1, prefix="SYN", progress=None):
+    """
+    Create `studies` synthetic studies (codes <prefix>-001, ...) and return
+    counts per model. `progress(counts)` is called after every subject chunk.
+    """
+    rng = random.Random(seed)
+    counts = dict.fromkeys(["studies", "subjects", "visits", "crfs", "fields", "adverse_events", "entries"], 0)
+    for s in range(studies):
+        with transaction.atomic():
+            study = Study.objects.create(code=f"{prefix}-{s + 1:03d}", name=f"Synthetic study {s + 1} (seed {seed})")
+            study_fields = _build_crfs(rng, study, crfs, fields)
+        counts["studies"] += 1
+        counts["crfs"] += crfs
+        counts["fields"] += len(study_fields)
+
+        for start in range(0, subjects, SUBJECT_CHUNK):
+            with transaction.atomic():
+                _subject_chunk(rng, study, start, min(SUBJECT_CHUNK, subjects - start),
+                               visits, study_fields, ae_rate, fill, counts)
+            if progress:
+                progress(counts)
+        counters.recount([study.pk])
+        counters.restamp_on_commit(study.pk)
+    return counts
@@ -0,0 +1,54 @@
+import hashlib
+
+from django import template
+
+from .. import fragment_cache
+from ..forms import _crf_fields_fingerprint
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, name, obj, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        vary_on = [v.resolve(context) for v in self.vary_on]
+        kind = obj._meta.model_name
+        return fragment_cache.get_or_render(
+            name, kind, obj.pk, lambda: self.nodelist.render(context), vary_on
+        )
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """
+    {% versioned_cache "fragment name" subject [vary_on ...] %} ... {% endversioned_cache %}
+
+    Cached until the object's version is bumped (see core.fragment_cache).
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and an object.")
+    nodelist = parser.parse(("endversioned_cache",))
+    parser.delete_first_token()
+    return VersionedCacheNode(
+        nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]),
+        [parser.compile_filter(b) for b in bits[3:]],
+    )
+
+
+@register.filter
+def fields_version(crf):
+    """
+    Short hash of a CRF's fields (codes, labels, order, ...): vary a fragment
+    on it and a field edit or delete shows up without bumping every visit.
+    Free when the fields are prefetched, as visit_entry does.
+    """
+    fingerprint = repr(_crf_fields_fingerprint(crf.fields.all()))
+    return hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
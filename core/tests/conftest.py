@@ -40,3 +40,13 @@ def add_entries(db):
         for field, value in field_values.items():
             Entry.objects.update_or_create(visit=visit, field=field, defaults={"value_text": value})
     return _add
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Fragment versions and completeness matrices are keyed by pk, and pks are reused between tests
+    yield
+    from django.core.cache import caches
+    from core import completeness
+    for cache in caches.all():
+        cache.clear()
+    completeness.invalidate()
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.entries import save_crf_entries
+from core.models import Subject, Visit
+
+
+def _changelist_queries(admin_client, url, **params):
+    with CaptureQueriesContext(connection) as ctx:
+        response = admin_client.get(url, params)
+    assert response.status_code == 200
+    return response, len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_entry_changelist_query_count_does_not_grow_with_rows(admin_client, study, subject, visit_baseline, crf, crf_fields):
+    url = reverse("admin:core_entry_changelist")
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    _, few = _changelist_queries(admin_client, url)
+
+    for i in range(5):
+        other = Subject.objects.create(study=study, subject_id=f"1{i:02d}", enrolled_at=date.today())
+        visit = Visit.objects.create(subject=other, name="Baseline", visit_date=date.today())
+        save_crf_entries(visit, crf_fields, {"bp_sys": 120 + i})
+    response, many = _changelist_queries(admin_client, url)
+    assert many == few
+    # Autocomplete filters load no related objects; no full-table count link
+    assert 'data-filter="visit__subject__id__exact"' in response.content.decode()
+    assert response.context["cl"].show_full_result_count is False
+
+
+@pytest.mark.django_db
+def test_autocomplete_filter_applies_and_shows_the_selection(admin_client, subject, visit_baseline, visit_day7):
+    response = admin_client.get(reverse("admin:core_visit_changelist"), {"subject__id__exact": subject.pk})
+    assert response.context["cl"].result_count == 2
+    assert f'<option value="{subject.pk}" selected>{subject}</option>' in response.content.decode()
+
+    # The search box is served by the admin autocomplete view
+    response = admin_client.get(reverse("admin:autocomplete"), {
+        "app_label": "core", "model_name": "visit", "field_name": "subject", "term": "00",
+    })
+    assert [r["text"] for r in response.json()["results"]] == [str(subject)]
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.entries import save_crf_entries
+from core.models import AdverseEvent, Subject
+from core.pagination import encode_cursor
+
+URL = reverse("core:api_list", args=["subjects"])
+
+
+def _all_pages(client, url, **params):
+    rows, pages, after = [], 0, None
+    while True:
+        body = client.get(url, {**params, **({"after": after} if after else {})}).json()
+        rows += body["data"]
+        pages += 1
+        after = body["next_cursor"]
+        if after is None:
+            return rows, pages
+
+
+@pytest.mark.django_db
+def test_values_pages_follow_the_cursor_without_building_instances(client, study, monkeypatch):
+    Subject.objects.bulk_create([Subject(study=study, subject_id=f"S-{i}", enrolled_at=date(2030, 1, i))
+                                 for i in range(1, 6)])
+    built = []
+    monkeypatch.setattr(Subject, "from_db", classmethod(lambda cls, *a: built.append(a) or None))
+
+    rows, pages = _all_pages(client, URL, study=study.code, fields="subject_id,enrolled_at", limit=2)
+    assert pages == 3
+    assert rows[0] == {"subject_id": "S-1", "enrolled_at": "2030-01-01"}
+    assert [r["subject_id"] for r in rows] == [f"S-{i}" for i in range(1, 6)]
+    assert built == []
+
+
+@pytest.mark.django_db
+def test_include_prefetches_related_rows(client, django_assert_num_queries, study, subject, visit_baseline,
+                                         visit_day7, crf_fields):
+    now = timezone.now()
+    for days in (1, 2, 3):
+        AdverseEvent.objects.create(subject=subject, onset=now - timedelta(days=days), severity="mild",
+                                    description=f"AE {days}")
+    with django_assert_num_queries(3):   # the page, its visits, its AEs
+        body = client.get(URL, {"study": study.code, "fields": "subject_id",
+                                "include": "visits,adverse_events"}).json()
+    (row,) = body["data"]
+    assert [v["name"] for v in row["visits"]] == ["Baseline", "Day 7"]
+    assert [ae["description"] for ae in row["adverse_events"]] == ["AE 1", "AE 2", "AE 3"]
+
+    # Mixed-direction keyset (subject, -onset, -id)
+    aes, _ = _all_pages(client, reverse("core:api_list", args=["adverse_events"]), subject=subject.pk, limit=2)
+    assert [ae["description"] for ae in aes] == ["AE 1", "AE 2", "AE 3"]
+
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+    body = client.get(reverse("core:api_list", args=["entries"]),
+                      {"visit": visit_baseline.pk, "fields": "value_text", "include": "field"}).json()
+    assert [(e["field"]["code"], e["value_text"]) for e in body["data"]] == [
+        ("bp_sys", "120"), ("temp_c", None), ("status", "Stable"), ("on_vent", None),
+    ]
+
+
+@pytest.mark.django_db
+def test_bad_parameters(client, study):
+    assert client.get(reverse("core:api_list", args=["nope"])).status_code == 404
+    for params in ({"fields": "password"}, {"include": "everything"}, {"after": "garbage"},
+                   {"after": encode_cursor(["x", "001"])}, {"limit": "many"}):
+        response = client.get(URL, params)
+        assert response.status_code == 400, params
+    assert client.post(URL).status_code == 405
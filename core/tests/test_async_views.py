@@ -0,0 +1,69 @@
+import re
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import caches
+from django.test import AsyncClient, override_settings
+from django.urls import resolve, reverse
+
+from core.async_views import _concurrently
+from core.entries import save_crf_entries
+from core.models import AdverseEvent
+
+ASGI_URLS = override_settings(ROOT_URLCONF="mini_edc.asgi_urls")
+
+
+def _aget(path, **headers):
+    return async_to_sync(AsyncClient().get)(path, headers=headers)
+
+
+def _page(response):
+    # Masked CSRF tokens differ on every render
+    return re.sub(r'name="csrfmiddlewaretoken" value="\w+"', "", response.content.decode())
+
+
+@ASGI_URLS
+def test_read_pages_are_coroutines_under_asgi_urls():
+    for name, args in [("dashboard", []), ("study_detail", ["S"]), ("subject_detail", ["S", "1"]),
+                       ("visit_entry", ["S", "1", 1])]:
+        assert iscoroutinefunction(resolve(reverse(f"core:{name}", args=args)).func)
+    assert not iscoroutinefunction(resolve(reverse("core:ae_create", args=["S", "1"])).func)
+
+
+# The subject page fetches on other threads, which only see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_async_pages_match_the_sync_ones(client, study, subject, visit_baseline, crf, crf_fields):
+    AdverseEvent.objects.create(subject=subject, onset="2030-01-01T10:00Z", severity="mild", description="Rash")
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 123})
+    urls = [
+        reverse("core:dashboard"),
+        reverse("core:study_detail", args=[study.code]),
+        reverse("core:subject_detail", args=[study.code, subject.subject_id]),
+    ]
+    expected = [_page(client.get(url)) for url in urls]
+    caches["fragments"].clear()   # so the subject page fetches its visits and AEs
+    with ASGI_URLS:
+        assert [_page(_aget(url)) for url in urls] == expected
+
+        entry_url = reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id])
+        page = _aget(entry_url).content.decode()
+        assert 'value="123"' in page and "Baseline CRF" in page
+        partial = _aget(entry_url, hx_request="true").content.decode()
+        assert 'id="visit-entry-section"' in partial and "<html" not in partial
+
+
+@pytest.mark.django_db(transaction=True)
+@ASGI_URLS
+def test_async_pages_answer_304_and_404(study, subject):
+    url = reverse("core:subject_detail", args=[study.code, subject.subject_id])
+    first = _aget(url)
+    assert first.status_code == 200
+    assert _aget(url, if_none_match=first["ETag"]).status_code == 304
+    assert _aget(reverse("core:subject_detail", args=[study.code, "nope"])).status_code == 404
+
+
+def test_without_a_pool_queries_stay_on_the_request_connection():
+    # One thread, one connection: no per-call connect/close without DB_POOL_ENABLED
+    idents = async_to_sync(_concurrently)(threading.get_ident, threading.get_ident)
+    assert idents[0] == idents[1]
@@ -0,0 +1,115 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.audit import values_as_of
+from core.entries import save_crf_entries
+from core.importer import StudyImporter
+from core.models import CRFField, Entry, EntryAudit, Subject
+
+
+def _trail(visit):
+    return list(EntryAudit.objects.filter(visit=visit).order_by("id")
+                .values_list("field__code", "old_value", "new_value", "user__username"))
+
+
+@pytest.mark.django_db
+def test_crf_save_audits_changes_in_one_insert(visit_baseline, crf_fields, django_user_model):
+    user = django_user_model.objects.create_user("monitor")
+    data = {"bp_sys": 120, "status": "Stable", "on_vent": False}
+    save_crf_entries(visit_baseline, crf_fields, data, user)
+    # temp_c was created blank: nothing to audit
+    assert _trail(visit_baseline) == [
+        ("bp_sys", None, "120", "monitor"), ("status", None, "Stable", "monitor"),
+        ("on_vent", None, "false", "monitor"),
+    ]
+
+    with CaptureQueriesContext(connection) as ctx:
+        save_crf_entries(visit_baseline, crf_fields, {**data, "bp_sys": 125, "status": ""})
+    assert sum(q["sql"].startswith('INSERT INTO "core_entryaudit"') for q in ctx.captured_queries) == 1
+    assert _trail(visit_baseline)[3:] == [("bp_sys", "120", "125", None), ("status", "Stable", None, None)]
+
+    # History outlives the entries, and records their removal
+    visit_id = visit_baseline.pk
+    visit_baseline.delete()
+    assert _trail(visit_id)[5:] == [("bp_sys", "125", None, None), ("on_vent", "false", None, None)]
+
+
+@pytest.mark.django_db
+def test_values_as_of(visit_baseline, visit_day7, crf_fields):
+    (bp, temp, status, vent) = crf_fields
+    now = timezone.now()
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+    EntryAudit.objects.update(changed_at=now - timedelta(days=2))
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 125, "temp_c": 37.5})
+    EntryAudit.objects.filter(changed_at__gt=now - timedelta(days=1)).update(changed_at=now - timedelta(days=1))
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 90})
+
+    assert values_as_of(visit_baseline, now - timedelta(days=3)) == {}
+    assert values_as_of(visit_baseline, now - timedelta(days=2)) == {bp.pk: "120", status.pk: "Stable"}
+    assert values_as_of(visit_baseline, now) == {bp.pk: "125", status.pk: None, temp.pk: "37.5"}
+
+
+@pytest.mark.django_db
+def test_batch_api_and_importer_are_audited(client, tmp_path, study, subject, visit_baseline, crf_fields,
+                                            django_user_model):
+    client.force_login(django_user_model.objects.create_user("coordinator"))
+    client.post(reverse("core:entries_batch_api", args=[study.code]), json.dumps({"records": [
+        {"subject_id": "001", "visit": "Baseline", "crf": "Baseline CRF", "values": {"bp_sys": 120}},
+        {"subject_id": "001", "visit": "Baseline", "crf": "Baseline CRF", "values": {"bp_sys": 125}},
+    ]}), content_type="application/json")
+    assert _trail(visit_baseline) == [("bp_sys", None, "120", "coordinator"), ("bp_sys", "120", "125", "coordinator")]
+
+    entries = tmp_path / "entries.jsonl"
+    entries.write_text("\n".join(json.dumps({"subject_id": "001", "visit": "Baseline", "field_code": "bp_sys",
+                                             "value": v}) for v in ("125", "130")) + "\n")
+    StudyImporter(study, batch_size=1).run({"entries": str(entries)})
+    assert _trail(visit_baseline)[2:] == [("bp_sys", "125", "130", None)]
+
+
+@pytest.mark.django_db
+def test_admin_edits_and_deletes_are_audited(admin_client, admin_user, visit_baseline, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    entry = Entry.objects.get(visit=visit_baseline, field__code="bp_sys")
+    url = reverse("admin:core_entry_change", args=[entry.pk])
+    response = admin_client.post(url, {"visit": visit_baseline.pk, "field": entry.field_id, "value_text": "125"})
+    assert response.status_code == 302
+    assert _trail(visit_baseline)[-1] == ("bp_sys", "120", "125", admin_user.username)
+
+    # Saving without a change adds nothing
+    Entry.objects.get(pk=entry.pk).save()
+    assert len(_trail(visit_baseline)) == 2
+
+    admin_client.post(reverse("admin:core_entry_delete", args=[entry.pk]), {"post": "yes"})
+    assert _trail(visit_baseline)[-1] == ("bp_sys", "125", None, admin_user.username)
+
+
+@pytest.mark.django_db
+def test_cascades_are_audited_once_by_their_root(subject, visit_baseline, visit_day7,
+                                                 crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 130})
+    before = EntryAudit.objects.count()
+
+    CRFField.objects.get(code="status").delete()
+    assert EntryAudit.objects.count() == before + 1
+    Subject.objects.get(pk=subject.pk).delete()
+    assert list(EntryAudit.objects.order_by("id").values_list("new_value", flat=True))[before + 1:] == [None, None]
+    assert sorted(EntryAudit.objects.order_by("id").values_list("old_value", flat=True)[before + 1:]) == ["120", "130"]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="partitions and the trigger are Postgres-only")
+def test_postgres_table_is_partitioned_and_append_only(visit_baseline, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_inherits WHERE inhparent = 'core_entryaudit'::regclass")
+        assert cursor.fetchone()[0] >= 4   # DEFAULT plus this month and the next two
+    for write in (lambda: EntryAudit.objects.update(new_value="x"), lambda: EntryAudit.objects.all().delete()):
+        with pytest.raises(DatabaseError), transaction.atomic():
+            write()
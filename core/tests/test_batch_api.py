@@ -0,0 +1,74 @@
+import json
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Entry, Subject, Visit
+
+
+def _post(client, study, records):
+    return client.post(reverse("core:entries_batch_api", args=[study.code]),
+                       json.dumps({"records": records}), content_type="application/json")
+
+
+@pytest.mark.django_db
+def test_batch_saves_valid_records_and_reports_the_rest(client, study, subject, visit_baseline, visit_day7, crf_fields):
+    (bp, temp, status, vent) = crf_fields
+    response = _post(client, study, [
+        {"subject_id": "001", "visit": "Baseline", "crf": "Baseline CRF",
+         "values": {"bp_sys": 120, "on_vent": "false"}},
+        {"subject_id": "001", "visit": "Day 7", "crf": "Baseline CRF",
+         "values": {"bp_sys": "high", "status": "Gone", "nope": 1}},
+        {"subject_id": "001", "visit": "Week 9", "crf": "Baseline CRF", "values": {"bp_sys": 1}},
+        {"subject_id": "001", "visit": "Baseline", "crf": "Baseline CRF", "values": {"bp_sys": 125, "temp_c": 37.2}},
+        {"subject_id": "001", "visit": "Day 7", "crf": "Baseline CRF", "values": {"bp_sys": None}},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["saved"], body["rejected"]) == (2, 3)
+    results = body["results"]
+    assert results[0] == {"index": 0, "ok": True, "created": 2, "changed": 0, "unchanged": 0}
+    assert set(results[1]["errors"]) == {"bp_sys", "status", "nope"}
+    assert results[2]["errors"] == {"__all__": ["Unknown visit 'Week 9' for subject '001'."]}
+    # applied in order: the second Baseline record sees the first one's value
+    assert results[3] == {"index": 3, "ok": True, "created": 1, "changed": 1, "unchanged": 0}
+    assert results[4]["errors"] == {"bp_sys": ["This field is required."]}
+
+    values = dict(Entry.objects.filter(visit=visit_baseline).values_list("field__code", "value_text"))
+    assert values == {"bp_sys": "125", "on_vent": "false", "temp_c": "37.2"}
+    assert not Entry.objects.filter(visit=visit_day7).exists()
+    subject.refresh_from_db()
+    assert subject.entry_count == 3
+
+
+@pytest.mark.django_db
+def test_batch_query_count_does_not_grow_with_records(client, study, subject, crf_fields):
+    Subject.objects.bulk_create([Subject(study=study, subject_id=f"{i:03d}", enrolled_at=date.today())
+                                 for i in range(2, 21)])
+    Visit.objects.bulk_create([Visit(subject=s, name="Baseline", visit_date=date.today())
+                               for s in study.subjects.all()])
+
+    def records(subject_ids, bp):
+        return [{"subject_id": sid, "visit": "Baseline", "crf": "Baseline CRF",
+                 "values": {"bp_sys": bp, "temp_c": 36.6, "status": "Stable", "on_vent": True}}
+                for sid in subject_ids]
+
+    counts = []
+    for subject_ids in (["001"], [f"{i:03d}" for i in range(2, 21)]):
+        with CaptureQueriesContext(connection) as ctx:
+            assert _post(client, study, records(subject_ids, 120)).json()["rejected"] == 0
+        counts.append(len(ctx.captured_queries))
+    assert counts[0] == counts[1]
+    assert Entry.objects.filter(visit__subject__study=study).count() == 80
+
+
+@pytest.mark.django_db
+def test_batch_rejects_malformed_requests(client, study):
+    url = reverse("core:entries_batch_api", args=[study.code])
+    assert client.post(url, {"records": "x"}).status_code == 415
+    assert client.post(url, "{", content_type="application/json").status_code == 400
+    assert _post(client, study, {"not": "a list"}).status_code == 400
+    assert client.get(url).status_code == 405
@@ -0,0 +1,45 @@
+import pytest
+
+from core.benchmarks import views as view_bench
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_core_views_do_not_regress_query_counts():
+    # Latency is machine-dependent, so only query counts are gated here;
+    # run `manage.py benchmark views` for the full latency comparison.
+    report = view_bench.run(sizes=["small"], repeats=3, latency_tolerance=-1)
+    assert set(report["results"]["small"]) == {
+        "dashboard", "study_detail", "subject_detail", "subject_detail_304", "visit_entry_get",
+        "visit_entry_get_304", "visit_entry_post", "adverse_event_create", "crf_builder", "study_completeness",
+    }
+    assert report["regressions"] == []
+
+def test_compare_flags_query_and_latency_regressions():
+    baseline = {"small": {"dashboard": {"p50_ms": 10.0, "queries": 2}}}
+    assert view_bench.compare({"small": {"dashboard": {"p50_ms": 14.0, "queries": 2}}}, baseline, 0.5) == []
+    regressions = view_bench.compare({"small": {"dashboard": {"p50_ms": 16.0, "queries": 3}}}, baseline, 0.5)
+    assert len(regressions) == 2
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_load_benchmark_posts_concurrently():
+    from core.benchmarks import load
+    report = load.run(threads=2, requests=2, fields=3)
+    assert report["results"]["requests"] == 4
+    assert report["pooled"] is False
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_asgi_benchmark_serves_both_paths():
+    from core.benchmarks import asgi
+    report = asgi.run(concurrency=2, requests=4, subjects=4)
+    assert {mode: r["requests"] for mode, r in report["results"].items()} == {"wsgi": 8, "asgi": 8}
+    assert report["regressions"] == []
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_api_benchmark_pulls_both_ways():
+    from core.benchmarks import api
+    report = api.run(subjects=60, repeats=1)
+    assert report["results"]["subjects"]["html"]["requests"] == 2
+    assert report["results"]["subject_records"]["api"]["queries"] == 3   # the page and two prefetches
@@ -0,0 +1,96 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from core import changes
+from core.checks import change_feed_backend
+from core.entries import save_crf_entries
+from core.models import AdverseEvent, Change, Entry
+from core.pagination import encode_cursor
+
+URL = reverse("core:change_feed")
+
+
+def _pull(client, **params):
+    lines = [json.loads(line) for line in b"".join(client.get(URL, params).streaming_content).splitlines()]
+    return lines[:-1], lines[-1]
+
+
+@pytest.mark.django_db
+def test_feed_follows_inserts_updates_and_cascade_deletes(client, subject, visit_baseline, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+    ae = AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+    items, end = _pull(client)
+    assert [(i["model"], i["op"]) for i in items] == [("entry", "upsert")] * 4 + [("adverse_event", "upsert")]
+    assert {i["data"]["value_text"] for i in items[:4]} == {"120", "Stable", None}
+    assert items[4]["data"]["description"] == "Rash"
+    assert end["has_more"] is False
+
+    # Nothing new: the same cursor comes back
+    assert _pull(client, after=end["next_cursor"]) == ([], end)
+
+    # The bulk upsert and a cascade (no model .delete() per Entry) are both seen
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 125, "status": "Stable"})
+    bp_id = Entry.objects.get(visit=visit_baseline, field__code="bp_sys").pk
+    entry_ids = set(Entry.objects.filter(visit=visit_baseline).values_list("id", flat=True))
+    items, _ = _pull(client, after=end["next_cursor"], models="entry")
+    assert [(i["id"], i["data"]["value_text"]) for i in items] == [(bp_id, "125")]
+
+    visit_baseline.delete()
+    ae.description = "Rash, resolved"
+    ae.save()
+    items, end = _pull(client, after=end["next_cursor"])
+    deletes = {i["id"] for i in items if i["op"] == "delete"}
+    assert deletes == entry_ids
+    assert all(i["data"] is None for i in items if i["op"] == "delete")
+    assert items[-1]["data"]["description"] == "Rash, resolved"
+
+
+@pytest.mark.django_db
+def test_feed_reads_in_chunks_up_to_the_limit(client, django_assert_num_queries, visit_baseline, visit_day7,
+                                              crf_fields, monkeypatch):
+    monkeypatch.setattr(changes, "CHUNK_SIZE", 3)
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 130})
+    assert Change.objects.count() == 8
+
+    # limit 5 = a chunk of 3 and one of 2: two change reads, two entry reads
+    with django_assert_num_queries(4):
+        items, end = _pull(client, limit=5)
+    assert len(items) == 5 and end["has_more"] is True
+    rest, end = _pull(client, after=end["next_cursor"])
+    assert len(rest) == 3 and end["has_more"] is False
+    assert len({i["id"] for i in items + rest}) == 8
+
+
+@pytest.mark.django_db
+def test_bad_parameters(client):
+    for params in ({"after": "garbage"}, {"after": encode_cursor(["x", "y"])}, {"models": "subject"}, {"limit": "many"}, {"limit": 0}):
+        assert client.get(URL, params).status_code == 400, params
+    assert client.post(URL).status_code == 405
+
+
+@pytest.mark.django_db
+def test_command_writes_ndjson_and_prunes(visit_baseline, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    out = StringIO()
+    call_command("change_feed", "--models", "entry", stdout=out)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(lines) == 5 and lines[-1]["next_cursor"]
+
+    Change.objects.filter(id__in=Change.objects.order_by("id").values("id")[:2]).update(
+        changed_at=timezone.now() - timedelta(days=40))
+    call_command("change_feed", "--prune-days", "30", stdout=StringIO())
+    assert Change.objects.count() == 2
+
+
+def test_check_warns_for_backends_without_triggers(monkeypatch):
+    assert change_feed_backend(None) == []
+    monkeypatch.setattr(connection, "vendor", "mysql")
+    assert [w.id for w in change_feed_backend(None)] == ["core.W001"]
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+
+from django.utils import timezone
+
+from core import completeness
+from core.batch import save_batch
+from core.entries import save_crf_entries
+from core.models import Subject, Visit
+
+
+@pytest.mark.django_db
+def test_matrix_counts_filled_and_required(study, subject, visit_baseline, visit_day7, crf, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+
+    matrix = completeness.for_study(study)
+    assert matrix.columns == ["Baseline", "Day 7"]
+    # bp_sys is the only required field; fields left out are stored as NULL
+    assert matrix.cell(0, 0, 0) == (1, 1, 2, 4)
+    assert matrix.cell(0, 1, 0) == (0, 1, 0, 4)
+
+
+@pytest.mark.django_db
+def test_matrix_refreshes_incrementally_and_rebuilds_on_new_visits(
+        django_assert_max_num_queries, study, subject, visit_baseline, crf, crf_fields):
+    matrix = completeness.for_study(study)
+    assert matrix.cell(0, 0, 0).filled == 0
+
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    with django_assert_max_num_queries(3):  # signature + touched subjects + their entry counts
+        assert completeness.for_study(study) is matrix
+    assert matrix.cell(0, 0, 0).filled_required == 1
+
+    Visit.objects.create(subject=subject, name="Baseline", visit_date=date(2030, 1, 1))
+    completeness.for_study(study)
+    assert matrix.columns == ["Baseline", "Baseline (2)"]
+    assert matrix.cell(0, 1, 0) == (0, 1, 0, 4)
+
+
+@pytest.mark.django_db
+def test_refresh_holds_the_refresh_lock_from_signature_to_watermark(
+        monkeypatch, study, subject, visit_baseline, crf, crf_fields):
+    matrix = completeness.for_study(study)
+    held = []
+    signature, entry_counts = completeness._signature, matrix._entry_counts
+    monkeypatch.setattr(completeness, "_signature", lambda *a: held.append(matrix.refresh_lock.locked()) or signature(*a))
+    monkeypatch.setattr(matrix, "_entry_counts", lambda *a: held.append(matrix.refresh_lock.locked()) or entry_counts(*a))
+
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    matrix.refresh()
+    assert held == [True, True]
+    assert matrix.cell(0, 0, 0).filled_required == 1 and not matrix.refresh_lock.locked()
+
+
+@pytest.mark.django_db
+def test_bulk_writes_are_restamped_after_commit(django_capture_on_commit_callbacks, study, subject, visit_baseline,
+                                                crf, crf_fields):
+    matrix = completeness.for_study(study)
+    with django_capture_on_commit_callbacks() as callbacks:
+        save_batch(study, [{"subject_id": "001", "visit": "Baseline", "crf": crf.name, "values": {"bp_sys": 120}}])
+    # A transaction open for longer than the overlap: its stamp is already behind the watermark
+    now = timezone.now()
+    Subject.objects.filter(pk=subject.pk).update(last_activity_at=now - timedelta(hours=1))
+    matrix.watermark = now
+    matrix.refresh()
+    assert matrix.cell(0, 0, 0).filled == 0
+
+    for callback in callbacks:
+        callback()
+    matrix.refresh()
+    assert matrix.cell(0, 0, 0).filled == 1
+
+
+@pytest.mark.django_db
+def test_completeness_page_and_api(client, study, subject, visit_baseline, crf, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+
+    html = client.get(reverse("core:study_completeness", args=[study.code])).content.decode()
+    assert '<td class="done" title="1/4 fields">1/1</td>' in html
+
+    data = client.get(reverse("core:study_completeness_api", args=[study.code])).json()
+    assert data["columns"] == ["Baseline"]
+    assert data["crfs"] == [{"id": crf.id, "name": crf.name, "required": 1, "fields": 4}]
+    assert data["subjects"] == [{"subject_id": "001", "cells": [[[1, 1]]]}]
@@ -0,0 +1,74 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import AdverseEvent
+
+
+@pytest.mark.django_db
+def test_unchanged_subject_page_answers_304_with_one_query(client, django_assert_num_queries, study, subject):
+    url = reverse("core:subject_detail", args=[study.code, subject.subject_id])
+    client.get(url)  # CSRF cookie is part of the ETag
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first["ETag"] and first["Last-Modified"]
+    assert "HX-Request" in first["Vary"]
+
+    with django_assert_num_queries(1):
+        resp = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+@pytest.mark.django_db
+def test_new_adverse_event_changes_the_etag(client, study, subject):
+    url = reverse("core:subject_detail", args=[study.code, subject.subject_id])
+    client.get(url)
+    etag = client.get(url)["ETag"]
+
+    AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_visit_entry_etag_tracks_entries_and_htmx(client, study, subject, visit_baseline, crf, crf_fields):
+    url = reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id]) + f"?crf={crf.id}"
+    client.get(url)
+    full = client.get(url)
+    partial = client.get(url, HTTP_HX_REQUEST="true")
+    assert full["ETag"] != partial["ETag"]  # same URL, different representation
+    assert client.get(url, HTTP_IF_NONE_MATCH=full["ETag"]).status_code == 304
+
+    client.post(url, {"bp_sys": "128"}, HTTP_HX_REQUEST="true")
+    assert client.get(url, HTTP_IF_NONE_MATCH=full["ETag"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_dashboard_etag_changes_when_a_study_is_deleted(client, study):
+    url = reverse("core:dashboard")
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    study.delete()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_redirect_after_post_shows_the_flash_instead_of_a_304(client, study, subject, visit_baseline, crf,
+                                                             crf_fields):
+    url = reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id]) + f"?crf={crf.id}"
+    client.post(url, {"bp_sys": "128"})
+    client.get(url)    # the flash of the first save
+    etag = client.get(url)["ETag"]
+
+    # Nothing changes, but the redirect GET must carry the new flash
+    response = client.post(url, {"bp_sys": "128"})
+    assert response.status_code == 302
+    response = client.get(response["Location"], HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "Saved data for CRF" in response.content.decode()
+    assert response["ETag"] != etag
+
+    # Once shown, the page is validated as before
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
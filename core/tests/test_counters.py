@@ -0,0 +1,82 @@
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.entries import save_crf_entries
+from core.models import AdverseEvent, Study, Subject
+
+
+def _counts(obj):
+    obj.refresh_from_db()
+    return obj.visit_count, obj.ae_count, obj.entry_count
+
+
+@pytest.mark.django_db
+def test_counters_follow_creates_and_deletes(study, subject, visit_baseline, visit_day7, crf, crf_fields):
+    ae = AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120, "status": "Stable"})
+
+    assert _counts(subject) == (2, 1, 4)  # unset fields are stored as NULL entries
+    assert _counts(study) == (2, 1, 4)
+    assert study.subject_count == 1
+    assert subject.last_activity_at is not None
+
+    ae.delete()
+    visit_baseline.delete()  # cascades to its entries
+    assert _counts(subject) == (1, 0, 0)
+    assert _counts(study) == (1, 0, 0)
+
+    subject.delete()
+    study.refresh_from_db()
+    assert (study.subject_count, study.visit_count) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_recount_repairs_drift(study, subject, visit_baseline, add_entries, crf_fields):
+    add_entries(visit_baseline, {crf_fields[0]: "120"})
+    Subject.objects.filter(pk=subject.pk).update(visit_count=7, entry_count=0)
+    Study.objects.filter(pk=study.pk).update(subject_count=0)
+
+    call_command("recount", "--dry-run")
+    assert _counts(subject) == (7, 0, 0)
+
+    call_command("recount", study.code)
+    assert _counts(subject) == (1, 0, 1)
+    assert _counts(study) == (1, 0, 1)
+    assert study.subject_count == 1
+
+    from core.counters import recount
+    assert recount() == {"studies": 0, "subjects": 0}
+
+
+@pytest.mark.django_db
+def test_dashboard_shows_counters_without_extra_queries(client, django_assert_num_queries, study, subject, visit_baseline):
+    from django.urls import reverse
+    with django_assert_num_queries(2):  # validators + studies
+        html = client.get(reverse("core:dashboard")).content.decode()
+    assert "<td>1</td>" in html
+
+
+@pytest.mark.django_db
+def test_deletes_count_down_once_per_cascade_root(django_assert_max_num_queries, study, subject, visit_baseline,
+                                                  visit_day7, crf_fields):
+    for visit in (visit_baseline, visit_day7):
+        save_crf_entries(visit, crf_fields, {"bp_sys": 120})
+    AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+
+    # Direct deletes: grouped by visit, whatever the number of entries
+    visit_day7.entries.filter(field__code__in=["bp_sys", "status"]).delete()
+    crf_fields[1].delete()   # temp_c, on both visits
+    assert _counts(subject) == (2, 1, 4)
+    assert _counts(study) == (2, 1, 4)
+
+    # Entries are fast-deleted under a Visit (no row loaded); one counter update
+    with django_assert_max_num_queries(10):
+        visit_day7.delete()
+    assert _counts(subject) == (1, 1, 3)
+
+    # Under a Subject, only the study is updated, by the subject's own counts
+    subject.delete()
+    assert _counts(study) == (0, 0, 0)
+    study.refresh_from_db()
+    assert study.subject_count == 0
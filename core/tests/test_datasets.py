@@ -0,0 +1,88 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+
+from core import datasets
+from core.entries import save_crf_entries
+from core.models import CRFField, Dataset
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def enabled():
+    with override_settings(DATASETS_ENABLED=True):
+        yield
+
+
+def _rows(dataset):
+    return list(datasets.model_for(dataset).objects.order_by("visit_id").values())
+
+
+def test_build_pivots_entries_into_typed_columns(enabled, visit_baseline, visit_day7, crf, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 150, "temp_c": 37.5, "status": "Critical", "on_vent": True})
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 120, "on_vent": False})
+
+    dataset = datasets.build(crf)
+    rows = _rows(dataset)
+    assert [(r["subject_code"], r["visit_name"]) for r in rows] == [("001", "Baseline"), ("001", "Day 7")]
+    assert [(r["f_bp_sys"], r["f_temp_c"], r["f_status"], r["f_on_vent"]) for r in rows] == [
+        (150, 37.5, "Critical", True), (120, None, None, False),
+    ]
+    model = datasets.model_for(dataset)
+    assert list(model.objects.filter(f_bp_sys__gt=140).values_list("visit_id", flat=True)) == [visit_baseline.pk]
+
+
+def test_crf_saves_refresh_their_visit(enabled, visit_baseline, visit_day7, crf, crf_fields):
+    dataset = datasets.build(crf)
+    assert _rows(dataset) == []
+
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 150})
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 110, "status": "Stable"})
+    assert [(r["visit_id"], r["f_bp_sys"], r["f_status"]) for r in _rows(dataset)] == [
+        (visit_baseline.pk, 110, "Stable"),
+    ]
+
+    visit_baseline.entries.get(field__code="bp_sys").delete()
+    assert [(r["f_bp_sys"], r["f_status"]) for r in _rows(dataset)] == [(None, "Stable")]
+    visit_baseline.entries.all().delete()
+    assert _rows(dataset) == []
+
+
+def test_field_changes_mark_the_dataset_stale_until_rebuilt(enabled, visit_baseline, crf, crf_fields):
+    dataset = datasets.build(crf)
+    CRFField.objects.create(crf=crf, order=5, code="note", name="Note", field_type=CRFField.TEXT)
+    assert Dataset.objects.get(pk=dataset.pk).stale
+
+    save_crf_entries(visit_baseline, crf.fields.all(), {"bp_sys": 130, "note": "ok"})
+    assert _rows(dataset) == []   # stale: left alone
+
+    call_command("build_datasets", "--stale", stdout=StringIO())
+    dataset.refresh_from_db()
+    assert not dataset.stale
+    assert [(r["f_bp_sys"], r["f_note"]) for r in _rows(dataset)] == [(130, "ok")]
+
+
+def test_deleting_the_crf_drops_the_table(enabled, crf, crf_fields):
+    table = datasets.build(crf).table_name
+    crf.delete()
+    assert table not in connection.introspection.table_names()
+
+
+def test_dataset_api_filters_and_pages(enabled, client, study, visit_baseline, visit_day7, crf, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 150, "status": "Critical"})
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 120, "status": "Stable"})
+    datasets.build(crf)
+    url = reverse("core:study_dataset_api", args=[study.code, crf.pk])
+
+    data = client.get(url, {"f_bp_sys__gte": "130"}).json()
+    assert [row["visit_name"] for row in data["rows"]] == ["Baseline"]
+    assert data["columns"] == ["f_bp_sys", "f_temp_c", "f_status", "f_on_vent"]
+    assert client.get(url, {"f_status": "Stable"}).json()["rows"][0]["visit_name"] == "Day 7"
+    assert client.get(url, {"nope": "1"}).status_code == 400
+    assert client.get(url, {"f_bp_sys__in": "1"}).status_code == 400
+
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from core.models import Study
+from mini_edc import db_routing
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    monkeypatch.setattr(db_routing, "replica_configured", lambda: True)
+    return db_routing.ReplicaRouter()
+
+
+def _view(router, seen, write=False):
+    @db_routing.replica_reads
+    def view(request):
+        seen.append(router.db_for_read(Study))
+        if write:
+            router.db_for_write(Study)
+            seen.append(router.db_for_read(Study))
+        return HttpResponse()
+    return view
+
+
+def test_safe_requests_of_marked_views_read_the_replica(replica):
+    seen = []
+    _view(replica, seen)(RequestFactory().get("/"))
+    _view(replica, seen)(RequestFactory().post("/"))
+    assert seen == ["replica", "default"]
+    assert replica.db_for_read(Study) == "default"   # outside any view
+
+
+def test_a_write_pins_the_rest_of_the_request_and_the_client(replica):
+    seen = []
+    middleware = db_routing.ReplicaPinMiddleware(_view(replica, seen, write=True))
+    response = middleware(RequestFactory().get("/"))
+    assert seen == ["replica", "default"]
+    assert response.cookies[db_routing.PIN_COOKIE]["max-age"] == 5
+
+    request = RequestFactory().get("/")
+    request.COOKIES[db_routing.PIN_COOKIE] = "1"
+    seen.clear()
+    _view(replica, seen)(request)
+    assert seen == ["default"]
+
+
+def test_streamed_responses_keep_reading_the_replica(replica):
+    @db_routing.replica_reads
+    def export(request):
+        return StreamingHttpResponse(replica.db_for_read(Study) for _ in range(2))
+
+    assert list(export(RequestFactory().get("/")).streaming_content) == [b"replica", b"replica"]
+
+
+SCRIPT = """
+import json
+from datetime import date
+from django.test import Client
+from core.models import Study, Subject
+
+subject = Subject.objects.get(subject_id="001")
+Study.objects.create(code="ONLY-PRIMARY", name="Written after the replica copy")
+reader, writer = Client(HTTP_HOST="localhost"), Client(HTTP_HOST="localhost")
+subject_url = f"/study/{subject.study.code}/subject/001/"
+result = {"dashboard": "ONLY-PRIMARY" in reader.get("/").content.decode()}
+response = writer.post(subject_url + "ae/new", {
+    "onset": "2030-01-01T10:00", "severity": "severe", "description": "after the copy",
+}, HTTP_HX_REQUEST="true")   # answered with the re-read AE section
+result["post_shows_new_ae"] = "after the copy" in response.content.decode()
+# The AE list endpoint (uncached rows)
+result["reader_sees_ae"] = "after the copy" in reader.get(subject_url + "ae/").content.decode()
+result["writer_sees_ae"] = "after the copy" in writer.get(subject_url + "ae/").content.decode()
+print(json.dumps(result))
+"""
+
+
+def test_two_sqlite_files(tmp_path):
+    primary, copy = tmp_path / "primary.sqlite3", tmp_path / "replica.sqlite3"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{primary}", "DJANGO_SETTINGS_MODULE": "mini_edc.settings"}
+    env.pop("REPLICA_DATABASE_URL", None)
+
+    def manage(*args, **extra):
+        return subprocess.run([sys.executable, "manage.py", *args], cwd=ROOT, env={**env, **extra},
+                              check=True, capture_output=True, text=True).stdout
+
+    manage("migrate", "-v0")
+    manage("shell", "-c", "from datetime import date; from core.models import Study, Subject; "
+                          "Subject.objects.create(study=Study.objects.create(code='S1', name='S1'), "
+                          "subject_id='001', enrolled_at=date(2030, 1, 1))")
+    shutil.copy(primary, copy)   # the replica, frozen from here on
+
+    result = json.loads(manage("shell", "-c", SCRIPT, REPLICA_DATABASE_URL=f"sqlite:///{copy}").splitlines()[-1])
+    assert result == {
+        "dashboard": False,           # read from the stale replica
+        "post_shows_new_ae": True,    # the POST reads back its write from the primary
+        "reader_sees_ae": False,
+        "writer_sees_ae": True,       # pinned by cookie after writing
+    }
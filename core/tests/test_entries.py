@@ -0,0 +1,38 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.entries import save_crf_entries
+from core.models import Entry
+
+@pytest.mark.django_db
+def test_save_crf_entries_reports_new_changed_unchanged(visit_baseline, crf_fields):
+    (f1, f2, f3, f4) = crf_fields
+    data = {"bp_sys": 120, "temp_c": 37.5, "status": "Stable", "on_vent": True}
+
+    result = save_crf_entries(visit_baseline, crf_fields, data)
+    assert (result.created, result.changed, result.unchanged) == (4, 0, 0)
+    assert Entry.objects.get(visit=visit_baseline, field=f4).value_text == "true"
+
+    data.update(bp_sys=135, temp_c=None)
+    result = save_crf_entries(visit_baseline, crf_fields, data)
+    assert (result.created, result.changed, result.unchanged) == (0, 2, 2)
+    assert Entry.objects.get(visit=visit_baseline, field=f1).value_text == "135"
+    assert Entry.objects.get(visit=visit_baseline, field=f2).value_text is None
+    assert Entry.objects.filter(visit=visit_baseline).count() == 4
+
+@pytest.mark.django_db
+def test_save_crf_entries_query_count_independent_of_field_count(visit_baseline, crf_fields):
+    data = {"bp_sys": 120, "temp_c": 37.5, "status": "Stable", "on_vent": False}
+    with CaptureQueriesContext(connection) as ctx:
+        save_crf_entries(visit_baseline, crf_fields, data)
+    # one SELECT for existing values + one bulk upsert + one audit INSERT + the
+    # subject and study counter UPDATEs (savepoints aside)
+    statements = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+    assert len(statements) == 5
+
+    # Unchanged re-save does not write at all
+    with CaptureQueriesContext(connection) as ctx:
+        result = save_crf_entries(visit_baseline, crf_fields, data)
+    assert result.written == 0
+    assert not any(q["sql"].startswith(("INSERT", "UPDATE")) for q in ctx.captured_queries)
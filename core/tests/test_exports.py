@@ -0,0 +1,39 @@
+import csv
+import io
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+@pytest.mark.django_db
+def test_export_long_and_wide(client, study, subject, visit_baseline, visit_day7, crf_fields, add_entries):
+    (f1, f2, f3, f4) = crf_fields
+    add_entries(visit_baseline, {f1: "120", f3: "Stable"})
+    add_entries(visit_day7, {f1: "135", f4: "false"})
+    url = reverse("core:study_export", args=[study.code])
+
+    resp = client.get(url, {"layout": "long"})
+    assert resp["Content-Type"] == "text/csv"
+    rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+    assert rows[0] == ["subject_id", "visit_id", "visit_name", "visit_date", "crf", "field_code", "value"]
+    assert [(r[2], r[5], r[6]) for r in rows[1:]] == [
+        ("Baseline", "bp_sys", "120"), ("Baseline", "status", "Stable"),
+        ("Day 7", "bp_sys", "135"), ("Day 7", "on_vent", "false"),
+    ]
+
+    resp = client.get(url, {"layout": "wide"})
+    rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+    assert rows[0][4:] == ["bp_sys", "temp_c", "status", "on_vent"]
+    assert rows[1][2:] == ["Baseline", str(visit_baseline.visit_date), "120", "", "Stable", ""]
+    assert rows[2][4:] == ["135", "", "", "false"]
+
+@pytest.mark.django_db
+def test_export_study_command(study, visit_baseline, crf_fields, add_entries):
+    add_entries(visit_baseline, {crf_fields[0]: "120"})
+    out = io.StringIO()
+    call_command("export_study", study.code, "--layout", "wide", stdout=out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows == [
+        ["subject_id", "visit_id", "visit_name", "visit_date", "bp_sys", "temp_c", "status", "on_vent"],
+        ["001", str(visit_baseline.id), "Baseline", str(visit_baseline.visit_date), "120", "", "", ""],
+    ]
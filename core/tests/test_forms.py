@@ -36,3 +36,23 @@ def test_crffieldform_choices_rejects_bad_string():
     })
     assert not form.is_valid()
     assert "choices" in form.errors
+
+@pytest.mark.django_db
+def test_crf_entry_form_class_is_cached_until_fields_change(crf, crf_fields):
+    from core.forms import get_crf_entry_form_class, make_crf_entry_form
+    from core.models import CRF, CRFField
+
+    crf = CRF.objects.prefetch_related("fields").get(pk=crf.pk)
+    first = get_crf_entry_form_class(crf)
+    assert get_crf_entry_form_class(crf) is first
+
+    # Instances must not leak initial values into the shared class
+    form = make_crf_entry_form(crf, initial_data={"bp_sys": "120"})
+    assert form["bp_sys"].value() == "120"
+    assert make_crf_entry_form(crf)["bp_sys"].value() is None
+
+    CRFField.objects.create(crf=crf, order=5, code="notes", name="Notes")
+    crf = CRF.objects.prefetch_related("fields").get(pk=crf.pk)
+    rebuilt = get_crf_entry_form_class(crf)
+    assert rebuilt is not first
+    assert list(rebuilt.base_fields) == ["bp_sys", "temp_c", "status", "on_vent", "notes"]
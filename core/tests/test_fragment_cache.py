@@ -0,0 +1,67 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import AdverseEvent, Entry
+from mini_edc.metrics import FRAGMENT_CACHE
+
+
+def _count(fragment, result):
+    return FRAGMENT_CACHE.values.get((fragment, result), 0)
+
+
+@pytest.mark.django_db
+def test_subject_detail_serves_cached_fragments(client, django_assert_max_num_queries, study, subject, visit_baseline):
+    url = reverse("core:subject_detail", args=[study.code, subject.subject_id])
+    first = client.get(url)  # miss: renders and stores
+    hits = _count("ae_rows", "hit")
+
+    # validators + study + subject only: the visits and AE queries are skipped on a hit
+    with django_assert_max_num_queries(3):
+        second = client.get(url)
+    assert _count("ae_rows", "hit") == hits + 1
+    assert first.status_code == second.status_code == 200
+    assert "Baseline" in second.content.decode()
+
+
+@pytest.mark.django_db
+def test_new_adverse_event_invalidates_subject_fragments(client, django_capture_on_commit_callbacks, study, subject):
+    url = reverse("core:subject_detail", args=[study.code, subject.subject_id])
+    assert b"No adverse events recorded" in client.get(url).content
+
+    with django_capture_on_commit_callbacks(execute=True):
+        AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+    html = client.get(url).content.decode()
+    assert "Rash" in html
+    assert "No adverse events recorded" not in html
+
+
+@pytest.mark.django_db
+def test_saved_entries_invalidate_visit_fragment(client, django_capture_on_commit_callbacks,
+                                                 study, subject, visit_baseline, crf, crf_fields):
+    url = reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id]) + f"?crf={crf.id}"
+    assert b"No values saved yet" in client.get(url).content
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = client.post(url, {"bp_sys": "128", "status": "Stable"}, HTTP_HX_REQUEST="true")
+    assert resp.status_code == 200
+    assert Entry.objects.filter(visit=visit_baseline, field__code="bp_sys").exists()
+    html = client.get(url).content.decode()
+    assert "No values saved yet" not in html
+    assert "128" in html
+
+
+@pytest.mark.django_db
+def test_field_and_code_edits_are_not_served_stale(client, study, subject, visit_baseline, crf, crf_fields):
+    url = reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id]) + f"?crf={crf.id}"
+    Entry.objects.create(visit=visit_baseline, field=crf_fields[0], value_text="120")
+    client.get(url)
+    crf_fields[0].name = "Systolic BP (mmHg)"
+    crf_fields[0].save()   # bumps no visit version
+    assert "Systolic BP (mmHg)" in client.get(url).content.decode()
+
+    client.get(reverse("core:subject_detail", args=[study.code, subject.subject_id]))
+    study.code = "INCEPT-ICU-RENAMED"
+    study.save()
+    html = client.get(reverse("core:subject_detail", args=[study.code, subject.subject_id])).content.decode()
+    assert reverse("core:visit_entry", args=[study.code, subject.subject_id, visit_baseline.id]) in html
@@ -0,0 +1,60 @@
+import csv
+import json
+
+import pytest
+from django.core.management import call_command
+
+from core.models import Entry, Subject, Visit
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+@pytest.mark.django_db
+def test_import_study_csv_and_jsonl(tmp_path, study, crf, crf_fields):
+    subjects = _write_csv(tmp_path / "subjects.csv", ["subject_id", "enrolled_at"],
+                          [["101", "2024-01-05"], ["102", "not-a-date"]])
+    visits = _write_csv(tmp_path / "visits.csv", ["subject_id", "visit", "visit_date"],
+                        [["101", "Baseline", "2024-01-05"], ["999", "Baseline", "2024-01-05"]])
+    entries = tmp_path / "entries.jsonl"
+    entries.write_text("\n".join(json.dumps(r) for r in [
+        {"subject_id": "101", "visit": "Baseline", "crf": "Baseline CRF", "field_code": "bp_sys", "value": "120"},
+        {"subject_id": "101", "visit": "Baseline", "field_code": "on_vent", "value": "true"},
+        {"subject_id": "101", "visit": "Baseline", "field_code": "status", "value": "Unknown"},
+        {"subject_id": "101", "visit": "Baseline", "field_code": "temp_c", "value": "warm"},
+    ]) + "\n")
+    errors = tmp_path / "errors.csv"
+
+    call_command("import_study", study.code, subjects=subjects, visits=visits,
+                 entries=str(entries), errors=str(errors), batch_size=2)
+
+    visit = Visit.objects.get(subject__subject_id="101", name="Baseline")
+    assert list(Subject.objects.values_list("subject_id", flat=True)) == ["101"]
+    assert dict(Entry.objects.filter(visit=visit).values_list("field__code", "value_text")) == {
+        "bp_sys": "120", "on_vent": "true",
+    }
+    assert Entry.objects.get(visit=visit, field__code="bp_sys").value_int == 120
+
+    with open(errors) as fh:
+        rejects = list(csv.DictReader(fh))
+    assert [r["line"] for r in rejects] == ["3", "3", "3", "4"]
+    assert "Select a valid choice" in rejects[2]["error"]
+
+@pytest.mark.django_db
+def test_import_study_resumes_from_checkpoint(tmp_path, study, subject, visit_baseline, crf, crf_fields):
+    # The first two rows are invalid, but the checkpoint says they were already done
+    rows = [["001", "Baseline", "Baseline CRF", "bp_sys", v] for v in ("bad", "bad", "120")]
+    entries = _write_csv(tmp_path / "entries.csv", ["subject_id", "visit", "crf", "field_code", "value"], rows)
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(json.dumps({entries: {"rows": 2, "size": (tmp_path / "entries.csv").stat().st_size}}))
+
+    errors = tmp_path / "errors.csv"
+    call_command("import_study", study.code, entries=entries, checkpoint=str(checkpoint),
+                 errors=str(errors), batch_size=2)
+
+    assert len(errors.read_text().splitlines()) == 1  # header only
+    assert Entry.objects.get(visit=visit_baseline, field=crf_fields[0]).value_text == "120"
+    assert json.loads(checkpoint.read_text())[entries]["rows"] == 3
@@ -0,0 +1,34 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from core import index_report
+from core.entries import save_crf_entries
+
+
+def test_analyse_reads_sqlite_and_postgres_plans():
+    shape = index_report.Shape("x", "test", None)
+    sqlite = "4 0 216 SCAN core_entry\n9 0 0 SEARCH core_visit USING INDEX visit_subject_date_idx (subject_id=?)\n" \
+             "25 0 0 USE TEMP B-TREE FOR ORDER BY"
+    finding = index_report.analyse(shape, sqlite)
+    assert finding.scans == ["core_entry"]
+    assert finding.sorts == ["USE TEMP B-TREE FOR ORDER BY"]
+
+    postgres = "Limit  (cost=0.43..5.1 rows=26)\n  ->  Index Scan using ae_subject_onset_idx on core_adverseevent"
+    assert not index_report.analyse(shape, postgres).flagged
+    postgres = "Sort  (cost=10..11 rows=5)\n  Sort Key: onset DESC\n  ->  Seq Scan on core_adverseevent"
+    finding = index_report.analyse(shape, postgres)
+    assert finding.scans == ["core_adverseevent"]
+    assert finding.sorts == ["Sort"]
+
+
+@pytest.mark.django_db
+def test_hot_queries_use_indexes(subject, visit_baseline, crf, crf_fields):
+    save_crf_entries(visit_baseline, crf_fields, {"bp_sys": 120})
+    flagged = [f.shape.name for f in index_report.run() if f.flagged]
+    assert flagged == []
+
+    out = StringIO()
+    call_command("index_report", "--fail", stdout=out)
+    assert "0 flagged" in out.getvalue()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mini_edc import metrics
+
+WITH_METRICS = ["mini_edc.metrics.MetricsMiddleware", *settings.MIDDLEWARE]
+
+def _sample(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE=WITH_METRICS, METRICS_ENABLED=True)
+def test_metrics_endpoint_reports_views_and_business_counters(client, study, subject):
+    before = metrics.AES_RECORDED.values.get((), 0)
+    client.post(
+        reverse("core:ae_create", args=[study.code, subject.subject_id]),
+        {"onset": timezone.now().strftime("%Y-%m-%dT%H:%M"), "severity": "mild", "description": "x"},
+        HTTP_HX_REQUEST="true",
+    )
+    text = client.get("/metrics").content.decode()
+
+    assert "# TYPE edc_http_request_duration_seconds histogram" in text
+    assert _sample(text, 'edc_http_requests_total{view="core:ae_create",method="POST",status="200"}')
+    assert _sample(text, 'edc_http_request_queries_bucket{view="core:ae_create",le="+Inf"}')
+    assert f"edc_adverse_events_recorded_total {before + 1}" in text
+
+def test_metrics_endpoint_disabled_by_default(client):
+    with override_settings(METRICS_ENABLED=False):
+        assert client.get("/metrics").status_code == 404
+
+def test_shared_file_mode_sums_live_processes(tmp_path, settings):
+    settings.METRICS_DIR = str(tmp_path)
+    counter = metrics.Counter("edc_test_shared_total", "test", ["kind"])
+    gauge = metrics.Gauge("edc_test_shared_gauge", "test")
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    try:
+        counter.inc(2, kind="a")
+        gauge.set(3)
+        # another live worker's dump (our parent stands in), and a dead one's
+        (tmp_path / f"{os.getppid()}.json").write_text(
+            '{"edc_test_shared_total": [[["a"], 5]], "edc_test_shared_gauge": [[[], 4]]}')
+        (tmp_path / f"{dead.pid}.json").write_text(
+            '{"edc_test_shared_total": [[["a"], 100]], "edc_test_shared_gauge": [[[], 100]]}')
+        text = metrics.REGISTRY.render()
+        assert 'edc_test_shared_total{kind="a"} 7' in text
+        assert "edc_test_shared_gauge 7" in text   # each worker's own pool: the fleet is the sum
+        assert not (tmp_path / f"{dead.pid}.json").exists()
+    finally:
+        del metrics.REGISTRY.metrics[counter.name]
+        del metrics.REGISTRY.metrics[gauge.name]
+
+def test_histogram_buckets_are_cumulative():
+    hist = metrics.Histogram("edc_test_hist", "test", [], buckets=(1, 5))
+    try:
+        for v in (0.5, 3, 3, 10):
+            hist.observe(v)
+        lines = list(hist.render({(): hist.values[()]}))
+        assert lines[:3] == ['edc_test_hist_bucket{le="1"} 1', 'edc_test_hist_bucket{le="5"} 3',
+                             'edc_test_hist_bucket{le="+Inf"} 4']
+        assert lines[-1] == "edc_test_hist_count 4"
+    finally:
+        del metrics.REGISTRY.metrics[hist.name]
+
+class _FakePool:
+    def pop_stats(self):
+        return {"pool_size": 4, "pool_available": 1, "requests_waiting": 3,
+                "requests_num": 20, "requests_wait_ms": 1500, "requests_errors": 2}
+
+def test_pool_stats_are_collected_at_scrape_time(monkeypatch):
+    monkeypatch.setattr(metrics.connections["default"], "pool", _FakePool(), raising=False)
+    checkouts = metrics.DB_POOL_CHECKOUTS.values.get(("default",), 0)
+    text = metrics.REGISTRY.render()
+    assert '# TYPE edc_db_pool_connections gauge' in text
+    assert 'edc_db_pool_connections{alias="default",state="idle"} 1' in text
+    assert 'edc_db_pool_waiting_clients{alias="default"} 3' in text
+    assert 'edc_db_pool_errors_total{alias="default",kind="timeout"} 2' in text
+    assert metrics.DB_POOL_CHECKOUTS.values[("default",)] == checkouts + 20
+    assert metrics.DB_POOL_CHECKOUT_WAIT.values[("default",)] >= 1.5
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="mini_edc.asgi_urls", METRICS_ENABLED=True,
+                   MIDDLEWARE=["mini_edc.profiling.ProfilingMiddleware", *WITH_METRICS])
+def test_middlewares_run_natively_async(study):
+    before = metrics.QUERIES.values.get(("core:dashboard",), [0, 0])
+    queries, requests = before[-2], before[-1]   # [buckets..., sum, count]
+    response = async_to_sync(AsyncClient().get)(reverse("core:dashboard"))
+    assert response.status_code == 200
+    # The ORM's queries (on the request's sync thread) are seen by both
+    assert 'desc="0 queries"' not in response["Server-Timing"]
+    state = metrics.QUERIES.values[("core:dashboard",)]
+    assert state[-1] == requests + 1 and state[-2] > queries
@@ -17,3 +17,21 @@ def test_subject_unique_within_study(study):
     with pytest.raises(Exception):
         # same subject_id in same study should violate unique_together
         Subject.objects.create(study=study, subject_id="001", enrolled_at=study.created_at.date())
+
+@pytest.mark.django_db
+def test_entry_typed_columns_and_where_value(visit_baseline, visit_day7, crf_fields, add_entries):
+    from core.entries import save_crf_entries
+    from core.models import Entry
+
+    (f1, f2, f3, f4) = crf_fields
+    add_entries(visit_baseline, {f1: "150", f2: "37.5", f3: "Stable", f4: "true"})
+    save_crf_entries(visit_day7, crf_fields, {"bp_sys": 120, "temp_c": None, "status": "Critical", "on_vent": False})
+
+    e = Entry.objects.get(visit=visit_baseline, field=f1)
+    assert (e.value_int, e.value_float, e.value_bool, e.value_choice) == (150, None, None, None)
+    assert Entry.objects.get(visit=visit_baseline, field=f4).value_bool is True
+    assert Entry.objects.get(visit=visit_day7, field=f4).value_bool is False
+
+    assert [e.visit_id for e in Entry.objects.where_value(f1, "gt", 140)] == [visit_baseline.id]
+    assert Entry.objects.where_value(f2, "gte", 37).count() == 1
+    assert Entry.objects.where_value(f3, "exact", "Critical").get().visit_id == visit_day7.id
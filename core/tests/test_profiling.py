@@ -0,0 +1,44 @@
+import logging
+import re
+
+import pytest
+from django.conf import settings
+from django.template import base as template_base
+from django.test import override_settings
+from django.urls import reverse
+
+from mini_edc import profiling
+
+PROFILED = ["mini_edc.profiling.ProfilingMiddleware", *settings.MIDDLEWARE]
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE=PROFILED, PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_QUERIES=5)
+def test_profiling_middleware_emits_server_timing(client, study, subject, caplog):
+    with caplog.at_level(logging.INFO, logger="mini_edc.profiling"):
+        resp = client.get(reverse("core:subject_detail", args=[study.code, subject.subject_id]))
+    timing = resp["Server-Timing"]
+    assert 'sql;dur=' in timing and 'queries"' in timing
+    assert "tpl;dur=" in timing and "total;dur=" in timing
+
+    # slowest queries are logged with the project line that issued them (the
+    # visits/AE queries run lazily from cached fragments, study/subject from the view)
+    record = caplog.records[-1].getMessage()
+    assert "/subject/001/" in record
+    assert "core/views.py:" in record
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE=PROFILED, PROFILING_SAMPLE_RATE=0.0)
+def test_profiling_middleware_skips_unsampled_requests(client, study):
+    resp = client.get(reverse("core:dashboard"))
+    assert not resp.has_header("Server-Timing")
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE=PROFILED, PROFILING_SAMPLE_RATE=1.0)
+def test_template_timer_is_installed_by_install_only(client, study, monkeypatch):
+    monkeypatch.setattr(template_base.Template, "render", profiling._original_render)   # restored afterwards
+    profiling.ProfilingMiddleware(lambda request: None)
+    assert template_base.Template.render is profiling._original_render
+
+    profiling.install()   # what CoreConfig.ready() does with PROFILING_ENABLED
+    timing = client.get(reverse("core:dashboard"))["Server-Timing"]
+    assert float(re.search(r"tpl;dur=([\d.]+)", timing).group(1)) > 0
@@ -0,0 +1,36 @@
+import pytest
+from django.core.management import call_command
+
+from core.models import AdverseEvent, CRFField, Entry, Study, Subject, Visit
+from core.synthetic import generate
+
+@pytest.mark.django_db
+def test_generate_counts_and_typed_values():
+    counts = generate(studies=2, subjects=6, visits=3, crfs=2, fields=5, ae_rate=1.5, fill=1.0, seed=7)
+    assert counts["subjects"] == Subject.objects.count() == 12
+    assert counts["visits"] == Visit.objects.count() == 36
+    assert counts["fields"] == CRFField.objects.count() == 20
+    assert counts["entries"] == Entry.objects.count() == 36 * 10
+    assert counts["adverse_events"] == AdverseEvent.objects.count()
+
+    # shadow columns are filled like a normal save would
+    for e in Entry.objects.filter(field__field_type=CRFField.INT)[:5]:
+        assert e.value_int == int(e.value_text)
+
+@pytest.mark.django_db
+def test_generate_is_deterministic():
+    def snapshot(prefix):
+        generate(subjects=4, visits=2, crfs=1, fields=6, fill=0.5, seed=42, prefix=prefix)
+        study = Study.objects.get(code=f"{prefix}-001")
+        return list(
+            Entry.objects.filter(visit__subject__study=study)
+            .order_by("visit__subject__subject_id", "visit__visit_date", "field__order")
+            .values_list("visit__subject__subject_id", "field__code", "value_text")
+        )
+    assert snapshot("A") == snapshot("B")
+
+@pytest.mark.django_db
+def test_seed_synthetic_refuses_existing_prefix():
+    call_command("seed_synthetic", subjects=2, visits=1, crfs=1, fields=2, prefix="DUP")
+    with pytest.raises(Exception, match="already exist"):
+        call_command("seed_synthetic", subjects=2, visits=1, crfs=1, fields=2, prefix="DUP")
@@ -34,3 +34,54 @@ def test_adverse_event_invalid_htmx(client, study, subject):
     assert 'id="ae-section"' in html
     # look for a generic error marker
     assert "errorlist" in html or "This field is required" in html
+
+@pytest.mark.django_db
+def test_adverse_event_create_fragment_returns_only_new_row(client, study, subject):
+    from datetime import timedelta
+    from core.models import AdverseEvent
+
+    AdverseEvent.objects.bulk_create([
+        AdverseEvent(subject=subject, onset=timezone.now() - timedelta(days=i), severity="mild", description=f"Old AE {i}")
+        for i in range(40)
+    ])
+    url = reverse("core:ae_create", args=[study.code, subject.subject_id])
+    payload = {"onset": timezone.now().strftime("%Y-%m-%dT%H:%M"), "severity": "severe", "description": "Sepsis"}
+    resp = client.post(url, payload, HTTP_HX_REQUEST="true", HTTP_HX_TARGET="ae-form")
+    assert resp.status_code == 200
+    html = resp.content.decode()
+    assert 'id="ae-form"' in html
+    assert 'hx-swap-oob="afterbegin:#ae-rows"' in html
+    assert "Sepsis" in html
+    assert "Old AE" not in html  # history is not re-sent
+
+@pytest.mark.django_db
+def test_subject_ae_table_loads_older_pages(client, study, subject):
+    from datetime import timedelta
+    from core.models import AdverseEvent
+    from core.views import AE_PAGE_SIZE
+
+    now = timezone.now()
+    AdverseEvent.objects.bulk_create([
+        AdverseEvent(subject=subject, onset=now - timedelta(hours=i), severity="mild", description=f"AE {i:03d}")
+        for i in range(AE_PAGE_SIZE + 3)
+    ])
+    resp = client.get(reverse("core:subject_detail", args=[study.code, subject.subject_id]))
+    page = resp.context["aevents"]
+    assert [ae.description for ae in page][:2] == ["AE 000", "AE 001"]
+    assert page.has_next and 'id="ae-load-older"' in resp.content.decode()
+
+    resp = client.get(reverse("core:ae_list", args=[study.code, subject.subject_id]), {"after": page.next_cursor})
+    assert [ae.description for ae in resp.context["aevents"]] == [f"AE {i:03d}" for i in range(AE_PAGE_SIZE, AE_PAGE_SIZE + 3)]
+    assert "ae-load-older" not in resp.content.decode()
+
+@pytest.mark.django_db
+def test_ae_list_wrong_typed_cursor_falls_back_to_the_first_page(client, study, subject):
+    from core.models import AdverseEvent
+    from core.pagination import encode_cursor
+
+    AdverseEvent.objects.create(subject=subject, onset=timezone.now(), severity="mild", description="Rash")
+    url = reverse("core:ae_list", args=[study.code, subject.subject_id])
+    for values in (["x", "y"], [None, 1], [[], {}]):
+        resp = client.get(url, {"after": encode_cursor(values)})
+        assert resp.status_code == 200, values
+        assert [ae.description for ae in resp.context["aevents"]] == ["Rash"]
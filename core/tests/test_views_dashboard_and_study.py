@@ -21,3 +21,30 @@ def test_subject_detail_lists_visits(client, study, subject, visit_baseline):
     resp = client.get(url)
     assert resp.status_code == 200
     assert visit_baseline.name in resp.content.decode()
+
+@pytest.mark.django_db
+def test_study_detail_keyset_pages_and_prefix(client, study):
+    from datetime import date
+    from core.models import Subject
+    from core.views import SUBJECT_PAGE_SIZE
+
+    Subject.objects.bulk_create([
+        Subject(study=study, subject_id=f"S-{i:04d}", enrolled_at=date.today())
+        for i in range(SUBJECT_PAGE_SIZE + 5)
+    ])
+    url = reverse("core:study_detail", args=[study.code])
+
+    first = client.get(url)
+    page = first.context["subjects"]
+    assert len(page) == SUBJECT_PAGE_SIZE and page.has_next
+    assert 'id="subjects-load-more"' in first.content.decode()
+
+    # htmx "load more" returns just the remaining rows, no further cursor
+    resp = client.get(url, {"after": page.next_cursor}, HTTP_HX_REQUEST="true")
+    html = resp.content.decode()
+    assert "<h2>" not in html
+    assert [s.subject_id for s in resp.context["subjects"]] == [f"S-{i:04d}" for i in range(SUBJECT_PAGE_SIZE, SUBJECT_PAGE_SIZE + 5)]
+    assert "subjects-load-more" not in html
+
+    resp = client.get(url, {"q": "S-001"})
+    assert [s.subject_id for s in resp.context["subjects"]] == [f"S-{i:04d}" for i in range(10, 20)]
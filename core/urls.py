@@ -1,19 +1,33 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = "core"
 
-urlpatterns = [
-    path("", views.dashboard, name="dashboard"),
-    path("study/<str:study_code>/", views.study_detail, name="study_detail"),
-    path("study/<str:study_code>/subject/<str:subject_id>/", views.subject_detail, name="subject_detail"),
-    path("study/<str:study_code>/crf-builder/", views.crf_builder, name="crf_builder"),  # NEW
-    path("study/<str:study_code>/crf/<int:crf_id>/field/add", views.crf_field_add, name="crf_field_add"),  # NEW
-    path("study/<str:study_code>/subject/<str:subject_id>/ae/new", views.adverse_event_create, name="ae_create"),
-    path(
-    "study/<str:study_code>/subject/<str:subject_id>/visit/<int:visit_id>/",
-    views.visit_entry,
-    name="visit_entry",
-),
-]
 
+def _patterns(read):
+    """`read` supplies the read pages: core.views, or core.async_views under ASGI."""
+    return [
+        path("", read.dashboard, name="dashboard"),
+        path("study/<str:study_code>/", read.study_detail, name="study_detail"),
+        path("study/<str:study_code>/export.csv", views.study_export, name="study_export"),
+        path("study/<str:study_code>/completeness/", views.study_completeness, name="study_completeness"),
+        path("study/<str:study_code>/completeness.json", views.study_completeness_api, name="study_completeness_api"),
+        path("study/<str:study_code>/crf/<int:crf_id>/dataset.json", views.study_dataset_api, name="study_dataset_api"),
+        path("api/changes/", views.change_feed, name="change_feed"),
+        path("api/<str:resource>/", views.api_list, name="api_list"),
+        path("study/<str:study_code>/entries/batch", views.study_entries_batch_api, name="entries_batch_api"),
+        path("study/<str:study_code>/subject/<str:subject_id>/", read.subject_detail, name="subject_detail"),
+        path("study/<str:study_code>/crf-builder/", views.crf_builder, name="crf_builder"),  # NEW
+        path("study/<str:study_code>/crf/<int:crf_id>/field/add", views.crf_field_add, name="crf_field_add"),  # NEW
+        path("study/<str:study_code>/subject/<str:subject_id>/ae/new", views.adverse_event_create, name="ae_create"),
+        path("study/<str:study_code>/subject/<str:subject_id>/ae/", views.adverse_event_list, name="ae_list"),
+        path(
+            "study/<str:study_code>/subject/<str:subject_id>/visit/<int:visit_id>/",
+            read.visit_entry,
+            name="visit_entry",
+        ),
+    ]
+
+
+urlpatterns = _patterns(views)
+async_urlpatterns = _patterns(async_views)   # mini_edc/asgi_urls.py
@@ -1,30 +1,33 @@
 # core/views.py
-from django.shortcuts import render, get_object_or_404
-from .models import Study, Subject
-from .models import Study, Subject, Visit, AdverseEvent, CRF, CRFField
-from .forms import AdverseEventForm, CRFForm, CRFFieldForm
-from django.contrib import messages
-from django.shortcuts import redirect
-from django.views.decorators.http import require_POST
-from django.utils.timezone import make_aware
+import json
 from datetime import datetime
 
-from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.views.decorators.http import require_POST
-from django.db import transaction
-from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib import messages
-from django.views.decorators.http import require_POST
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.timezone import make_aware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
-from .models import (
-    Study, Subject, Visit, AdverseEvent,
-    CRF, CRFField, Entry
-)
-from .forms import AdverseEventForm, CRFForm, CRFFieldForm, make_crf_entry_form
+from mini_edc.db_routing import replica_reads
+from mini_edc.metrics import AES_RECORDED
 
+from . import api, batch, changes, completeness, datasets
+from .conditional import conditional_page, dashboard_state, study_state, subject_state, visit_entry_state
+from .entries import save_crf_entries
+from .exports import LAYOUTS, iter_csv
+from .forms import AdverseEventForm, CRFFieldForm, CRFForm, make_crf_entry_form
+from .models import CRF, AdverseEvent, CRFField, Entry, Study, Subject, Visit
+from .pagination import InvalidCursor, keyset_paginate
 
+
+@replica_reads
+@conditional_page(dashboard_state)
 def dashboard(request):
     """
     List all studies (top-level view).
@@ -32,19 +35,208 @@ def dashboard(request):
     studies = Study.objects.all().order_by("code")
     return render(request, "core/dashboard.html", {"studies": studies})
 
+
+SUBJECT_PAGE_SIZE = 50
+
+
+@replica_reads
+@conditional_page(study_state)
 def study_detail(request, study_code: str):
     """
-    Show subjects enrolled in a specific study.
+    Show subjects enrolled in a specific study, one keyset page at a time.
+    ?q= filters by subject_id prefix, ?after= continues from a cursor;
+    htmx requests get just the table rows (with the next "load more" row).
+    """
+    study = get_object_or_404(Study, code=study_code)
+    prefix = request.GET.get("q", "").strip()
+
+    subjects = study.subjects.all()  # thanks to related_name="subjects"
+    if prefix:
+        # gte lets the (study_id, subject_id) index seek to the prefix
+        subjects = subjects.filter(subject_id__gte=prefix, subject_id__startswith=prefix)
+    try:
+        page = keyset_paginate(subjects, ["subject_id"], request.GET.get("after"), SUBJECT_PAGE_SIZE)
+    except InvalidCursor:
+        page = keyset_paginate(subjects, ["subject_id"], None, SUBJECT_PAGE_SIZE)
+
+    context = {"study": study, "subjects": page, "prefix": prefix}
+    if request.headers.get("HX-Request") == "true":
+        return render(request, "core/partials/subject_rows.html", context)
+    return render(request, "core/study_detail.html", context)
+
+
+@replica_reads
+def study_export(request, study_code: str):
+    """
+    Stream the study's entries as CSV (?layout=long|wide).
+    """
+    study = get_object_or_404(Study, code=study_code)
+    layout = request.GET.get("layout", "long")
+    if layout not in LAYOUTS:
+        layout = "long"
+    response = StreamingHttpResponse(iter_csv(study, layout), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{study.code}-{layout}.csv"'
+    return response
+
+
+def _completeness_rows_html(rows):
+    # Built here rather than in the template: a 5,000 × 10 grid is 50k cells,
+    # which the template engine renders an order of magnitude slower
+    html = []
+    for subject_id, cells in rows:
+        parts = [f"<tr><th>{escape(subject_id)}</th>"]
+        for c in cells:
+            if c is None:
+                parts.append('<td class="none"></td>')
+                continue
+            status = "empty" if not c.filled else "done" if c.filled_required >= c.required else "partial"
+            parts.append(
+                f'<td class="{status}" title="{c.filled}/{c.fields} fields">{c.filled_required}/{c.required}</td>'
+            )
+        parts.append("</tr>")
+        html.append(mark_safe("".join(parts)))
+    return html
+
+
+@replica_reads
+def study_completeness(request, study_code: str):
+    """
+    Subjects × visits grid of filled/required fields over the active CRFs
+    (?crf=<id> for one CRF), from the cached matrix in core.completeness.
+    """
+    study = get_object_or_404(Study, code=study_code)
+    matrix = completeness.for_study(study)
+    try:
+        selected = matrix.crf_index.get(int(request.GET.get("crf", "")))
+    except ValueError:
+        selected = None
+    rows = matrix.rows(None if selected is None else [selected])
+    return render(request, "core/study_completeness.html", {
+        "study": study,
+        "matrix": matrix,
+        "selected_crf": None if selected is None else matrix.crfs[selected],
+        "rows": _completeness_rows_html(rows),
+    })
+
+
+@replica_reads
+def study_completeness_api(request, study_code: str):
+    """The completeness matrix as JSON, with per-CRF counts per cell."""
+    study = get_object_or_404(Study, code=study_code)
+    return JsonResponse({"study": study.code, **completeness.for_study(study).as_json()})
+
+
+DATASET_PAGE_SIZE = 200
+
+
+@replica_reads
+def study_dataset_api(request, study_code: str, crf_id: int):
+    """
+    Rows of a CRF's materialized dataset (core.datasets), filtered by
+    ?<column>[__<lookup>]=<value> and paged by ?cursor=.
+    """
+    crf = get_object_or_404(CRF, pk=crf_id, study__code=study_code)
+    dataset = getattr(crf, "dataset", None) if datasets.enabled() else None
+    if dataset is None:
+        return JsonResponse({"error": "No dataset built for this CRF."}, status=404)
+    if dataset.stale:
+        return JsonResponse({"error": "The CRF's fields changed; rebuild with build_datasets."}, status=409)
+    params = request.GET.dict()
+    cursor = params.pop("cursor", None)
+    try:
+        rows = datasets.filter_rows(dataset, params)
+        page = keyset_paginate(rows.values(), ["visit_id"], cursor, DATASET_PAGE_SIZE)
+    except (ValueError, InvalidCursor) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({
+        "crf": crf.name,
+        "columns": [column for _, column, _ in dataset.columns],
+        "rows": page.items,
+        "next_cursor": page.next_cursor,
+    })
+
+
+@replica_reads
+@require_GET
+def api_list(request, resource: str):
+    """
+    Read-only JSON listing of a core model (core.api): ?fields=, ?include=,
+    ?limit= and ?after=<cursor>, plus the resource's filters (?study=, ...).
+    """
+    if resource not in api.RESOURCES:
+        return JsonResponse({"error": f"Unknown resource {resource!r}.", "resources": list(api.RESOURCES)},
+                            status=404)
+    try:
+        return JsonResponse(api.page(resource, request.GET.dict()))
+    except ValueError as exc:   # api.ApiError, InvalidCursor, or a filter value of the wrong type
+        return JsonResponse({"error": str(exc)}, status=400)
+
+
+@require_GET
+def change_feed(request):
+    """
+    Rows changed after ?after=<cursor> (core.changes) as NDJSON: one line per
+    upsert or delete, then {"next_cursor", "has_more"}. ?models=entry,... and
+    ?limit= (changes read) narrow it.
     """
+    # Not replica_reads: a lagging replica would hand out cursors the primary is past
+    try:
+        limit = int(request.GET.get("limit") or changes.DEFAULT_LIMIT)
+        models = [m.strip() for m in request.GET.get("models", "").split(",") if m.strip()]
+        items = changes.feed(request.GET.get("after"), models, limit)
+    except ValueError as exc:   # changes.FeedError, InvalidCursor or a bad limit
+        return JsonResponse({"error": str(exc)}, status=400)
+    lines = (json.dumps(item, cls=DjangoJSONEncoder) + "\n" for item in items)
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+
+@csrf_exempt
+@require_POST
+def study_entries_batch_api(request, study_code: str):
+    """
+    Save CRF values for many visits in one request (core.batch):
+    {"records": [{"subject_id", "visit", "crf", "values": {code: value}}, ...]}.
+    Answers with one result per record; invalid records are skipped, not fatal.
+    """
+    # Not CSRF-protected: a cross-site form can't send application/json
+    # without a CORS preflight, so that content type is required instead
+    if request.content_type != "application/json":
+        return JsonResponse({"error": "Send the batch as application/json."}, status=415)
     study = get_object_or_404(Study, code=study_code)
-    subjects = study.subjects.all().order_by("subject_id")  # thanks to related_name="subjects"
-    return render(request, "core/study_detail.html", {"study": study, "subjects": subjects})
+    try:
+        payload = json.loads(request.body)
+        records = payload.get("records") if isinstance(payload, dict) else None
+        results = batch.save_batch(study, records, request.user)
+    except ValueError as exc:   # bad JSON or batch.BatchError
+        return JsonResponse({"error": str(exc)}, status=400)
+    saved = sum(1 for r in results if not r.errors)
+    return JsonResponse({
+        "study": study.code,
+        "saved": saved,
+        "rejected": len(results) - saved,
+        "results": [r.as_json() for r in results],
+    })
+
+
+AE_PAGE_SIZE = 25
+
+
+def _ae_page(subject, cursor=None):
+    """One keyset page of the subject's AEs, newest first (Meta.ordering)."""
+    try:
+        return keyset_paginate(subject.adverse_events.all(), ["-onset", "-id"], cursor, AE_PAGE_SIZE)
+    except InvalidCursor:
+        return keyset_paginate(subject.adverse_events.all(), ["-onset", "-id"], None, AE_PAGE_SIZE)
+
 
+@replica_reads
+@conditional_page(subject_state)
 def subject_detail(request, study_code: str, subject_id: str):
     study = get_object_or_404(Study, code=study_code)
     subject = get_object_or_404(Subject, study=study, subject_id=subject_id)
+    # Both stay lazy: they only hit the database if their cached fragment is stale
     visits = subject.visits.all().order_by("visit_date", "id")
-    aevents = subject.adverse_events.all()  # newest first (Meta.ordering)
+    aevents = SimpleLazyObject(lambda: _ae_page(subject))
 
     form = AdverseEventForm()  # empty form for the page
     return render(request, "core/subject_detail.html", {
@@ -55,16 +247,35 @@ def subject_detail(request, study_code: str, subject_id: str):
         "ae_form": form,
     })
 
-def _render_ae_partial(request, study, subject):
+
+@replica_reads
+def adverse_event_list(request, study_code: str, subject_id: str):
+    """
+    Older AEs for the "load older" row: ?after=<cursor> on (onset, id).
+    Returns table rows only (plus the next "load older" row).
+    """
+    study = get_object_or_404(Study, code=study_code)
+    subject = get_object_or_404(Subject, study=study, subject_id=subject_id)
+    aevents = _ae_page(subject, request.GET.get("after"))
+    return render(request, "core/partials/ae_rows.html", {"study": study, "subject": subject, "aevents": aevents})
+
+
+def _render_ae_partial(request, study, subject, form=None, status=200):
     """Helper: render the AE section partial with fresh context."""
-    aevents = subject.adverse_events.all()  # newest first (Meta.ordering)
-    form = AdverseEventForm()
     return render(
         request,
         "core/partials/ae_section.html",
-        {"study": study, "subject": subject, "aevents": aevents, "ae_form": form},
+        {"study": study, "subject": subject, "aevents": SimpleLazyObject(lambda: _ae_page(subject)),
+         "ae_form": form or AdverseEventForm()},
+        status=status,
     )
 
+
+def _is_ae_fragment_request(request):
+    # The AE form targets itself (#ae-form); older clients target the whole #ae-section
+    return request.headers.get("HX-Request") == "true" and request.headers.get("HX-Target") == "ae-form"
+
+
 @require_POST
 def adverse_event_create(request, study_code: str, subject_id: str):
     study = get_object_or_404(Study, code=study_code)
@@ -79,7 +290,16 @@ def adverse_event_create(request, study_code: str, subject_id: str):
         # Make onset timezone-aware if it came from a datetime-local input
         if isinstance(ae.onset, datetime) and ae.onset.tzinfo is None:
             ae.onset = make_aware(ae.onset)
-        ae.save()
+        with transaction.atomic():  # the AE and its counter updates (core.counters) commit together
+            ae.save()
+        AES_RECORDED.inc()
+
+        # Fragment mode: a fresh form plus the new row, prepended out-of-band,
+        # so the response size doesn't grow with the subject's AE history
+        if _is_ae_fragment_request(request):
+            return render(request, "core/partials/ae_created.html", {
+                "study": study, "subject": subject, "ae": ae, "ae_form": AdverseEventForm(),
+            })
 
         # If this is an htmx request, return just the updated section
         if request.headers.get("HX-Request") == "true":
@@ -89,24 +309,21 @@ def adverse_event_create(request, study_code: str, subject_id: str):
         return redirect("core:subject_detail", study_code=study.code, subject_id=subject.subject_id)
 
     # Invalid form:
+    if _is_ae_fragment_request(request):
+        return render(request, "core/partials/ae_form.html",
+                      {"study": study, "subject": subject, "ae_form": form}, status=400)
+
     if request.headers.get("HX-Request") == "true":
         # Re-render partial with errors (keeps user in place)
-        aevents = subject.adverse_events.all()
-        return render(
-            request,
-            "core/partials/ae_section.html",
-            {"study": study, "subject": subject, "aevents": aevents, "ae_form": form},
-            status=400,
-        )
+        return _render_ae_partial(request, study, subject, form=form, status=400)
 
     # Non-htmx: re-render the full subject page with errors (fallback)
     visits = subject.visits.all().order_by("visit_date", "id")
-    aevents = subject.adverse_events.all()
     return render(request, "core/subject_detail.html", {
         "study": study,
         "subject": subject,
         "visits": visits,
-        "aevents": aevents,
+        "aevents": _ae_page(subject),
         "ae_form": form,
     }, status=400)
 
@@ -148,7 +365,8 @@ def crf_field_add(request, study_code: str, crf_id: int):
     messages.error(request, "Invalid field data.")
     return redirect("core:crf_builder", study_code=study.code)
 
-def _render_visit_entry_partial(request, study, subject, visit, selected_crf, form, entries, status=200):
+
+def _render_visit_entry_partial(request, study, subject, visit, selected_crf, form, entries, status=200, save_result=None):
     """Return just the visit-entry section (htmx target)."""
     return render(
         request,
@@ -160,10 +378,14 @@ def _render_visit_entry_partial(request, study, subject, visit, selected_crf, fo
             "selected_crf": selected_crf,
             "form": form,
             "entries": entries,
+            "save_result": save_result,
         },
         status=status,
     )
 
+
+@replica_reads
+@conditional_page(visit_entry_state)
 def visit_entry(request, study_code: str, subject_id: str, visit_id: int):
     study = get_object_or_404(Study, code=study_code)
     subject = get_object_or_404(Subject, study=study, subject_id=subject_id)
@@ -193,28 +415,17 @@ def visit_entry(request, study_code: str, subject_id: str, visit_id: int):
     if request.method == "POST":
         form = make_crf_entry_form(selected_crf, post_data=request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                for field in selected_crf.fields.all().order_by("order", "id"):
-                    raw = form.cleaned_data.get(field.code, None)
-                    if raw is None or raw == "":
-                        norm = None
-                    elif field.field_type == CRFField.BOOL:
-                        norm = "true" if raw else "false"
-                    else:
-                        norm = str(raw)
-
-                    Entry.objects.update_or_create(
-                        visit=visit, field=field, defaults={"value_text": norm}
-                    )
+            # One SELECT + at most one bulk upsert, whatever the CRF size
+            result = save_crf_entries(visit, selected_crf.fields.all(), form.cleaned_data, request.user)
             # After saving, rebuild fresh form (prefilled with new values)
             entries_qs = Entry.objects.filter(visit=visit, field__crf=selected_crf).select_related("field").order_by("field__order","field__id")
             form = make_crf_entry_form(selected_crf, initial_data={e.field.code: e.value_text for e in entries_qs})
 
             if is_htmx:
                 # Return only the section (no full-page reload)
-                return _render_visit_entry_partial(request, study, subject, visit, selected_crf, form, entries_qs)
+                return _render_visit_entry_partial(request, study, subject, visit, selected_crf, form, entries_qs, save_result=result)
 
-            messages.success(request, f"Saved data for CRF '{selected_crf.name}'.")
+            messages.success(request, f"Saved data for CRF '{selected_crf.name}' ({result}).")
             # Full page fallback
             return redirect(f"{request.path}?crf={selected_crf.id}")
 
@@ -242,4 +453,4 @@ def visit_entry(request, study_code: str, subject_id: str, visit_id: int):
     return render(request, "core/visit_entry.html", {
         "study": study, "subject": subject, "visit": visit,
         "crfs": crfs, "selected_crf": selected_crf, "form": form, "entries": entries_qs,
-    })
\ No newline at end of file
+    })
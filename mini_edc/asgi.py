@@ -2,6 +2,7 @@
 ASGI config for mini_edc project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It serves the same sync views as WSGI unless ASYNC_VIEWS=1 is set (below).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +13,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mini_edc.settings")
+# The coroutine read views (core/async_views.py) are opt-in with ASYNC_VIEWS=1:
+# turn them on where `manage.py benchmark asgi` shows them ahead of the sync
+# views (it doesn't on SQLite, where every query serializes anyway)
 
 application = get_asgi_application()
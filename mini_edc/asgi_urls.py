@@ -0,0 +1,9 @@
+"""
+ROOT_URLCONF with ASYNC_VIEWS=1 (opt-in, see mini_edc/asgi.py): mini_edc/urls.py,
+with the read pages served by core/async_views.py.
+"""
+from core.urls import app_name, async_urlpatterns
+
+from .urls import site_patterns
+
+urlpatterns = site_patterns((async_urlpatterns, app_name))
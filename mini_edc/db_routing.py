@@ -0,0 +1,170 @@
+"""
+Optional read replica.
+
+With REPLICA_DATABASE_URL set, DATABASES gains a "replica" alias and
+ReplicaRouter sends reads to it, but only inside views marked read-only:
+
+    @replica_reads
+    def dashboard(request): ...
+
+Everything else reads and writes the primary ("default"):
+
+  - unsafe methods (POST etc.), even on a @replica_reads view;
+  - the rest of a request once it has written anything: the first write
+    pins the request to the primary, so it reads back what it wrote;
+  - requests from a client that wrote in the last REPLICA_PIN_SECONDS.
+    ReplicaPinMiddleware sets a short-lived cookie after a write, so the
+    page shown after a POST (redirect, htmx refresh) doesn't read a replica
+    that hasn't caught up yet.
+
+Both work for coroutine views too (core/async_views.py): the route lives in
+a ContextVar, which sync_to_async carries into the threads running the ORM.
+
+Raw cursors (`connection.cursor()`) and explicit `.using()` are not routed.
+To try it locally, copy a migrated SQLite file and point both URLs at the
+two files: rows written since the copy only show up where the primary is
+read.
+"""
+import contextvars
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA = "replica"
+PRIMARY = "default"
+PIN_COOKIE = "edc_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _Route:
+    def __init__(self, pinned=False):
+        self.replica = False      # inside a @replica_reads view, safe method
+        self.pinned = pinned      # read the primary from now on
+        self.wrote = False
+
+
+# The routing state of the request being handled (None outside requests)
+_current = contextvars.ContextVar("mini_edc_db_route", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_replica():
+    """True if reads in the current context go to the replica."""
+    route = _current.get()
+    return route is not None and route.replica and not route.pinned and replica_configured()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if reading_replica() else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        route = _current.get()
+        if route is not None:
+            route.pinned = route.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides
+        return {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}
+
+
+def replica_reads(view):
+    """Let GET/HEAD requests of this view read from the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            route, token = _enter(request)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _leave(route, token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        route, token = _enter(request)
+        try:
+            response = view(request, *args, **kwargs)
+            if response.streaming and route.replica:
+                # Streamed bodies (exports) run their queries after the view returns
+                streamed = _Route(pinned=route.pinned)
+                streamed.replica = True
+                response.streaming_content = _iterate_in(streamed, response.streaming_content)
+            return response
+        finally:
+            _leave(route, token)
+    return wrapper
+
+
+def _enter(request):
+    route = _current.get()
+    token = None
+    if route is None:
+        route = _Route(pinned=PIN_COOKIE in request.COOKIES)
+        token = _current.set(route)
+    route.replica = request.method in SAFE_METHODS
+    return route, token
+
+
+def _leave(route, token):
+    route.replica = False
+    if token is not None:
+        _current.reset(token)
+
+
+def _iterate_in(route, chunks):
+    chunks = iter(chunks)
+    while True:
+        token = _current.set(route)
+        try:
+            chunk = next(chunks, None)
+        finally:
+            _current.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class ReplicaPinMiddleware:
+    """Tracks writes per request; after one, pins the client to the primary for a few seconds."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _current.set(_Route(pinned=PIN_COOKIE in request.COOKIES))
+        try:
+            response = self.get_response(request)
+            wrote = _current.get().wrote
+        finally:
+            _current.reset(token)
+        return self._pin(response, wrote)
+
+    async def __acall__(self, request):
+        token = _current.set(_Route(pinned=PIN_COOKIE in request.COOKIES))
+        try:
+            response = await self.get_response(request)
+            wrote = _current.get().wrote
+        finally:
+            _current.reset(token)
+        return self._pin(response, wrote)
+
+    @staticmethod
+    def _pin(response, wrote):
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=getattr(settings, "REPLICA_PIN_SECONDS", 5),
+                httponly=True, samesite="Lax",
+            )
+        return response
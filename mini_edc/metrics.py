@@ -0,0 +1,334 @@
+"""
+Aggregated request and business metrics, exposed at /metrics in the
+Prometheus text format.
+
+Counters and histograms live in process memory. With several gunicorn
+workers, set METRICS_DIR to a directory shared by them: each process then
+dumps its values to <METRICS_DIR>/<pid>.json (at most every
+METRICS_FLUSH_INTERVAL seconds) and /metrics sums all the files, so any
+worker can answer a scrape with the totals. Only live processes count: a
+worker removes its file when it exits, and a scrape deletes the files of
+pids that are gone (a worker that was killed). Counters then drop, which
+Prometheus's rate() reads as a reset. Gauges are summed over the live
+workers as well: each one measures the worker's own share (its connection
+pool), and the fleet total is what matters.
+
+Enable the middleware and endpoint with METRICS_ENABLED=1.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}   # {label values tuple: value}
+        self.lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(k), v if not isinstance(v, list) else list(v)] for k, v in self.values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, samples):
+        for key, value in samples.items():
+            yield f"{self.name}{self._labels(key)} {value}"
+
+
+class Gauge(_Metric):
+    """
+    A current value, set by a collector at snapshot time. Shared-file mode
+    sums it over the live processes, so only per-process quantities (pool
+    connections, waiting requests) belong in one.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, samples):
+        for key, value in samples.items():
+            yield f"{self.name}{self._labels(key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            # [count per bucket..., overflow, sum, count]
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def render(self, samples):
+        for key, state in samples.items():
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), state):
+                cumulative += n
+                yield f"{self.name}_bucket{self._labels(key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {state[-2]}"
+            yield f"{self.name}_count{self._labels(key)} {state[-1]}"
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):   # not a <pid>.json file, or gone
+        return False
+    except PermissionError:  # alive, another user's
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []   # called before each snapshot to refresh pulled values
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self._flushed_to = None   # this process's file, removed at exit
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def snapshot(self):
+        for collect in self.collectors:
+            collect()
+        return {name: m.snapshot() for name, m in self.metrics.items()}
+
+    # --- shared-file mode -----------------------------------------------------
+
+    def flush(self, directory, force=False):
+        """Write this process's values to <directory>/<pid>.json (throttled)."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0):
+            return
+        with self._flush_lock:
+            self._last_flush = now
+            path = Path(directory) / f"{os.getpid()}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()))
+            os.replace(tmp, path)  # readers never see a partial file
+            if self._flushed_to is None:
+                atexit.register(self._remove, path)
+            self._flushed_to = path
+
+    @staticmethod
+    def _remove(path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _collect(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return [self.snapshot()]
+        self.flush(directory, force=True)
+        snapshots = []
+        for path in Path(directory).glob("*.json"):
+            if not _alive(path.stem):
+                self._remove(path)   # a worker that died without cleaning up
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # being replaced right now; next scrape picks it up
+        return snapshots
+
+    def render(self):
+        merged = {name: {} for name in self.metrics}
+        for snapshot in self._collect():
+            for name, samples in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in samples:
+                    key = tuple(key)
+                    current = merged[name].get(key)
+                    merged[name][key] = value if current is None else metric.merge(current, value)
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged[name]))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- request metrics (MetricsMiddleware) -------------------------------------
+REQUESTS = Counter("edc_http_requests_total", "HTTP requests by URL name, method and status.",
+                   ["view", "method", "status"])
+LATENCY = Histogram("edc_http_request_duration_seconds", "Request latency by URL name.",
+                    ["view"], LATENCY_BUCKETS)
+QUERIES = Histogram("edc_http_request_queries", "SQL queries per request by URL name.",
+                    ["view"], QUERY_BUCKETS)
+
+# --- business counters ---------------------------------------------------------
+ENTRIES_SAVED = Counter("edc_entries_saved_total", "CRF values written (new or changed).", ["source"])
+AES_RECORDED = Counter("edc_adverse_events_recorded_total", "Adverse events recorded.")
+FRAGMENT_CACHE = Counter("edc_fragment_cache_total", "Template fragment cache lookups by fragment and result.",
+                         ["fragment", "result"])
+
+# --- database connection pools (DB_POOL_ENABLED; psycopg_pool stats) ---------
+DB_POOL_CONNECTIONS = Gauge("edc_db_pool_connections", "Pooled connections by state (open, idle).",
+                            ["alias", "state"])
+DB_POOL_WAITING = Gauge("edc_db_pool_waiting_clients", "Requests queued for a pooled connection.", ["alias"])
+DB_POOL_CHECKOUTS = Counter("edc_db_pool_checkouts_total", "Connections handed out by the pool.", ["alias"])
+DB_POOL_CHECKOUT_WAIT = Counter("edc_db_pool_checkout_wait_seconds_total",
+                                "Time requests spent waiting for a pooled connection "
+                                "(divide by checkouts for the mean checkout latency).", ["alias"])
+DB_POOL_ERRORS = Counter("edc_db_pool_errors_total",
+                         "Checkouts that timed out, and connections found broken or lost.", ["alias", "kind"])
+
+
+def collect_pool_stats():
+    """Move psycopg_pool's counters (reset on read) into the metrics above."""
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        stats = pool.pop_stats()
+        DB_POOL_CONNECTIONS.set(stats.get("pool_size", 0), alias=alias, state="open")
+        DB_POOL_CONNECTIONS.set(stats.get("pool_available", 0), alias=alias, state="idle")
+        DB_POOL_WAITING.set(stats.get("requests_waiting", 0), alias=alias)
+        DB_POOL_CHECKOUTS.inc(stats.get("requests_num", 0), alias=alias)
+        DB_POOL_CHECKOUT_WAIT.inc(stats.get("requests_wait_ms", 0) / 1000, alias=alias)
+        DB_POOL_ERRORS.inc(stats.get("requests_errors", 0), alias=alias, kind="timeout")
+        DB_POOL_ERRORS.inc(stats.get("returns_bad", 0) + stats.get("connections_lost", 0), alias=alias, kind="broken")
+
+
+REGISTRY.add_collector(collect_pool_stats)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _wrap_connections(stack, wrapper):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(wrapper))
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = getattr(settings, "METRICS_DIR", None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            _wrap_connections(stack, counter)
+            response = self.get_response(request)
+        return self._record(request, response, time.perf_counter() - start, counter)
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        # Connections are per thread: wrap those of the request's sync thread,
+        # where the ORM runs (thread-sensitive sync_to_async)
+        stack = ExitStack()
+        await sync_to_async(_wrap_connections)(stack, counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._record(request, response, time.perf_counter() - start, counter)
+
+    def _record(self, request, response, elapsed, counter):
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        LATENCY.observe(elapsed, view=view)
+        QUERIES.observe(counter.count, view=view)
+        if self.directory:
+            REGISTRY.flush(self.directory)
+        return response
+
+
+def metrics_view(request):
+    if not getattr(settings, "METRICS_ENABLED", False):
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,184 @@
+"""
+Opt-in per-request profiling.
+
+For a sampled request this measures SQL (query count, total time, slowest
+statements with the project line that issued them), template render time and
+view time, and returns them in a Server-Timing header, which browser dev
+tools show under the request's "Timing" tab:
+
+    Server-Timing: sql;dur=12.4;desc="9 queries", tpl;dur=3.1, view;dur=21.0, total;dur=22.6
+
+Enable with PROFILING_ENABLED=1, which adds the middleware and installs
+the template timer once at startup (CoreConfig.ready).
+PROFILING_SAMPLE_RATE (0..1) controls how many requests are instrumented.
+Unsampled requests only pay for one random() call.
+"""
+import contextvars
+import logging
+import random
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template import base as template_base
+
+logger = logging.getLogger("mini_edc.profiling")
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR))
+THIS_FILE = __file__
+
+# The RequestProfile of the request being handled (None when not sampled)
+_current = contextvars.ContextVar("mini_edc_profile", default=None)
+
+
+def _call_site():
+    """First stack frame in project code (not Django, not this module)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and filename != THIS_FILE and "site-packages" not in filename:
+            return f"{Path(filename).relative_to(PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = []          # [(ms, sql, call site)]
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.view_start = None
+        self.view_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.sql_ms += ms
+            self.queries.append((ms, sql, _call_site()))
+
+    def slowest(self, n):
+        return sorted(self.queries, key=lambda q: q[0], reverse=True)[:n]
+
+    def server_timing(self, total_ms):
+        return ", ".join([
+            f'sql;dur={self.sql_ms:.1f};desc="{len(self.queries)} queries"',
+            f"tpl;dur={self.template_ms:.1f}",
+            f"view;dur={self.view_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ])
+
+
+_original_render = template_base.Template.render
+
+
+def install():
+    """
+    Time template renders for profiled requests. Called once, from
+    CoreConfig.ready() when PROFILING_ENABLED: the wrapper is process-wide,
+    and costs a ContextVar lookup per render outside profiled requests.
+    """
+    template_base.Template.render = _timed_render
+
+
+def _timed_render(self, context):
+    profile = _current.get()
+    if profile is None:
+        return _original_render(self, context)
+    # Only the outermost render counts; {% include %}s are part of it
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        profile.template_depth -= 1
+        if profile.template_depth == 0:
+            profile.template_ms += (time.perf_counter() - start) * 1000
+
+
+def _wrap_connections(stack, profile):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(profile))
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        self.slow_queries = getattr(settings, "PROFILING_SLOW_QUERIES", 3)
+        self.log_min_ms = getattr(settings, "PROFILING_LOG_MIN_MS", 0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack, profile)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, start)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        # Connections are per thread: wrap those of the request's sync thread,
+        # where the ORM runs (thread-sensitive sync_to_async)
+        stack = ExitStack()
+        try:
+            await sync_to_async(_wrap_connections)(stack, profile)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        return self._finish(request, response, profile, start)
+
+    def _finish(self, request, response, profile, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        if profile.view_start is not None:
+            profile.view_ms = (time.perf_counter() - profile.view_start) * 1000
+
+        response["Server-Timing"] = profile.server_timing(total_ms)
+        if total_ms >= self.log_min_ms:
+            self._log(request, profile, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def _log(self, request, profile, total_ms):
+        lines = [
+            f"{request.method} {request.path} {total_ms:.1f}ms "
+            f"(sql {profile.sql_ms:.1f}ms / {len(profile.queries)} queries, tpl {profile.template_ms:.1f}ms)"
+        ]
+        for ms, sql, site in profile.slowest(self.slow_queries):
+            lines.append(f"  {ms:7.1f}ms  {site}  {sql[:200]}")
+        logger.info("\n".join(lines))
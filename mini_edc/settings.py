@@ -58,7 +58,25 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "mini_edc.urls"
+# --- Request profiling (opt-in; see mini_edc/profiling.py) ---
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))  # fraction of requests profiled
+PROFILING_SLOW_QUERIES = int(os.getenv("PROFILING_SLOW_QUERIES", "3"))    # slowest queries logged per request
+PROFILING_LOG_MIN_MS = float(os.getenv("PROFILING_LOG_MIN_MS", "0"))       # only log requests slower than this
+if PROFILING_ENABLED:
+    # Outermost, so "total" covers every other middleware too
+    MIDDLEWARE.insert(0, "mini_edc.profiling.ProfilingMiddleware")
+
+# --- Metrics (/metrics, Prometheus text format; see mini_edc/metrics.py) ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR") or None          # shared dir to aggregate gunicorn workers
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))  # seconds between dumps
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, "mini_edc.metrics.MetricsMiddleware")
+
+# Coroutine read views (core/async_views.py), opt-in under ASGI (see mini_edc/asgi.py)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+ROOT_URLCONF = "mini_edc.asgi_urls" if ASYNC_VIEWS else "mini_edc.urls"
 
 TEMPLATES = [
     {
@@ -126,15 +144,94 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Caches. "fragments" holds versioned template fragments (core/fragment_cache.py);
+# FRAGMENT_CACHE_BACKEND picks locmem (per process), file (shared on one host)
+# or redis (shared; size-bound it server-side with maxmemory + allkeys-lru).
+FRAGMENT_CACHE_BACKEND = os.getenv("FRAGMENT_CACHE_BACKEND", "locmem")
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", "3600"))
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "10000"))
+_FRAGMENT_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "OPTIONS": {"MAX_ENTRIES": FRAGMENT_CACHE_MAX_ENTRIES},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("FRAGMENT_CACHE_DIR", str(BASE_DIR / ".cache" / "fragments")),
+        "OPTIONS": {"MAX_ENTRIES": FRAGMENT_CACHE_MAX_ENTRIES},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    },
+}
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "fragments": {**_FRAGMENT_BACKENDS[FRAGMENT_CACHE_BACKEND], "TIMEOUT": FRAGMENT_CACHE_TIMEOUT},
+}
+
+# --- Materialized per-CRF datasets (opt-in; see core/datasets.py) ---
+# Built with `manage.py build_datasets`; kept current by CRF saves while enabled
+DATASETS_ENABLED = os.getenv("DATASETS_ENABLED", "0") == "1"
+
+# Logging: our own loggers (mini_edc.*, core.*) go to the console at INFO
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "mini_edc": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+        "core": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # --- FINAL DB OVERRIDE (keep this last) ---
-DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL:
+# Postgres connection pool (psycopg 3, Django's OPTIONS["pool"]): requests
+# check a connection out and return it when they finish, instead of each
+# worker thread keeping its own. Pool stats are exported on /metrics.
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "0") == "1"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))        # per process
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))       # per process
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))       # seconds a request waits for a connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))    # idle seconds before shrinking to min size
+
+
+def _database(url):
     import dj_database_url
-    DATABASES["default"] = dj_database_url.parse(
-        DATABASE_URL, conn_max_age=600, ssl_require=False
+    pooled = DB_POOL_ENABLED and url.startswith(("postgres://", "postgresql://", "pgsql://"))
+    db = dj_database_url.parse(
+        url, conn_max_age=0 if pooled else 600, conn_health_checks=True, ssl_require=False
     )
+    if pooled:
+        # The pool runs the CONN_HEALTH_CHECKS check on checkout; persistent
+        # connections (CONN_MAX_AGE) can't be combined with it
+        db.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+            "max_idle": DB_POOL_MAX_IDLE,
+        }
+    return db
+
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if DATABASE_URL:
+    DATABASES["default"] = _database(DATABASE_URL)
+
+# Optional read replica (see mini_edc/db_routing.py): @replica_reads views
+# read from it; writes, and the requests/clients that just wrote, use default
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))   # primary-only reads after a write
+if REPLICA_DATABASE_URL:
+    DATABASES["replica"] = _database(REPLICA_DATABASE_URL)
+    # Tests run both aliases against the one test database
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["mini_edc.db_routing.ReplicaRouter"]
+    # Innermost, so session saves after the view don't count as the request's writes
+    MIDDLEWARE.append("mini_edc.db_routing.ReplicaPinMiddleware")
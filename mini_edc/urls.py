@@ -18,8 +18,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-urlpatterns = [
-    path("admin/", admin.site.urls),
-    path("", include("core.urls")),  # <-- public pages
-]
+from .metrics import metrics_view
+
+
+def site_patterns(core_urls):
+    return [
+        path("admin/", admin.site.urls),
+        path("metrics", metrics_view, name="metrics"),  # 404 unless METRICS_ENABLED
+        path("", include(core_urls)),  # <-- public pages
+    ]
+
+
+urlpatterns = site_patterns("core.urls")
 